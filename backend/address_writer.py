@@ -0,0 +1,134 @@
+"""
+Write-behind persistence for generated addresses.
+
+Endpoints hand their address records to an AddressWriter and return
+immediately; a background thread collects the records from every
+endpoint and inserts them with one executemany per batch, so a request
+never waits for an SQLite commit and a burst of addresses costs one
+disk sync instead of one per row.
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+# Marks the end of the queue for the writer thread
+_STOP = object()
+
+
+class AddressWriter:
+    """Bounded queue of address records flushed to the database in batches
+
+    A batch is written once batch_size records are waiting or
+    flush_interval seconds after its first record arrived, whichever
+    comes first. put() blocks while max_queue records are pending, which
+    pushes back on producers instead of growing without bound. When a
+    batch insert fails, its rows are retried one at a time so only the
+    rows that fail again are dropped.
+    """
+
+    def __init__(self, engine, table, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.05):
+        self.engine = engine
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="address-writer", daemon=True)
+            self._thread.start()
+
+    def put(self, record: Dict[str, Any], block: bool = True, timeout: float = None):
+        """Queue one bitcoin_addresses row; raises queue.Full if it cannot wait"""
+        if self._thread is None:
+            raise RuntimeError("Address writer is not running")
+        record.setdefault("created_at", datetime.utcnow())
+        self._queue.put(record, block, timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every record queued so far has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        print(f"Address writer stopped ({self.written} written, {self.failed} failed)")
+
+    def _run(self):
+        while True:
+            batch: List[Dict[str, Any]] = []
+            item = self._queue.get()
+            stopping = item is _STOP
+            if not stopping:
+                batch.append(item)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+            if stopping:
+                # Producers may still have squeezed records in behind the stop marker
+                leftovers = []
+                while True:
+                    try:
+                        leftovers.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                records = [record for record in leftovers if record is not _STOP]
+                for start in range(0, len(records), self.batch_size):
+                    self._write(records[start:start + self.batch_size])
+                for _ in leftovers:
+                    self._queue.task_done()
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        metrics.db_flush_rows.observe(len(batch))
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.table.insert(), batch)
+            self.written += len(batch)
+            metrics.db_flush_seconds.observe(time.perf_counter() - start, outcome="ok")
+        except Exception as e:
+            metrics.db_flush_seconds.observe(time.perf_counter() - start, outcome="error")
+            print(f"Error saving {len(batch)} addresses to database, retrying row by row: {e}")
+            self._write_rows(batch)
+
+    def _write_rows(self, batch: List[Dict[str, Any]]):
+        """Insert rows one transaction each, so a bad row loses only itself"""
+        for record in batch:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(self.table.insert(), [record])
+                self.written += 1
+            except Exception as e:
+                # Like the old per-row saves, a failed write is logged, not raised
+                self.failed += 1
+                print(f"Error saving address {record.get('address')} to database: {e}")
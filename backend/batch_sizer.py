@@ -0,0 +1,64 @@
+"""
+Adaptive work unit sizing.
+
+A fixed batch size suits only one machine: on a fast EC backend the
+per-batch costs (progress callbacks, stop checks, handing slices to a
+worker) eat into throughput, and on a slow one progress stalls and a
+cancel waits for the whole batch. BatchSizer times every unit and sizes
+the next one to take about TARGET_SECONDS, going larger only when the
+measured per-unit overhead would otherwise exceed MAX_OVERHEAD of the
+wall time.
+"""
+from typing import Optional
+
+# Wall time one work unit should take
+TARGET_SECONDS = 0.05
+# Largest share of the wall time per-unit costs may take
+MAX_OVERHEAD = 0.02
+# Weight of the newest measurement in the running averages
+SMOOTHING = 0.3
+# A unit grows at most this many times over the previous size, so one
+# unusually fast unit cannot blow up the next
+MAX_GROWTH = 4
+
+
+class BatchSizer:
+    """Picks the size of the next work unit from how long the last ones took"""
+
+    def __init__(self, initial: int = 256, target: float = TARGET_SECONDS, minimum: int = 1,
+                 maximum: int = 1000000, max_overhead: float = MAX_OVERHEAD):
+        self.target = target
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_overhead = max_overhead
+        self.size = max(minimum, min(maximum, initial))
+        # Running averages: seconds of work per item, seconds of overhead per unit
+        self.item_seconds: Optional[float] = None
+        self.overhead_seconds = 0.0
+
+    def record(self, items: int, work_seconds: float, overhead_seconds: float = 0.0):
+        """Account one finished unit of items that took work_seconds plus overhead_seconds"""
+        if items <= 0 or work_seconds <= 0:
+            return
+        per_item = work_seconds / items
+        if self.item_seconds is None:
+            self.item_seconds = per_item
+            self.overhead_seconds = overhead_seconds
+        else:
+            self.item_seconds += SMOOTHING * (per_item - self.item_seconds)
+            self.overhead_seconds += SMOOTHING * (overhead_seconds - self.overhead_seconds)
+
+        size = self.target / self.item_seconds
+        if self.max_overhead > 0:
+            # Units long enough that overhead stays within its share
+            size = max(size, self.overhead_seconds / (self.max_overhead * self.item_seconds))
+        size = min(size, self.size * MAX_GROWTH)
+        self.size = int(max(self.minimum, min(self.maximum, size)))
+
+    @property
+    def overhead(self) -> float:
+        """Share of the wall time spent on per-unit costs at the current size"""
+        if self.item_seconds is None:
+            return 0.0
+        work = self.size * self.item_seconds
+        return self.overhead_seconds / (work + self.overhead_seconds) if work + self.overhead_seconds > 0 else 0.0
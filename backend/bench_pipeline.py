@@ -0,0 +1,485 @@
+"""
+Per-stage and end-to-end benchmarks of the address generation pipeline.
+
+Stage benchmarks time every step of turning a private key into a stored
+address, for each address type. End-to-end benchmarks run pattern
+searches on a seeded keystream, so every run of the same seed and
+pattern checks exactly the same keys and only the time can change:
+
+    python bench_pipeline.py --json results.json
+    python bench_pipeline.py --quick --save-baseline baseline.json
+    python bench_pipeline.py --quick --baseline baseline.json --tolerance 0.2
+
+Cancel benchmarks time how long the workers keep searching after a
+search is stopped, through the worker pool and through the stop event
+of find_pattern_multiprocess.
+
+With --baseline the run fails (exit status 1) when a rate drops more
+than tolerance below the baseline, when a seeded search needs a
+different number of attempts than it did in the baseline, or when a
+cancel latency grows more than tolerance (plus CANCEL_SLACK) above it.
+Rates and latencies are only compared against a baseline from the same
+machine (see same_machine); the attempt counts are compared everywhere.
+
+bench_baseline.json is the committed --quick baseline;
+test_bench_pipeline.py runs the quick benchmarks against it with
+BASELINE_TOLERANCE. The test always checks the seeded attempt counts,
+and the rates too when GATE_RATES_ENV_VAR is set on the machine the
+baseline came from (shared CI runners vary too much from run to run).
+Regenerate the baseline after a deliberate change to the seeded
+searches, or on a new reference machine.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence
+
+import bech32
+
+from btc_generator import BitcoinAddressGenerator, IncrementalKeyStream
+from database import BitcoinAddress, Base, create_storage_engine
+from pattern_matcher import base58_payload_hash, witness_program
+from worker_pool import SearchWorkerPool
+
+ADDRESS_TYPES = ["p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr"]
+
+# Search patterns per type: the fixed leading characters every address
+# of the type shares after "1", "3" or "bc1", then the characters the
+# pattern length is counted in
+SEARCH_PATTERNS = {
+    "p2pkh": ("", "abcdef"),
+    "p2sh-p2wpkh": ("", "abcdef"),
+    "p2wpkh": ("q", "xyzw9s"),
+    "p2tr": ("p", "xyzw9s"),
+}
+
+SEARCH_MODES = ["single", "batch", "multiprocess", "pool"]
+
+# Searches shorter than this are dominated by startup costs, so their
+# rates are reported but not gated
+MIN_GATED_ATTEMPTS = 10000
+
+DEFAULT_SEED = "bench-pipeline"
+
+# A pattern no search finds before it is cancelled
+CANCEL_PATTERN = ("p2pkh", "zzzzzzzzzz")
+# Cancel latencies are a few milliseconds, so scheduling noise alone can
+# exceed a relative tolerance; growth below this many seconds is not gated
+CANCEL_SLACK = 0.02
+
+# Committed --quick baseline and the tolerance the tests check it with
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+BASELINE_TOLERANCE = 0.2
+GATE_RATES_ENV_VAR = "BTC_BENCH_GATE_RATES"
+
+
+def measure(fn: Callable, inputs: Sequence, min_time: float) -> float:
+    """Calls per second of fn, cycling through inputs for at least min_time"""
+    done = 0
+    start = time.perf_counter()
+    while True:
+        for item in inputs:
+            fn(item)
+        done += len(inputs)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return done / elapsed
+
+
+def encode_payload(generator, address_type: str, payload: bytes) -> str:
+    """The Base58Check or bech32 step of address creation"""
+    if address_type == "p2pkh":
+        return generator.base58_address(0x00, payload)
+    if address_type == "p2sh-p2wpkh":
+        return generator.base58_address(0x05, payload)
+    return bech32.encode('bc', 0 if address_type == "p2wpkh" else 1, payload)
+
+
+def address_row(address: str, wif: str, address_type: str) -> dict:
+    return {
+        "address": address,
+        "private_key": wif,
+        "address_type": address_type,
+        "pattern": None,
+        "position": None,
+        "attempts": 1,
+        "generation_source": "backend",
+        "created_at": datetime.utcnow(),
+    }
+
+
+def bench_common(generator, sample: int, min_time: float) -> Dict[str, float]:
+    """Stages every address type shares"""
+    private_keys = [generator.generate_private_key() for _ in range(sample)]
+    public_keys = [generator.private_key_to_public_key(key) for key in private_keys]
+    compressed = [generator.compress_public_key(key) for key in public_keys]
+    stream = IncrementalKeyStream(generator)
+
+    return {
+        "keygen": measure(lambda _: generator.generate_private_key(), private_keys, min_time),
+        "pubkey": measure(generator.private_key_to_public_key, private_keys, min_time),
+        # Keys per second; one call derives a whole batch of 1000
+        "incremental_pubkey": 1000 * measure(lambda _: stream.next_batch(1000), [None], min_time),
+        "compress": measure(generator.compress_public_key, public_keys, min_time),
+        "hash160": measure(generator.hash160, compressed, min_time),
+        "hash256": measure(generator.hash256, compressed, min_time),
+        "wif": measure(generator.private_key_to_wif, private_keys, min_time),
+    }
+
+
+def bench_address_type(generator, address_type: str, sample: int, min_time: float,
+                       db_url: str, db_rows: int) -> Dict[str, float]:
+    """Stages that depend on the address type, including the DB insert"""
+    private_keys = [generator.generate_private_key() for _ in range(sample)]
+    public_keys = [generator.private_key_to_public_key(key) for key in private_keys]
+    compressed = [generator.compress_public_key(key) for key in public_keys]
+    if address_type in ("p2pkh", "p2sh-p2wpkh"):
+        payload = lambda key: base58_payload_hash(generator, address_type, key)
+    else:
+        payload = lambda key: witness_program(generator, address_type, key)
+    payloads = [payload(key) for key in compressed]
+    addresses = [generator.public_key_to_address(address_type, key) for key in public_keys]
+    prefix, chars = SEARCH_PATTERNS[address_type]
+    pattern = prefix + chars[:3]
+    matcher = generator.compile_pattern(address_type, pattern, "start")
+
+    results = {
+        "payload_hash": measure(payload, compressed, min_time),
+        "encode": measure(lambda p: encode_payload(generator, address_type, p), payloads, min_time),
+        "address": measure(lambda key: generator.public_key_to_address(address_type, key),
+                           public_keys, min_time),
+        "check_pattern_match": measure(
+            lambda address: generator.check_pattern_match(address, pattern, "start"), addresses, min_time),
+        "compiled_match": measure(matcher.match, compressed, min_time),
+    }
+    results.update(bench_db_insert(db_url, address_type, addresses, private_keys, generator, db_rows))
+    return results
+
+
+def bench_db_insert(db_url: str, address_type: str, addresses: List[str], private_keys: List[bytes],
+                    generator, rows: int) -> Dict[str, float]:
+    """Rows per second, one commit per row (the old save path) and per 500-row batch"""
+    wifs = [generator.private_key_to_wif(key) for key in private_keys]
+    engine = create_storage_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    table = BitcoinAddress.__table__
+
+    def make_rows(count: int, tag: str) -> List[dict]:
+        # Addresses are unique in the table, so tag each copy
+        return [
+            address_row(f"{addresses[i % len(addresses)]}-{tag}-{i}", wifs[i % len(wifs)], address_type)
+            for i in range(count)
+        ]
+
+    single_rows = make_rows(max(rows // 10, 1), "single")
+    start = time.perf_counter()
+    for row in single_rows:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [row])
+    single = len(single_rows) / (time.perf_counter() - start)
+
+    batch_rows = make_rows(rows, "batch")
+    start = time.perf_counter()
+    for offset in range(0, len(batch_rows), 500):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch_rows[offset:offset + 500])
+    batch = len(batch_rows) / (time.perf_counter() - start)
+
+    engine.dispose()
+    return {"db_insert_single": single, "db_insert_batch": batch}
+
+
+def run_search(mode: str, address_type: str, pattern: str, workers: int, seed: str,
+               backend: str, max_attempts: int) -> dict:
+    """One seeded search; a fresh generator restarts the keystream at index 0"""
+    generator = BitcoinAddressGenerator(backend=backend, seed=seed)
+    pool = None
+    if mode == "pool":
+        # Spawning and warming the workers is not part of the search
+        pool = SearchWorkerPool(generator, max_workers=workers)
+        pool.start()
+    try:
+        start = time.perf_counter()
+        if mode == "single":
+            result = generator.find_pattern_batch(address_type, pattern, "start", max_attempts=max_attempts)
+        elif mode == "batch":
+            result = generator.find_pattern_batch(address_type, pattern, "start", max_attempts=max_attempts,
+                                                  incremental=True)
+        elif mode == "multiprocess":
+            result = generator.find_pattern_multiprocess(address_type, pattern, "start", max_attempts,
+                                                         num_processes=workers, incremental=True)
+        else:
+            result = generator.find_pattern_multiprocess(address_type, pattern, "start", max_attempts, pool=pool)
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    attempts = result[2] if result is not None else max_attempts
+    return {
+        "mode": mode,
+        "address_type": address_type,
+        "pattern": pattern,
+        "workers": workers,
+        "found": result is not None,
+        "address": result[0] if result is not None else None,
+        "attempts": attempts,
+        "seconds": elapsed,
+        "keys_per_second": attempts / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def pool_cancel_latency(pool: SearchWorkerPool, address_type: str, pattern: str,
+                        settle: float = 0.3) -> float:
+    """Seconds from MultiPatternSearch.cancel until the request's lane counters stop moving
+
+    The counters are the shared-memory SearchSlots the workers update
+    after every chunk; they count as stopped once they have not changed
+    for settle seconds.
+    """
+    request = pool.submit(address_type, pattern, "start")
+    slot = request.group.slot
+    shared = pool.search.shared
+    deadline = time.perf_counter() + 10
+    while not any(shared.lane_attempts(slot)):
+        if time.perf_counter() > deadline:
+            pool.cancel(request)
+            raise RuntimeError("Search never started on the worker pool")
+        time.sleep(0.001)
+
+    counts = shared.lane_attempts(slot)
+    cancelled = last_change = time.perf_counter()
+    pool.cancel(request)
+    while time.perf_counter() - last_change < settle:
+        current = shared.lane_attempts(slot)
+        if current != counts:
+            counts = current
+            last_change = time.perf_counter()
+        time.sleep(0.0005)
+    return last_change - cancelled
+
+
+def multiprocess_cancel_latency(generator, address_type: str, pattern: str, workers: int,
+                                warmup: float = 1.0) -> float:
+    """Seconds from setting the stop event until find_pattern_multiprocess returns
+
+    The call only returns once the executor has shut down, that is once
+    every worker has left its search.
+    """
+    stop_event = mp.Event()
+    returned = threading.Event()
+
+    def search():
+        try:
+            generator.find_pattern_multiprocess(address_type, pattern, "start", num_processes=workers,
+                                                incremental=True, stop_event=stop_event)
+        finally:
+            returned.set()
+
+    thread = threading.Thread(target=search, daemon=True)
+    thread.start()
+    # Let the workers spawn and get into their search loops
+    time.sleep(warmup)
+    if returned.is_set():
+        raise RuntimeError("Search ended before it could be cancelled")
+    cancelled = time.perf_counter()
+    stop_event.set()
+    if not returned.wait(30):
+        raise RuntimeError("Search did not stop within 30 seconds")
+    return time.perf_counter() - cancelled
+
+
+def bench_cancel(backend: str, workers: int, repeats: int) -> Dict[str, float]:
+    """Median cancel latency in seconds, per cancel mode"""
+    address_type, pattern = CANCEL_PATTERN
+    generator = BitcoinAddressGenerator(backend=backend)
+    pool = SearchWorkerPool(generator, max_workers=workers)
+    pool.start()
+    try:
+        pool_latencies = [pool_cancel_latency(pool, address_type, pattern) for _ in range(repeats)]
+    finally:
+        pool.shutdown()
+    multiprocess_latencies = [multiprocess_cancel_latency(generator, address_type, pattern, workers)
+                              for _ in range(repeats)]
+    return {
+        "pool": statistics.median(pool_latencies),
+        "multiprocess": statistics.median(multiprocess_latencies),
+    }
+
+
+def search_key(case: dict) -> str:
+    return f"{case['mode']}.{case['address_type']}.{case['pattern']}.w{case['workers']}"
+
+
+def same_machine(results: dict, baseline: dict) -> bool:
+    """Whether baseline was measured with the same Python, platform, CPU count and backend"""
+    keys = ("python", "platform", "cpu_count", "backend")
+    return all(results["meta"].get(key) == baseline.get("meta", {}).get(key) for key in keys)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, rates: bool = True) -> List[str]:
+    """Regressions of results against baseline, as readable messages
+
+    With rates=False only the seeded attempt counts are checked, which
+    hold on any machine; rates and latencies only compare on the
+    machine the baseline came from.
+    """
+    failures = []
+    for group, stages in (baseline.get("stages", {}) if rates else {}).items():
+        for stage, old in stages.items():
+            new = results.get("stages", {}).get(group, {}).get(stage)
+            if new is not None and new < old * (1 - tolerance):
+                failures.append(f"stages.{group}.{stage}: {new:.0f}/s vs baseline {old:.0f}/s")
+
+    same_seed = baseline.get("meta", {}).get("seed") == results["meta"]["seed"]
+    current = {search_key(case): case for case in results.get("search", [])}
+    for old in baseline.get("search", []):
+        key = search_key(old)
+        new = current.get(key)
+        if new is None:
+            continue
+        if same_seed and new["attempts"] != old["attempts"]:
+            failures.append(f"search.{key}: {new['attempts']} attempts vs baseline {old['attempts']}")
+        if rates and old["attempts"] >= MIN_GATED_ATTEMPTS and \
+                new["keys_per_second"] < old["keys_per_second"] * (1 - tolerance):
+            failures.append(f"search.{key}: {new['keys_per_second']:.0f} keys/s "
+                            f"vs baseline {old['keys_per_second']:.0f} keys/s")
+
+    for mode, old in (baseline.get("cancel", {}) if rates else {}).items():
+        new = results.get("cancel", {}).get(mode)
+        if new is not None and new > old * (1 + tolerance) + CANCEL_SLACK:
+            failures.append(f"cancel.{mode}: {new * 1000:.1f} ms vs baseline {old * 1000:.1f} ms")
+    return failures
+
+
+def parse_list(value: str, cast=str) -> list:
+    return [cast(item) for item in value.split(",") if item]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the address generation pipeline")
+    parser.add_argument("--quick", action="store_true", help="shorter timings and searches")
+    parser.add_argument("--backend", default=None, help="EC backend (default: fastest installed)")
+    parser.add_argument("--types", type=parse_list, default=ADDRESS_TYPES)
+    parser.add_argument("--modes", type=parse_list, default=SEARCH_MODES)
+    parser.add_argument("--lengths", type=lambda v: parse_list(v, int), default=None)
+    parser.add_argument("--workers", type=lambda v: parse_list(v, int), default=None)
+    parser.add_argument("--seed", default=DEFAULT_SEED)
+    parser.add_argument("--max-attempts", type=int, default=2000000)
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-search", action="store_true")
+    parser.add_argument("--skip-cancel", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON ('-' for stdout)")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="fail on regressions against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before a rate counts as a regression")
+    return parser
+
+
+def run(args, parser: argparse.ArgumentParser = None) -> dict:
+    """Run the benchmarks selected by parsed command line arguments"""
+    parser = parser or build_parser()
+    for address_type in args.types:
+        if address_type not in ADDRESS_TYPES:
+            parser.error(f"unknown address type: {address_type}")
+    for mode in args.modes:
+        if mode not in SEARCH_MODES:
+            parser.error(f"unknown search mode: {mode}")
+    min_time = 0.2 if args.quick else 1.0
+    sample = 200 if args.quick else 1000
+    db_rows = 2000 if args.quick else 20000
+    lengths = args.lengths or ([1, 2] if args.quick else [1, 2, 3])
+    workers = args.workers or sorted({1, min(os.cpu_count() or 1, 4)})
+
+    generator = BitcoinAddressGenerator(backend=args.backend)
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": generator.backend.name,
+            "seed": args.seed,
+            "quick": args.quick,
+        },
+        "stages": {},
+        "search": [],
+        "cancel": {},
+    }
+
+    if not args.skip_stages:
+        results["stages"]["common"] = bench_common(generator, sample, min_time)
+        with tempfile.TemporaryDirectory() as tmp:
+            for address_type in args.types:
+                db_url = "sqlite:///" + os.path.join(tmp, f"{address_type}.db")
+                results["stages"][address_type] = bench_address_type(
+                    generator, address_type, sample, min_time, db_url, db_rows)
+        for group, stages in results["stages"].items():
+            print(f"{group}:")
+            for stage, rate in stages.items():
+                print(f"  {stage:<20} {rate:14.0f} /s")
+
+    if not args.skip_search:
+        print("search:")
+        for address_type in args.types:
+            prefix, chars = SEARCH_PATTERNS[address_type]
+            for length in lengths:
+                pattern = prefix + chars[:length]
+                for mode in args.modes:
+                    for count in (workers if mode in ("multiprocess", "pool") else [1]):
+                        case = run_search(mode, address_type, pattern, count, args.seed,
+                                          generator.backend.name, args.max_attempts)
+                        results["search"].append(case)
+                        print(f"  {search_key(case):<40} {case['attempts']:>9} attempts "
+                              f"{case['seconds']:8.2f}s {case['keys_per_second']:10.0f} keys/s")
+
+    if not args.skip_cancel:
+        results["cancel"] = bench_cancel(generator.backend.name, max(workers), 3 if args.quick else 7)
+        print("cancel latency:")
+        for mode, seconds in results["cancel"].items():
+            print(f"  {mode:<20} {seconds * 1000:10.1f} ms")
+    return results
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    results = run(args, parser)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rates = same_machine(results, baseline)
+        if not rates:
+            print("Warning: the baseline comes from another machine or backend; "
+                  "only seeded attempt counts are compared")
+        failures = compare(results, baseline, args.tolerance, rates)
+        if failures:
+            print(f"{len(failures)} regression(s) against {args.baseline}:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
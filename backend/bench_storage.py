@@ -0,0 +1,112 @@
+"""
+Concurrent insert / read throughput of the address store.
+
+Runs the same workload against the previous engine configuration
+(default journal, pre-ping on every checkout) and the tuned one from
+database.create_storage_engine, each on a fresh database file:
+
+    python bench_storage.py --writers 2 --readers 4 --seconds 5
+
+Writers insert batches of addresses the way AddressWriter does; readers
+run the /addresses page query and row count.
+"""
+import argparse
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+
+from database import Base, BitcoinAddress, create_storage_engine
+
+
+def legacy_engine(url: str):
+    """Engine configured as before the storage tuning"""
+    return create_engine(url, pool_pre_ping=True, pool_recycle=300)
+
+
+def random_row() -> dict:
+    return {
+        "address": "bc1q" + secrets.token_hex(19),
+        "private_key": secrets.token_hex(26),
+        "address_type": "p2wpkh",
+        "pattern": None,
+        "position": None,
+        "attempts": 1,
+        "generation_source": "backend",
+        "created_at": datetime.utcnow(),
+    }
+
+
+def run_workload(engine, writers: int, readers: int, seconds: float, batch_size: int) -> dict:
+    table = BitcoinAddress.__table__
+    Base.metadata.create_all(bind=engine)
+    stop = threading.Event()
+    counts = {"rows": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def write():
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    conn.execute(table.insert(), [random_row() for _ in range(batch_size)])
+                with lock:
+                    counts["rows"] += batch_size
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+
+    def read():
+        page = select(table).order_by(table.c.created_at.desc()).limit(50)
+        total = select(func.count()).select_from(table)
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(page).fetchall()
+                    conn.execute(total).scalar()
+                with lock:
+                    counts["reads"] += 1
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    return {
+        "inserts_per_second": counts["rows"] / elapsed,
+        "reads_per_second": counts["reads"] / elapsed,
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark address store throughput")
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in (("legacy", legacy_engine), ("tuned", create_storage_engine)):
+            url = "sqlite:///" + os.path.join(tmp, f"{name}.db")
+            result = run_workload(factory(url), args.writers, args.readers, args.seconds, args.batch_size)
+            print(f"{name:>6}: {result['inserts_per_second']:10.0f} inserts/s "
+                  f"{result['reads_per_second']:8.1f} reads/s  errors={result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
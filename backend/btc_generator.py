@@ -2,17 +2,68 @@ import hashlib
 import secrets
 import base58
 import bech32
-from ecdsa import SigningKey, SECP256k1
 from typing import Optional, Tuple, List
 import struct
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
 import os
+import time
+import ec_math
+from batch_sizer import BatchSizer
+from ec_backend import ECBackend, select_backend
+from pattern_matcher import PatternMatcher, compile_pattern
+from seeded_keys import SeededKeystream
+
+# Incremental streams never walk further than this from their base key,
+# so base + offset can never wrap around the curve order
+MAX_STREAM_LENGTH = 2 ** 64
+
+
+class IncrementalKeyStream:
+    """Walk consecutive private keys base, base+1, base+2, ...
+
+    Only the base key pays for a scalar multiplication; every following
+    public key is the previous point plus G, and each batch is normalized
+    to affine coordinates with a single modular inversion.
+    """
+
+    def __init__(self, generator: 'BitcoinAddressGenerator', base_key: bytes = None):
+        if base_key is None:
+            base_key = generator.generate_base_key()
+        self.base_key = base_key
+        self.offset = 0
+        self._base = int.from_bytes(base_key, 'big')
+        self._backend = generator.backend
+        self._point = ec_math.point_from_public_key(generator.private_key_to_public_key(base_key))
+
+    def next_batch(self, count: int) -> bytes:
+        """Return the compressed public keys for the next count offsets and advance
+
+        Keys are packed back to back, 33 bytes each.
+        """
+        if self.offset + count > MAX_STREAM_LENGTH:
+            raise ValueError("Incremental key stream exhausted")
+        public_keys, self._point = self._backend.consecutive_public_keys(self._point, count)
+        self.offset += count
+        return public_keys
+
+    def private_key_at(self, offset: int) -> bytes:
+        """Rebuild the private key for base + offset"""
+        return ((self._base + offset) % ec_math.N).to_bytes(32, 'big')
+
 
 class BitcoinAddressGenerator:
-    def __init__(self):
-        # Pre-compute some values for better performance
-        self._secp256k1_curve = SECP256k1
+    def __init__(self, backend: str = None, seed: str = None):
+        # Elliptic-curve backend: forced by name, BTC_EC_BACKEND, or the fastest installed
+        self.backend: ECBackend = select_backend(backend)
+        # Seeded mode replaces the system RNG with a reproducible keystream.
+        # Benchmarks and tests only: the seed reveals every private key
+        self.keystream: Optional[SeededKeystream] = None
+        if seed is not None:
+            self.keystream = SeededKeystream(seed)
+        # Next per-key index and next incremental block of the keystream
+        self.key_index = 0
+        self.block_index = 0
         # Cache for reused hash objects
         self._ripemd160_cache = []
         self._sha256_cache = []
@@ -45,13 +96,24 @@ class BitcoinAddressGenerator:
     
     def generate_private_key(self) -> bytes:
         """Generate a secure random 32-byte private key"""
+        if self.keystream is not None:
+            self.key_index += 1
+            return self.keystream.key_at(self.key_index - 1)
         return secrets.token_bytes(32)
     
+    def generate_base_key(self) -> bytes:
+        """Generate a random base key for an incremental key stream"""
+        if self.keystream is not None:
+            self.block_index += 1
+            return self.keystream.block_base(self.block_index - 1)
+        while True:
+            private_key = self.generate_private_key()
+            if 0 < int.from_bytes(private_key, 'big') < ec_math.N - MAX_STREAM_LENGTH:
+                return private_key
+    
     def private_key_to_public_key(self, private_key: bytes) -> bytes:
         """Convert private key to public key using SECP256k1"""
-        sk = SigningKey.from_string(private_key, curve=SECP256k1)
-        vk = sk.get_verifying_key()
-        return b'\x04' + vk.to_string()
+        return self.backend.public_key(private_key)
     
     def compress_public_key(self, public_key: bytes) -> bytes:
         """Convert uncompressed public key to compressed format"""
@@ -92,13 +154,9 @@ class BitcoinAddressGenerator:
         self._return_sha256(sha256_hasher2)
         return result
     
-    def create_p2pkh_address(self, public_key: bytes) -> str:
-        """Create Legacy P2PKH address"""
-        compressed_pubkey = self.compress_public_key(public_key)
-        pubkey_hash = self.hash160(compressed_pubkey)
-        
-        # Add version byte (0x00 for mainnet)
-        versioned_payload = b'\x00' + pubkey_hash
+    def base58_address(self, version: int, payload_hash: bytes) -> str:
+        """Base58Check-encode a version byte and a 20-byte hash"""
+        versioned_payload = bytes([version]) + payload_hash
         
         # Calculate checksum
         checksum = self.hash256(versioned_payload)[:4]
@@ -107,6 +165,14 @@ class BitcoinAddressGenerator:
         address_bytes = versioned_payload + checksum
         return base58.b58encode(address_bytes).decode('utf-8')
     
+    def create_p2pkh_address(self, public_key: bytes) -> str:
+        """Create Legacy P2PKH address"""
+        compressed_pubkey = self.compress_public_key(public_key)
+        pubkey_hash = self.hash160(compressed_pubkey)
+        
+        # Version byte 0x00 for mainnet
+        return self.base58_address(0x00, pubkey_hash)
+    
     def create_p2sh_p2wpkh_address(self, public_key: bytes) -> str:
         """Create Nested SegWit P2SH-P2WPKH address"""
         compressed_pubkey = self.compress_public_key(public_key)
@@ -116,15 +182,8 @@ class BitcoinAddressGenerator:
         redeem_script = b'\x00\x14' + pubkey_hash
         redeem_script_hash = self.hash160(redeem_script)
         
-        # Add version byte (0x05 for P2SH mainnet)
-        versioned_payload = b'\x05' + redeem_script_hash
-        
-        # Calculate checksum
-        checksum = self.hash256(versioned_payload)[:4]
-        
-        # Create address
-        address_bytes = versioned_payload + checksum
-        return base58.b58encode(address_bytes).decode('utf-8')
+        # Version byte 0x05 for P2SH mainnet
+        return self.base58_address(0x05, redeem_script_hash)
     
     def create_p2wpkh_address(self, public_key: bytes) -> str:
         """Create Native SegWit P2WPKH address"""
@@ -148,6 +207,19 @@ class BitcoinAddressGenerator:
         address = bech32.encode('bc', 1, x_coord)
         return address
     
+    def public_key_to_address(self, address_type: str, public_key: bytes) -> str:
+        """Create address of specified type from a public key"""
+        if address_type == "p2pkh":
+            return self.create_p2pkh_address(public_key)
+        elif address_type == "p2sh-p2wpkh":
+            return self.create_p2sh_p2wpkh_address(public_key)
+        elif address_type == "p2wpkh":
+            return self.create_p2wpkh_address(public_key)
+        elif address_type == "p2tr":
+            return self.create_p2tr_address(public_key)
+        else:
+            raise ValueError(f"Unsupported address type: {address_type}")
+    
     def generate_address(self, address_type: str, private_key: bytes = None) -> Tuple[str, str]:
         """Generate address of specified type"""
         if private_key is None:
@@ -155,17 +227,7 @@ class BitcoinAddressGenerator:
         
         public_key = self.private_key_to_public_key(private_key)
         private_key_wif = self.private_key_to_wif(private_key)
-        
-        if address_type == "p2pkh":
-            address = self.create_p2pkh_address(public_key)
-        elif address_type == "p2sh-p2wpkh":
-            address = self.create_p2sh_p2wpkh_address(public_key)
-        elif address_type == "p2wpkh":
-            address = self.create_p2wpkh_address(public_key)
-        elif address_type == "p2tr":
-            address = self.create_p2tr_address(public_key)
-        else:
-            raise ValueError(f"Unsupported address type: {address_type}")
+        address = self.public_key_to_address(address_type, public_key)
         
         return address, private_key_wif
     
@@ -206,57 +268,198 @@ class BitcoinAddressGenerator:
         
         return False
     
-    def generate_batch(self, address_type: str, batch_size: int = 100) -> List[Tuple[str, str]]:
-        """Generate multiple addresses in batch for better performance"""
+    def compile_pattern(self, address_type: str, pattern: str, position: str) -> PatternMatcher:
+        """Compile a pattern into a matcher that works on raw public keys"""
+        return compile_pattern(self, address_type, pattern, position)
+    
+    def generate_batch(self, address_type: str, batch_size: int = 100,
+                       start_index: int = None) -> List[Tuple[str, str]]:
+        """Generate multiple addresses in batch for better performance
+        
+        In seeded mode start_index picks where in the keystream the batch
+        starts, so concurrent workers can produce disjoint batches.
+        """
+        if start_index is not None and self.keystream is not None:
+            self.key_index = start_index
         results = []
         for _ in range(batch_size):
             address, private_key = self.generate_address(address_type)
             results.append((address, private_key))
         return results
     
+    def generate_public_key_batch(self, stream: IncrementalKeyStream, batch_size: int = 1000) -> bytes:
+        """Derive the next batch_size compressed public keys from a key stream
+        
+        Returns one contiguous buffer of 33-byte keys; the key at index i
+        belongs to private key base + (offset before the call) + i.
+        """
+        return stream.next_batch(batch_size)
+    
+    def generate_incremental_batch(self, address_type: str, stream: IncrementalKeyStream,
+                                   batch_size: int = 1000) -> List[Tuple[str, int]]:
+        """Generate consecutive addresses from a key stream as (address, offset) pairs"""
+        first_offset = stream.offset
+        public_keys = self.generate_public_key_batch(stream, batch_size)
+        results = []
+        for i in range(batch_size):
+            address = self.public_key_to_address(address_type, public_keys[33 * i:33 * i + 33])
+            results.append((address, first_offset + i))
+        return results
+    
     def find_pattern_batch(self, address_type: str, pattern: str, position: str, 
-                          batch_size: int = 1000, max_attempts: int = None) -> Optional[Tuple[str, str, int]]:
-        """Find address matching pattern using batch processing"""
+                          batch_size: int = None, max_attempts: int = None,
+                          incremental: bool = False, stop_event=None,
+                          progress=None) -> Optional[Tuple[str, str, int]]:
+        """Find address matching pattern using batch processing
+        
+        With incremental=True consecutive keys from one random base are
+        searched, paying one point addition per attempt instead of a full
+        scalar multiplication. The search gives up between batches once
+        stop_event (a threading or multiprocessing Event) is set, and
+        calls progress(attempts) after every batch. Without a batch_size
+        each batch is sized to take about batch_sizer.TARGET_SECONDS.
+        """
+        if incremental:
+            return self._find_pattern_incremental(address_type, pattern, position, batch_size, max_attempts,
+                                                  stop_event, progress)
+        
+        matcher = self.compile_pattern(address_type, pattern, position)
+        # A full scalar multiplication per key: start small on slow backends
+        sizer = BatchSizer(initial=16) if batch_size is None else None
+        attempts = 0
+        
+        while max_attempts is None or attempts < max_attempts:
+            unit_start = time.perf_counter()
+            if stop_event is not None and stop_event.is_set():
+                break
+            size = sizer.size if sizer is not None else batch_size
+            if max_attempts is None:
+                current_batch_size = size
+            else:
+                current_batch_size = min(size, max_attempts - attempts)
+            
+            # Only hits pay for the address string and WIF encoding
+            work_start = time.perf_counter()
+            for _ in range(current_batch_size):
+                private_key = self.generate_private_key()
+                attempts += 1
+                address = matcher.match(self.private_key_to_public_key(private_key))
+                if address is not None:
+                    return address, self.private_key_to_wif(private_key), attempts
+            work = time.perf_counter() - work_start
+            
+            if progress is not None:
+                progress(attempts)
+            if sizer is not None:
+                sizer.record(current_batch_size, work, time.perf_counter() - unit_start - work)
+                
+        return None
+    
+    def _find_pattern_incremental(self, address_type: str, pattern: str, position: str,
+                                  batch_size: int = None, max_attempts: int = None,
+                                  stop_event=None, progress=None) -> Optional[Tuple[str, str, int]]:
+        """Find address matching pattern by walking an incremental key stream
+        
+        In seeded mode the stream moves to the next keystream block every
+        block_size keys, matching the seeded multiprocess search.
+        """
+        matcher = self.compile_pattern(address_type, pattern, position)
+        stream = IncrementalKeyStream(self)
+        sizer = BatchSizer() if batch_size is None else None
         attempts = 0
         
         while max_attempts is None or attempts < max_attempts:
-            # Generate batch of addresses
+            unit_start = time.perf_counter()
+            if stop_event is not None and stop_event.is_set():
+                break
+            size = sizer.size if sizer is not None else batch_size
             if max_attempts is None:
-                current_batch_size = batch_size
+                current_batch_size = size
             else:
-                current_batch_size = min(batch_size, max_attempts - attempts)
+                current_batch_size = min(size, max_attempts - attempts)
+            if self.keystream is not None:
+                if stream.offset == self.keystream.block_size:
+                    stream = IncrementalKeyStream(self)
+                current_batch_size = min(current_batch_size, self.keystream.block_size - stream.offset)
             
-            batch = self.generate_batch(address_type, current_batch_size)
+            first_offset = stream.offset
+            work_start = time.perf_counter()
+            public_keys = self.generate_public_key_batch(stream, current_batch_size)
             
-            for address, private_key in batch:
+            for i in range(current_batch_size):
                 attempts += 1
-                if self.check_pattern_match(address, pattern, position):
+                address = matcher.match(public_keys[33 * i:33 * i + 33])
+                if address is not None:
+                    private_key = self.private_key_to_wif(stream.private_key_at(first_offset + i))
                     return address, private_key, attempts
+            work = time.perf_counter() - work_start
             
-            if max_attempts is not None and attempts >= max_attempts:
-                break
-                
+            if progress is not None:
+                progress(attempts)
+            if sizer is not None:
+                sizer.record(current_batch_size, work, time.perf_counter() - unit_start - work)
+        
         return None
     
     def find_pattern_multiprocess(self, address_type: str, pattern: str, position: str,
-                                 max_attempts: int = None, num_processes: int = None) -> Optional[Tuple[str, str, int]]:
-        """Find address matching pattern using multiple processes"""
+                                 max_attempts: int = None, num_processes: int = None,
+                                 incremental: bool = None, pool=None,
+                                 stop_event=None) -> Optional[Tuple[str, str, int]]:
+        """Find address matching pattern using multiple processes
+        
+        Pass a started worker_pool.SearchWorkerPool as pool to run on its
+        warm workers instead of spawning a process pool for this call.
+        The pool's size and search method are fixed, so num_processes must
+        then be omitted or equal to the pool's worker count, and incremental
+        omitted or True (pool slices always walk incremental key streams);
+        anything else raises ValueError. Without a pool, incremental
+        defaults to False.
+        
+        Setting stop_event (a multiprocessing Event) from another thread
+        stops the workers between batches and the call returns None; the
+        search sets it itself when it ends.
+        """
+        if pool is not None:
+            if num_processes is not None and num_processes != pool.max_workers:
+                raise ValueError(f"num_processes={num_processes} does not match the pool's "
+                                 f"{pool.max_workers} workers")
+            if incremental is False:
+                raise ValueError("Pool searches always use incremental key streams")
+            return self._find_pattern_on_pool(pool, address_type, pattern, position, max_attempts, stop_event)
+        
+        incremental = bool(incremental)
         if num_processes is None:
             num_processes = min(os.cpu_count(), 8)  # Limit to 8 processes max
         
+        if self.keystream is not None:
+            return self._find_pattern_seeded(address_type, pattern, position, max_attempts,
+                                             num_processes, incremental, stop_event)
+        
         if max_attempts is None:
             # Set a large number for each process when no limit is specified
             attempts_per_process = 1000000  # 1 million attempts per process
         else:
             attempts_per_process = max_attempts // num_processes
         
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        # Workers poll this between batches; without it the executor's
+        # shutdown would wait for every other worker to exhaust its budget
+        if stop_event is None:
+            stop_event = mp.Event()
+        # Worker i publishes its running attempt count in counters[i]
+        counters = mp.RawArray('q', num_processes)
+        executor = ProcessPoolExecutor(
+            max_workers=num_processes,
+            initializer=_init_pattern_worker,
+            initargs=(stop_event, counters)
+        )
+        try:
             # Submit tasks to each process
             futures = []
             for i in range(num_processes):
                 future = executor.submit(
                     _find_pattern_worker,
-                    address_type, pattern, position, attempts_per_process, i, max_attempts is None
+                    address_type, pattern, position, attempts_per_process, i, max_attempts is None,
+                    incremental, self.backend.name
                 )
                 futures.append(future)
             
@@ -264,24 +467,172 @@ class BitcoinAddressGenerator:
             for future in as_completed(futures):
                 result = future.result()
                 if result is not None:
-                    # Cancel remaining tasks
-                    for f in futures:
-                        f.cancel()
-                    return result
+                    address, private_key, _ = result
+                    return address, private_key, sum(counters)
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
         
         return None
+    
+    def _find_pattern_on_pool(self, pool, address_type: str, pattern: str, position: str,
+                              max_attempts: int, stop_event=None) -> Optional[Tuple[str, str, int]]:
+        """Run one search on a worker pool, cancelling it if stop_event is set"""
+        request = pool.submit(address_type, pattern, position, max_attempts)
+        try:
+            if stop_event is None:
+                return request.future.result()
+            while True:
+                try:
+                    return request.future.result(timeout=0.01)
+                except TimeoutError:
+                    if stop_event.is_set():
+                        return None
+        finally:
+            pool.cancel(request)
+    
+    def _find_pattern_seeded(self, address_type: str, pattern: str, position: str, max_attempts: int,
+                             num_processes: int, incremental: bool,
+                             stop_event=None) -> Optional[Tuple[str, str, int]]:
+        """Reproducible multiprocess search over the seeded keystream
+        
+        Worker i searches keystream blocks i, i + n, i + 2n, ... and the
+        lowest-index hit wins, so the result and its attempt count (the
+        hit's index + 1) do not depend on the number of workers. A hit in
+        block b only stops blocks after b; earlier blocks still finish.
+        """
+        if stop_event is None:
+            stop_event = mp.Event()
+        counters = mp.RawArray('q', num_processes)
+        # Lowest block with a hit so far; blocks from here on are skipped
+        hit_block = mp.Value('q', 2 ** 62)
+        executor = ProcessPoolExecutor(
+            max_workers=num_processes,
+            initializer=_init_pattern_worker,
+            initargs=(stop_event, counters, hit_block)
+        )
+        try:
+            futures = [
+                executor.submit(
+                    _find_pattern_seeded_worker,
+                    address_type, pattern, position, max_attempts, i, num_processes,
+                    incremental, self.backend.name, self.keystream.seed
+                )
+                for i in range(num_processes)
+            ]
+            results = [future.result() for future in futures]
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        hits = [result for result in results if result is not None]
+        return min(hits, key=lambda hit: hit[2]) if hits else None
+
+
+# Set in each worker of a transient find_pattern_multiprocess pool
+_worker_stop_event = None
+_worker_counters = None
+_worker_hit_block = None
+
+
+def _init_pattern_worker(stop_event, counters, hit_block=None):
+    global _worker_stop_event, _worker_counters, _worker_hit_block
+    _worker_stop_event = stop_event
+    _worker_counters = counters
+    _worker_hit_block = hit_block
+
+
+def _publish_attempts(worker_id: int, attempts: int):
+    if _worker_counters is not None:
+        _worker_counters[worker_id] = attempts
 
 
 def _find_pattern_worker(address_type: str, pattern: str, position: str, 
-                        max_attempts: int, worker_id: int, unlimited: bool = False) -> Optional[Tuple[str, str, int]]:
-    """Worker function for multiprocess pattern finding"""
-    generator = BitcoinAddressGenerator()
+                        max_attempts: int, worker_id: int, unlimited: bool = False,
+                        incremental: bool = False, backend: str = None) -> Optional[Tuple[str, str, int]]:
+    """Worker function for multiprocess pattern finding
+    
+    Returns this worker's own attempt count; the running count is also
+    published to the shared counters so the parent can total all workers.
+    """
+    generator = BitcoinAddressGenerator(backend)
     
+    if incremental:
+        # Each worker walks its own stream from an independent random base
+        result = generator.find_pattern_batch(
+            address_type, pattern, position, max_attempts=None if unlimited else max_attempts, incremental=True,
+            stop_event=_worker_stop_event,
+            progress=lambda attempts: _publish_attempts(worker_id, attempts)
+        )
+        if result is not None:
+            _publish_attempts(worker_id, result[2])
+        return result
+    
+    matcher = generator.compile_pattern(address_type, pattern, position)
     attempt = 0
     while unlimited or attempt < max_attempts:
-        address, private_key = generator.generate_address(address_type)
+        if attempt % 1000 == 0:
+            _publish_attempts(worker_id, attempt)
+            if _worker_stop_event is not None and _worker_stop_event.is_set():
+                return None
+        private_key = generator.generate_private_key()
         attempt += 1
-        if generator.check_pattern_match(address, pattern, position):
-            return address, private_key, attempt + (worker_id * max_attempts)
+        address = matcher.match(generator.private_key_to_public_key(private_key))
+        if address is not None:
+            _publish_attempts(worker_id, attempt)
+            return address, generator.private_key_to_wif(private_key), attempt
+    
+    _publish_attempts(worker_id, attempt)
+    return None
+
+
+def _find_pattern_seeded_worker(address_type: str, pattern: str, position: str, max_attempts: int,
+                                worker_id: int, num_workers: int, incremental: bool, backend: str,
+                                seed: str) -> Optional[Tuple[str, str, int]]:
+    """Search every num_workers-th keystream block, starting at block worker_id
+    
+    Returns the first hit as (address, private_key_wif, keystream index + 1).
+    """
+    generator = BitcoinAddressGenerator(backend, seed)
+    keystream = generator.keystream
+    block_size = keystream.block_size
+    matcher = generator.compile_pattern(address_type, pattern, position)
+    attempts = 0
+    
+    block = worker_id
+    while block < _worker_hit_block.value and (max_attempts is None or block * block_size < max_attempts):
+        if _worker_stop_event.is_set():
+            break
+        first_index = block * block_size
+        count = block_size if max_attempts is None else min(block_size, max_attempts - first_index)
+        
+        if incremental:
+            stream = IncrementalKeyStream(generator, keystream.block_base(block))
+            public_keys = generator.generate_public_key_batch(stream, count)
+            for i in range(count):
+                if matcher.match(public_keys[33 * i:33 * i + 33]) is not None:
+                    hit = i, stream.private_key_at(i)
+                    break
+            else:
+                hit = None
+        else:
+            for i in range(count):
+                private_key = keystream.key_at(first_index + i)
+                if matcher.match(generator.private_key_to_public_key(private_key)) is not None:
+                    hit = i, private_key
+                    break
+            else:
+                hit = None
+        
+        attempts += count if hit is None else hit[0] + 1
+        _publish_attempts(worker_id, attempts)
+        if hit is not None:
+            i, private_key = hit
+            with _worker_hit_block.get_lock():
+                _worker_hit_block.value = min(_worker_hit_block.value, block)
+            public_key = generator.private_key_to_public_key(private_key)
+            address = generator.public_key_to_address(address_type, public_key)
+            return address, generator.private_key_to_wif(private_key), first_index + i + 1
+        block += num_workers
     
-    return None
\ No newline at end of file
+    return None
@@ -1,19 +1,66 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, func, inspect, text, Column, Integer, BigInteger, Float, String, DateTime, Text, Index
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
 import os
 
 # Database configuration - Using local SQLite database
-DATABASE_URL = "sqlite:///./bitcoin_generator.db"
+DATABASE_URL = os.environ.get("BTC_DB_URL", "sqlite:///./bitcoin_generator.db")
+
+# Pragmas applied to every new SQLite connection. WAL lets the /addresses
+# readers run alongside the address writer, and synchronous=NORMAL is
+# safe under WAL (a crash can lose the last commits, never corrupt the file)
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("BTC_DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("BTC_DB_SYNCHRONOUS", "NORMAL"),
+    # Negative cache_size is in KiB
+    "cache_size": int(os.environ.get("BTC_DB_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.environ.get("BTC_DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.environ.get("BTC_DB_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": os.environ.get("BTC_DB_TEMP_STORE", "MEMORY"),
+}
+
+# Connections kept open for the request handlers and the writer thread
+DB_POOL_SIZE = int(os.environ.get("BTC_DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.environ.get("BTC_DB_MAX_OVERFLOW", "8"))
+
+
+def create_storage_engine(url: str = DATABASE_URL, pragmas: dict = None):
+    """Create an engine for url, tuning SQLite connections with pragmas
+
+    Connections are shared across threads through a QueuePool; each one
+    is handed to a single thread at a time, so SQLite's same-thread
+    check is disabled. No pre-ping: a local file has nothing to go stale.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True, pool_recycle=300, echo=False)
+
+    if pragmas is None:
+        pragmas = SQLITE_PRAGMAS
+    engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        connect_args={"check_same_thread": False},
+        echo=False  # Set to True for SQL debugging
+    )
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=False  # Set to True for SQL debugging
-)
+engine = create_storage_engine()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -35,22 +82,129 @@ class BitcoinAddress(Base):
     generation_source = Column(String(20), nullable=False, default='backend')  # backend or frontend
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # Keyset pagination walks (created_at, id) newest first
+    __table_args__ = (
+        Index("ix_bitcoin_addresses_created_at_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<BitcoinAddress(id={self.id}, address='{self.address[:10]}...', type='{self.address_type}')>"
 
+class AddressCount(Base):
+    """Row counts of bitcoin_addresses per type and source, kept by triggers"""
+    __tablename__ = "address_counts"
+    
+    address_type = Column(String(20), primary_key=True)
+    generation_source = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class SearchJob(Base):
+    """Durable pattern search, checkpointed so it survives disconnects and restarts"""
+    __tablename__ = "search_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    address_type = Column(String(20), nullable=False)
+    pattern = Column(String(50), nullable=False)
+    position = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False, index=True)  # queued, running, paused, found, exhausted, expired, cancelled, failed
+    priority = Column(String(10), nullable=False, default="normal")  # high, normal, low
+    client_id = Column(String(64), nullable=True, index=True)  # Who submitted it, for fair share
+    deadline = Column(DateTime, nullable=True)  # Give up (status expired) after this time
+    max_attempts = Column(BigInteger, nullable=True)
+    attempts = Column(BigInteger, nullable=False, default=0)  # Keys checked over all runs, as of the last checkpoint
+    elapsed_seconds = Column(Float, nullable=False, default=0.0)  # Search time over all runs
+    keystream_block = Column(BigInteger, nullable=True)  # Seeded searches: next keystream block to search
+    keystream_seed = Column(String(64), nullable=True)  # SHA-256 of the seed a seeded job ran under
+    workers = Column(Text, nullable=True)  # JSON list of keys checked per worker lane in the current run
+    runs = Column(Integer, nullable=False, default=1)  # Times the job was started or resumed
+    result_address = Column(String(100), nullable=True)
+    result_private_key = Column(Text, nullable=True)  # WIF format
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+class ReservoirHit(Base):
+    """Spare match for a hot pattern, waiting to be handed out once"""
+    __tablename__ = "reservoir_hits"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    address_type = Column(String(20), nullable=False)
+    pattern = Column(String(50), nullable=False)  # Lowercased
+    position = Column(String(10), nullable=False)
+    address = Column(String(100), nullable=False)
+    encrypted_private_key = Column(Text, nullable=False)  # Fernet token of the WIF key
+    key_id = Column(String(16), nullable=False)  # Fingerprint of the encryption key
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Hits are taken oldest first per pattern
+    __table_args__ = (
+        Index("ix_reservoir_hits_pattern_id", "address_type", "pattern", "position", "id"),
+    )
+
+# SQLite triggers keeping address_counts in step with bitcoin_addresses
+COUNT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS bitcoin_addresses_count_insert AFTER INSERT ON bitcoin_addresses
+    BEGIN
+        INSERT INTO address_counts (address_type, generation_source, count)
+        VALUES (NEW.address_type, NEW.generation_source, 1)
+        ON CONFLICT (address_type, generation_source) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS bitcoin_addresses_count_delete AFTER DELETE ON bitcoin_addresses
+    BEGIN
+        UPDATE address_counts SET count = count - 1
+        WHERE address_type = OLD.address_type AND generation_source = OLD.generation_source;
+    END
+    """,
+]
+
+def counts_maintained() -> bool:
+    """Whether address_counts is kept up to date (SQLite only)"""
+    return engine.dialect.name == "sqlite"
+
+def count_addresses(db, address_type: str = None, generation_source: str = None,
+                    pattern: str = None) -> int:
+    """Number of stored addresses matching the filters
+    
+    Type and source filters are answered from address_counts; a pattern
+    filter counts through the pattern index.
+    """
+    if pattern is not None or not counts_maintained():
+        query = db.query(func.count(BitcoinAddress.id))
+        if address_type is not None:
+            query = query.filter(BitcoinAddress.address_type == address_type)
+        if generation_source is not None:
+            query = query.filter(BitcoinAddress.generation_source == generation_source)
+        if pattern is not None:
+            query = query.filter(BitcoinAddress.pattern == pattern)
+        return query.scalar()
+    
+    query = db.query(func.coalesce(func.sum(AddressCount.count), 0))
+    if address_type is not None:
+        query = query.filter(AddressCount.address_type == address_type)
+    if generation_source is not None:
+        query = query.filter(AddressCount.generation_source == generation_source)
+    return query.scalar()
+
 def get_db():
     """Dependency to get database session"""
     try:
         db = SessionLocal()
-        yield db
     except Exception as e:
         print(f"Database session error: {e}")
         # Return a mock session that does nothing if database is unavailable
         yield None
+        return
+    # Errors raised by the endpoint propagate through this yield; yielding
+    # again from an except block here would turn an HTTPException into a 500
+    try:
+        yield db
     finally:
         try:
-            if 'db' in locals():
-                db.close()
+            db.close()
         except:
             pass
 
@@ -58,7 +212,24 @@ def create_tables():
     """Create all tables in the database"""
     try:
         # SQLite will automatically create the database file if it doesn't exist
+        counts_existed = inspect(engine).has_table(AddressCount.__tablename__)
         Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so indexes added
+        # since the table was created have to be created here
+        for index in BitcoinAddress.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+        
+        if counts_maintained():
+            with engine.begin() as conn:
+                for trigger in COUNT_TRIGGERS:
+                    conn.execute(text(trigger))
+                if not counts_existed:
+                    # Seed the counters from rows stored before they existed
+                    conn.execute(text(
+                        "INSERT INTO address_counts (address_type, generation_source, count) "
+                        "SELECT address_type, generation_source, COUNT(*) FROM bitcoin_addresses "
+                        "GROUP BY address_type, generation_source"
+                    ))
         print("Database tables created successfully")
         
     except Exception as e:
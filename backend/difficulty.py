@@ -0,0 +1,143 @@
+"""
+Difficulty and time estimates for vanity patterns.
+
+Combines the match probability of a pattern
+(pattern_matcher.match_probability, flagged "exact": false where it is
+only an approximation) with the key rate the worker pool actually
+reaches on this machine, measured per address type at startup, and
+decides how a search should run:
+
+- "inline": expected to need so few keys that it runs on an API thread
+  instead of waiting for a free worker behind longer searches
+- "pool": runs on the shared worker pool
+- "reject": cannot match, or is expected to take longer than the limit
+"""
+import math
+import os
+from typing import Dict, Optional
+
+from pattern_matcher import match_probability, probability_is_exact
+
+# One slice of this many keys per address type measures the worker rate
+CALIBRATION_KEYS = 5000
+CALIBRATION_PATTERNS = {
+    "p2pkh": "abc",
+    "p2sh-p2wpkh": "abc",
+    "p2wpkh": "qxyz",
+    "p2tr": "pxyz",
+}
+
+# Searches expected to finish within this many keys run inline
+INLINE_MAX_ATTEMPTS = 2000
+
+# Longest expected search accepted, in seconds (default one day)
+MAX_EXPECTED_SECONDS = float(os.environ.get("BTC_MAX_SEARCH_SECONDS", 24 * 3600))
+
+# Per-worker keys per second assumed before calibration
+DEFAULT_WORKER_RATE = 5000.0
+
+
+def attempts_for_confidence(probability: float, confidence: float) -> float:
+    """Keys needed to have found a match with the given confidence"""
+    if probability >= 1:
+        return 1.0
+    if probability <= 0:
+        return math.inf
+    return math.log1p(-confidence) / math.log1p(-probability)
+
+
+def format_duration(seconds: float) -> str:
+    """Rough human-readable duration for user-facing messages"""
+    if math.isinf(seconds):
+        return "无限长"
+    for unit, size in (("年", 365 * 86400), ("天", 86400), ("小时", 3600), ("分钟", 60)):
+        if seconds >= size:
+            value = seconds / size
+            return f"约 {value:.3g} {unit}" if value < 1e6 else f"约 {value:.1e} {unit}"
+    if seconds < 0.1:
+        return "不到 0.1 秒"
+    return f"约 {seconds:.1f} 秒"
+
+
+class DifficultyEstimator:
+    """Turns pattern odds into attempt counts, durations and a search strategy"""
+
+    def __init__(self, pool, allow_inline: bool = True):
+        self.pool = pool
+        # Seeded runs keep every search on the pool so results stay reproducible
+        self.allow_inline = allow_inline
+        # Measured keys per second of one worker, per address type
+        self.worker_rates: Dict[str, float] = {}
+
+    def calibrate(self):
+        """Measure the worker key rate of every address type"""
+        for address_type, pattern in CALIBRATION_PATTERNS.items():
+            try:
+                self.worker_rates[address_type] = self.pool.measure_rate(
+                    address_type, pattern, "start", CALIBRATION_KEYS)
+            except Exception as e:
+                print(f"Key rate calibration failed for {address_type}: {e}")
+        rates = ", ".join(f"{t}={rate:.0f}" for t, rate in self.worker_rates.items())
+        print(f"Calibrated worker key rates (keys/s per worker): {rates}")
+
+    @property
+    def workers(self) -> int:
+        # Workers beyond the CPU count only share the same cores
+        return max(1, min(self.pool.max_workers, os.cpu_count() or 1))
+
+    def keys_per_second(self, address_type: str) -> float:
+        return self.worker_rates.get(address_type, DEFAULT_WORKER_RATE) * self.workers
+
+    def estimate(self, address_type: str, pattern: str, position: str,
+                 max_attempts: Optional[int] = None) -> dict:
+        """Odds, attempt quantiles, durations and strategy for one pattern
+
+        Raises ValueError for unsupported address types.
+        """
+        probability = match_probability(address_type, pattern, position)
+        rate = self.keys_per_second(address_type)
+        possible = probability > 0
+        expected = 1 / probability if possible else math.inf
+        quantiles = {q: attempts_for_confidence(probability, q) for q in (0.5, 0.9, 0.99)}
+
+        # max_attempts bounds how long the search can run, hit or not
+        budget = expected if max_attempts is None else min(expected, max_attempts)
+        budget_seconds = budget / rate
+        reason = None
+        if not possible:
+            strategy = "reject"
+            reason = "该模式不可能出现在此类地址中"
+        elif budget_seconds > MAX_EXPECTED_SECONDS:
+            strategy = "reject"
+            reason = (f"模式过难：预计需要{format_duration(expected / rate)}，"
+                      f"超过上限{format_duration(MAX_EXPECTED_SECONDS)}")
+        elif self.allow_inline and expected <= INLINE_MAX_ATTEMPTS:
+            strategy = "inline"
+        else:
+            strategy = "pool"
+
+        def finite(value: float) -> Optional[float]:
+            return None if math.isinf(value) else value
+
+        return {
+            "address_type": address_type,
+            "pattern": pattern,
+            "position": position,
+            "possible": possible,
+            "probability": probability,
+            # False where probability (and every figure derived from it) is approximate
+            "exact": probability_is_exact(address_type, pattern, position),
+            "expected_attempts": finite(expected),
+            "attempts_p50": finite(quantiles[0.5]),
+            "attempts_p90": finite(quantiles[0.9]),
+            "attempts_p99": finite(quantiles[0.99]),
+            "keys_per_second": round(rate, 1),
+            "workers": self.workers,
+            "expected_seconds": finite(expected / rate),
+            "seconds_p50": finite(quantiles[0.5] / rate),
+            "seconds_p90": finite(quantiles[0.9] / rate),
+            "seconds_p99": finite(quantiles[0.99] / rate),
+            "expected_duration": format_duration(expected / rate),
+            "strategy": strategy,
+            "reason": reason,
+        }
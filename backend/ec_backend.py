@@ -0,0 +1,148 @@
+"""
+Pluggable elliptic-curve backends for secp256k1 key derivation.
+
+The generator picks the fastest backend available at startup:
+libsecp256k1 through coincurve, then ecdsa (which uses gmpy2 on its own
+when installed), then the built-in pure-Python implementation in
+ec_math. Set BTC_EC_BACKEND or pass a backend name to force one.
+All backends produce byte-identical keys.
+"""
+import os
+from typing import Dict, Tuple
+import ec_math
+
+BACKEND_ENV_VAR = "BTC_EC_BACKEND"
+
+
+class ECBackend:
+    """Interface every curve backend implements"""
+    name = "base"
+
+    def public_key(self, private_key: bytes) -> bytes:
+        """Derive the 65-byte uncompressed public key"""
+        raise NotImplementedError
+
+    def consecutive_public_keys(self, point: ec_math.Point, count: int) -> Tuple[bytes, ec_math.Point]:
+        """Compress point, point+G, ... into one buffer and return the next point"""
+        return ec_math.consecutive_points(point, count)
+
+    def info(self) -> Dict[str, object]:
+        """Describe the backend for diagnostics"""
+        return {"name": self.name}
+
+
+class PurePythonBackend(ECBackend):
+    """Built-in Jacobian arithmetic on Python integers"""
+    name = "python"
+
+    def public_key(self, private_key: bytes) -> bytes:
+        return ec_math.point_to_public_key(ec_math.scalar_mult(int.from_bytes(private_key, 'big')))
+
+
+class EcdsaBackend(ECBackend):
+    """python-ecdsa, accelerated by gmpy2 when it is installed"""
+    name = "ecdsa"
+
+    def __init__(self):
+        from ecdsa import SigningKey, SECP256k1
+        from ecdsa import numbertheory
+        self._signing_key = SigningKey
+        self._curve = SECP256k1
+        self._gmpy = bool(getattr(numbertheory, "GMPY2", False) or getattr(numbertheory, "GMPY", False))
+
+    def public_key(self, private_key: bytes) -> bytes:
+        sk = self._signing_key.from_string(private_key, curve=self._curve)
+        vk = sk.get_verifying_key()
+        return b'\x04' + vk.to_string()
+
+    def info(self) -> Dict[str, object]:
+        return {"name": self.name, "gmpy2": self._gmpy}
+
+
+class CoincurveBackend(ECBackend):
+    """libsecp256k1 through the coincurve bindings"""
+    name = "coincurve"
+
+    def __init__(self):
+        import coincurve
+        self._coincurve = coincurve
+        self._generator = coincurve.PublicKey.from_point(ec_math.GX, ec_math.GY)
+        # The raw cffi bindings skip a PublicKey object per key on the
+        # incremental path; older or unusual builds fall back to combine_keys
+        try:
+            from coincurve._libsecp256k1 import ffi, lib
+            from coincurve.context import GLOBAL_CONTEXT
+            self._ffi, self._lib, self._ctx = ffi, lib, GLOBAL_CONTEXT.ctx
+        except (ImportError, AttributeError):
+            self._ffi = None
+
+    def public_key(self, private_key: bytes) -> bytes:
+        return self._coincurve.PrivateKey(private_key).public_key.format(compressed=False)
+
+    def consecutive_public_keys(self, point: ec_math.Point, count: int) -> Tuple[bytes, ec_math.Point]:
+        if self._ffi is None:
+            return self._combine_keys_walk(point, count)
+        ffi, lib, ctx = self._ffi, self._lib, self._ctx
+        # points[i] = point + i*G, each one native addition from the last
+        points = ffi.new('secp256k1_pubkey[]', count + 1)
+        ffi.memmove(points, self._coincurve.PublicKey.from_point(*point).public_key, 64)
+        pair = ffi.new('secp256k1_pubkey *[2]')
+        pair[1] = self._generator.public_key
+        combine = lib.secp256k1_ec_pubkey_combine
+        for i in range(count):
+            pair[0] = points + i
+            if not combine(ctx, points + i + 1, pair, 2):
+                raise ValueError("Incremental key stream reached the point at infinity")
+
+        output = ffi.new('unsigned char[]', 33 * count)
+        length = ffi.new('size_t *')
+        serialize = lib.secp256k1_ec_pubkey_serialize
+        compressed = lib.SECP256K1_EC_COMPRESSED
+        for i in range(count):
+            length[0] = 33
+            serialize(ctx, output + 33 * i, length, points + i, compressed)
+
+        next_point = ffi.new('unsigned char[65]')
+        length[0] = 65
+        serialize(ctx, next_point, length, points + count, lib.SECP256K1_EC_UNCOMPRESSED)
+        return ffi.buffer(output)[:], ec_math.point_from_public_key(ffi.buffer(next_point)[:])
+
+    def _combine_keys_walk(self, point: ec_math.Point, count: int) -> Tuple[bytes, ec_math.Point]:
+        combine_keys = self._coincurve.PublicKey.combine_keys
+        current = self._coincurve.PublicKey.from_point(*point)
+        generator = self._generator
+        parts = []
+        for _ in range(count):
+            parts.append(current.format())
+            current = combine_keys([current, generator])
+        return b''.join(parts), current.point()
+
+
+# Preference order used when no backend is forced
+BACKENDS = {
+    CoincurveBackend.name: CoincurveBackend,
+    EcdsaBackend.name: EcdsaBackend,
+    PurePythonBackend.name: PurePythonBackend,
+}
+
+
+def select_backend(name: str = None) -> ECBackend:
+    """Return the requested backend, or the fastest one that is installed"""
+    if name is None:
+        name = os.environ.get(BACKEND_ENV_VAR, "auto")
+    name = name.lower()
+
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown EC backend: {name}")
+        try:
+            return BACKENDS[name]()
+        except ImportError as e:
+            raise ValueError(f"EC backend '{name}' is not available: {e}")
+
+    for backend_class in BACKENDS.values():
+        try:
+            return backend_class()
+        except ImportError:
+            continue
+    return PurePythonBackend()
@@ -0,0 +1,189 @@
+"""
+secp256k1 curve arithmetic on plain Python integers.
+
+Used by the incremental key search: stepping from k*G to (k+1)*G is a
+single point addition, which is far cheaper than the full scalar
+multiplication ecdsa performs for every fresh private key.
+"""
+from typing import List, Optional, Tuple
+
+# Curve parameters (SEC 2, section 2.4.1)
+P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+GX = 0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798
+GY = 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+G = (GX, GY)
+
+# Affine point as (x, y); None is the point at infinity
+Point = Optional[Tuple[int, int]]
+
+
+def point_add(p1: Point, p2: Point) -> Point:
+    """Add two affine points"""
+    if p1 is None:
+        return p2
+    if p2 is None:
+        return p1
+
+    x1, y1 = p1
+    x2, y2 = p2
+    if x1 == x2:
+        if (y1 + y2) % P == 0:
+            return None
+        # Doubling: slope = 3x^2 / 2y
+        slope = 3 * x1 * x1 * pow(2 * y1, -1, P) % P
+    else:
+        slope = (y2 - y1) * pow(x2 - x1, -1, P) % P
+
+    x3 = (slope * slope - x1 - x2) % P
+    y3 = (slope * (x1 - x3) - y1) % P
+    return x3, y3
+
+
+def point_from_public_key(public_key: bytes) -> Point:
+    """Parse a 65-byte uncompressed public key into an affine point"""
+    if len(public_key) != 65 or public_key[0] != 0x04:
+        raise ValueError("Expected a 65-byte uncompressed public key")
+    return int.from_bytes(public_key[1:33], 'big'), int.from_bytes(public_key[33:65], 'big')
+
+
+def point_to_public_key(point: Point) -> bytes:
+    """Serialize an affine point as a 65-byte uncompressed public key"""
+    if point is None:
+        raise ValueError("Point at infinity has no public key encoding")
+    x, y = point
+    return b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+
+
+# Affine multiples G, 2G, 4G, ... 2^255 G, built on first use
+_G_POWERS: List[Point] = []
+
+
+def _g_powers() -> List[Point]:
+    if not _G_POWERS:
+        point = G
+        for _ in range(256):
+            _G_POWERS.append(point)
+            point = point_add(point, point)
+    return _G_POWERS
+
+
+def scalar_mult(k: int) -> Point:
+    """Compute k*G
+
+    Sums the precomputed powers of two of G in Jacobian coordinates, so
+    only the final conversion back to affine needs an inversion.
+    """
+    if not 0 < k < N:
+        raise ValueError("Private key out of range")
+
+    x1 = y1 = z1 = None
+    for i, power in enumerate(_g_powers()):
+        if not (k >> i) & 1:
+            continue
+        if z1 is None:
+            x1, y1, z1 = power[0], power[1], 1
+            continue
+
+        x2, y2 = power
+        z1z1 = z1 * z1 % P
+        h = (x2 * z1z1 - x1) % P
+        r = (y2 * z1 * z1z1 - y1) % P
+        if h == 0:
+            # Equal or opposite points; let the affine formulas sort it out
+            z_inv = pow(z1, -1, P)
+            affine = point_add((x1 * z_inv * z_inv % P, y1 * z_inv * z_inv * z_inv % P), power)
+            x1, y1, z1 = affine[0], affine[1], 1
+            continue
+        hh = h * h % P
+        hhh = h * hh % P
+        v = x1 * hh % P
+        x3 = (r * r - hhh - 2 * v) % P
+        y1 = (r * (v - x3) - y1 * hhh) % P
+        x1 = x3
+        z1 = z1 * h % P
+
+    z_inv = pow(z1, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return x1 * z_inv2 % P, y1 * z_inv2 * z_inv % P
+
+
+def batch_inverse(values: List[int]) -> List[int]:
+    """Invert every value modulo P with a single modular inversion
+
+    Montgomery's trick: invert the product of all values once, then peel
+    the individual inverses off the running prefix products.
+    """
+    prefix = []
+    acc = 1
+    for value in values:
+        prefix.append(acc)
+        acc = acc * value % P
+
+    inv = pow(acc, -1, P)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = prefix[i] * inv % P
+        inv = inv * values[i] % P
+    return result
+
+
+def consecutive_points(point: Point, count: int) -> Tuple[bytes, Point]:
+    """Compress point, point+G, ..., point+(count-1)G into one buffer
+
+    The chain is walked in Jacobian coordinates (no inversions) and then
+    normalized with one batch inversion. Returns the contiguous 33-byte
+    compressed keys and the affine point that follows the last one.
+    """
+    if point is None:
+        raise ValueError("Cannot walk from the point at infinity")
+
+    xs = []
+    ys = []
+    zs = []
+    x1, y1, z1 = point[0], point[1], 1
+    for _ in range(count):
+        xs.append(x1)
+        ys.append(y1)
+        zs.append(z1)
+
+        # Mixed Jacobian + affine addition of G
+        z1z1 = z1 * z1 % P
+        h = (GX * z1z1 - x1) % P
+        r = (GY * z1 * z1z1 - y1) % P
+        if h == 0:
+            # Current point is +-G; fall back to affine arithmetic
+            z_inv = pow(z1, -1, P)
+            affine = (x1 * z_inv * z_inv % P, y1 * z_inv * z_inv * z_inv % P)
+            following = point_add(affine, G)
+            if following is None:
+                raise ValueError("Key stream reached the point at infinity")
+            x1, y1, z1 = following[0], following[1], 1
+            continue
+        hh = h * h % P
+        hhh = h * hh % P
+        v = x1 * hh % P
+        x3 = (r * r - hhh - 2 * v) % P
+        y1 = (r * (v - x3) - y1 * hhh) % P
+        x1 = x3
+        z1 = z1 * h % P
+
+    xs.append(x1)
+    ys.append(y1)
+    zs.append(z1)
+    z_invs = batch_inverse(zs)
+
+    buffer = bytearray(33 * count)
+    for i in range(count):
+        z_inv = z_invs[i]
+        z_inv2 = z_inv * z_inv % P
+        x = xs[i] * z_inv2 % P
+        y = ys[i] * z_inv2 * z_inv % P
+        start = 33 * i
+        buffer[start] = 0x02 | (y & 1)
+        buffer[start + 1:start + 33] = x.to_bytes(32, 'big')
+
+    z_inv = z_invs[count]
+    z_inv2 = z_inv * z_inv % P
+    following = (xs[count] * z_inv2 % P, ys[count] * z_inv2 * z_inv % P)
+    return bytes(buffer), following
@@ -1,18 +1,38 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
 import asyncio
+import base64
+import collections
+import csv
+import io
+import functools
+import itertools
+import queue
+import threading
 import uvicorn
 import json
+import zlib
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from database import get_db, BitcoinAddress, create_tables, test_connection
-# Try to import the full version first, fall back to simple version
-try:
-    from btc_generator import BitcoinAddressGenerator
-except ImportError:
-    from btc_generator_simple import BitcoinAddressGenerator
-    print("Using simplified Bitcoin address generator (educational version)")
+from database import get_db, engine, SessionLocal, BitcoinAddress, count_addresses, create_tables, test_connection
+from address_writer import AddressWriter
+import metrics
+from worker_pool import SearchWorkerPool
+from difficulty import DifficultyEstimator
+from reservoir import PATTERNS_ENV_VAR, HitReservoir, parse_patterns
+from search_jobs import CHECKPOINT_INTERVAL, MAX_JOBS_PER_CLIENT, PRIORITIES, SearchJobManager
+from profiler import DEFAULT_INTERVAL, MAX_PROFILE_SECONDS
+from seeded_keys import SEED_ENV_VAR
+import math
+import os
+import time
+from datetime import datetime
+# The API needs the full generator (backends, keystream, compiled patterns);
+# btc_generator_simple is a standalone educational version only
+from btc_generator import BitcoinAddressGenerator
 
 app = FastAPI(title="Bitcoin Address Generator", description="Educational Bitcoin address generator")
 
@@ -25,6 +45,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+ADDRESS_TYPES = ("p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr")
+
 class GenerationRequest(BaseModel):
     address_type: str  # "p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr"
     pattern: str = ""
@@ -35,42 +57,74 @@ class GenerationResponse(BaseModel):
     private_key: str
     attempts: int
     success: bool
+    profile: Optional[Dict[str, Any]] = None
+    reservoir: bool = False  # Served from the hit reservoir, no search run
+
+class SearchJobRequest(GenerationRequest):
+    priority: str = "normal"  # "high", "normal", "low"
+    max_attempts: Optional[int] = None  # Give up after this many keys
+    deadline_seconds: Optional[float] = None  # Give up after this long, queued time included
 
 # Store active generation tasks
 active_tasks: Dict[str, Dict[str, Any]] = {}
+# Task ids stay unique for the life of the process
+task_ids = itertools.count(1)
+
+# Seconds between WebSocket progress messages
+PROGRESS_INTERVAL = 0.5
+
+# Searches expected to take longer than this get an ETA message up front
+LONG_SEARCH_SECONDS = 2.0
 
-generator = BitcoinAddressGenerator()
+# Seeded keystreams make runs reproducible for benchmarks; every key can
+# be rebuilt from the seed, so never enable this for real use
+keystream_seed = os.environ.get(SEED_ENV_VAR)
+if keystream_seed is not None:
+    print(f"WARNING: {SEED_ENV_VAR} is set - generated keys are derived from the seed. "
+          "Benchmarking only, never use these keys for real funds")
+    generator = BitcoinAddressGenerator(seed=keystream_seed)
+else:
+    generator = BitcoinAddressGenerator()
+# Spare hits for hot short patterns; off for seeded runs, whose results
+# must not depend on what earlier searches left behind
+reservoir = HitReservoir(SessionLocal, parse_patterns(os.environ.get(PATTERNS_ENV_VAR, "")),
+                         enabled=keystream_seed is None)
+worker_pool = SearchWorkerPool(generator, reservoir=reservoir if reservoir.enabled else None)
+# Seeded runs keep every search on the pool so results stay reproducible
+difficulty = DifficultyEstimator(worker_pool, allow_inline=keystream_seed is None)
+address_writer = AddressWriter(engine, BitcoinAddress.__table__)
+# Resumable searches that outlive their WebSocket and the process
+search_jobs = SearchJobManager(SessionLocal, worker_pool, address_writer)
+metrics.active_tasks.set_function(lambda: len(active_tasks))
+metrics.db_queue_depth.set_function(lambda: address_writer.pending)
+metrics.search_jobs_queued.set_function(lambda: search_jobs.queued_jobs)
+metrics.search_jobs_running.set_function(lambda: search_jobs.running_jobs)
+metrics.reservoir_stock.set_function(lambda: reservoir.stock)
+
+# Longest a result request may wait for its job, in seconds
+MAX_RESULT_WAIT = 60.0
 
 # Database service functions
-def save_address_to_db(db: Session, address: str, private_key: str, address_type: str, 
-                      pattern: str = None, position: str = None, attempts: int = None, 
-                      generation_source: str = 'backend'):
-    """Save generated address to database"""
-    if db is None:
-        print("Database not available, skipping save")
-        return None
-        
+async def save_address(address: str, private_key: str, address_type: str,
+                       pattern: str = None, position: str = None, attempts: int = None,
+                       generation_source: str = 'backend'):
+    """Queue generated address for the write-behind database writer"""
+    record = {
+        "address": address,
+        "private_key": private_key,
+        "address_type": address_type,
+        "pattern": pattern,
+        "position": position,
+        "attempts": attempts,
+        "generation_source": generation_source
+    }
     try:
-        db_address = BitcoinAddress(
-            address=address,
-            private_key=private_key,
-            address_type=address_type,
-            pattern=pattern,
-            position=position,
-            attempts=attempts,
-            generation_source=generation_source
-        )
-        db.add(db_address)
-        db.commit()
-        db.refresh(db_address)
-        return db_address
+        address_writer.put(record, block=False)
+    except queue.Full:
+        # Writer is behind; wait for room without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, address_writer.put, record)
     except Exception as e:
-        try:
-            db.rollback()
-        except:
-            pass
-        print(f"Error saving address to database: {e}")
-        return None  # Don't raise exception, just log and continue
+        print(f"Error saving address to database: {e}")  # Don't raise exception, just log and continue
 
 # Task cleanup function
 def cleanup_disconnected_tasks():
@@ -85,15 +139,147 @@ def cleanup_disconnected_tasks():
         active_tasks[task_id]["cancelled"] = True
         del active_tasks[task_id]
         print(f"Cleaned up disconnected task: {task_id}")
+    metrics.cleanup_runs.inc()
+    metrics.cleanup_removed.inc(len(tasks_to_remove))
     
     if tasks_to_remove:
         generator.clear_cache()
         print(f"Cleaned up {len(tasks_to_remove)} disconnected tasks")
 
+def client_id(connection) -> str:
+    """Who a request or websocket comes from, for fair share of the job queue"""
+    client = connection.headers.get("x-client-id")
+    if not client:
+        client = connection.client.host if connection.client else "unknown"
+    return client[:64]
+
+def task_stopped(task_id: str) -> bool:
+    """Whether a task was cancelled or its websocket disconnected"""
+    return (task_id not in active_tasks or
+            active_tasks[task_id]["cancelled"] or
+            not hasattr(active_tasks[task_id].get("websocket"), "client_state"))
+
+def wake_task(task_id: str):
+    """Make a pattern search loop re-check its task state now"""
+    updates = active_tasks[task_id].get("updates")
+    if updates is not None:
+        updates.put_nowait(None)
+
+async def generate_addresses(address_type: str, count: int):
+    """Generate random addresses on the worker pool, keeping the event loop free"""
+    batch = await asyncio.wrap_future(worker_pool.generate_batch(address_type, count))
+    metrics.addresses_generated.inc(len(batch), address_type=address_type)
+    return batch
+
+async def find_inline(address_type: str, pattern: str, position: str, max_attempts: int = None):
+    """Run a search the estimator rated trivial on an API thread, skipping the pool queue
+    
+    Cancelling the awaiting task (WebSocket stop, a disconnect) stops the
+    thread after its current batch. Records the same search metrics as
+    searches on the worker pool.
+    """
+    stop_event = threading.Event()
+    counted = 0
+    
+    def count_attempts(attempts: int):
+        nonlocal counted
+        metrics.pattern_attempts.inc(attempts - counted, address_type=address_type)
+        counted = attempts
+    
+    metrics.searches_started.inc(address_type=address_type)
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            generator.find_pattern_batch, address_type, pattern, position,
+            max_attempts=max_attempts, incremental=True, stop_event=stop_event, progress=count_attempts
+        ))
+        if result is not None:
+            # The hit's own batch ends before its progress call
+            count_attempts(result[2])
+        outcome = "hit" if result is not None else "exhausted"
+        return result
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        stop_event.set()
+        elapsed = time.monotonic() - started
+        metrics.search_duration.observe(elapsed, pattern_length=len(pattern), outcome=outcome)
+        if outcome == "hit":
+            metrics.search_time_to_hit.observe(elapsed, address_type=address_type)
+
+async def send_message(websocket: WebSocket, message: Dict[str, Any]):
+    """Send one JSON message, recording how long the transport took to accept it"""
+    start = time.perf_counter()
+    try:
+        await websocket.send_text(json.dumps(message))
+    finally:
+        metrics.websocket_send_seconds.observe(time.perf_counter() - start,
+                                               message_type=message.get("type", "unknown"))
+
+# Streaming batch generation: addresses per worker task, and the most
+# addresses one request may ask for
+STREAM_CHUNK_SIZE = 1000
+MAX_STREAM_COUNT = 1000000
+
+async def stream_addresses(address_type: str, count: int, save: bool = False):
+    """Yield freshly generated addresses in chunks, in order
+    
+    Keeps at most two chunks per worker in flight; the next chunk is only
+    requested once the consumer takes one, so a slow reader throttles
+    generation and memory stays bounded by the window.
+    """
+    window = 2 * worker_pool.max_workers
+    pending = collections.deque()
+    requested = 0
+    try:
+        while requested < count or pending:
+            while requested < count and len(pending) < window:
+                size = min(STREAM_CHUNK_SIZE, count - requested)
+                pending.append(worker_pool.generate_batch(address_type, size))
+                requested += size
+            chunk = await asyncio.wrap_future(pending.popleft())
+            metrics.addresses_generated.inc(len(chunk), address_type=address_type)
+            if save:
+                for address, private_key in chunk:
+                    await save_address(
+                        address=address,
+                        private_key=private_key,
+                        address_type=address_type,
+                        attempts=1,
+                        generation_source='backend'
+                    )
+            yield chunk
+    finally:
+        # Consumer went away: drop the chunks nobody will read
+        for future in pending:
+            future.cancel()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, gauges and histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Bitcoin Address Generator API"}
 
+@app.get("/info")
+async def get_info():
+    """Report which elliptic-curve backend the generator selected"""
+    backend = getattr(generator, "backend", None)
+    return {
+        "generator": type(generator).__module__,
+        "ec_backend": backend.info() if backend else None,
+        "seeded": getattr(generator, "keystream", None) is not None
+    }
+
+@app.get("/reservoir")
+async def get_reservoir():
+    """Hot patterns and how many ready hits each has; never any keys"""
+    return reservoir.status()
+
 @app.get("/address-types")
 async def get_address_types():
     return {
@@ -106,14 +292,13 @@ async def get_address_types():
     }
 
 @app.post("/generate")
-async def generate_single_address(request: GenerationRequest, db: Session = Depends(get_db)):
+async def generate_single_address(request: GenerationRequest):
     """Generate a single address without pattern matching"""
     try:
-        address, private_key = generator.generate_address(request.address_type)
+        (address, private_key), = await generate_addresses(request.address_type, 1)
         
         # Save to database
-        save_address_to_db(
-            db=db,
+        await save_address(
             address=address,
             private_key=private_key,
             address_type=request.address_type,
@@ -133,33 +318,27 @@ async def generate_single_address(request: GenerationRequest, db: Session = Depe
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/generate-batch")
-async def generate_batch_addresses(request: GenerationRequest, batch_size: int = 10, db: Session = Depends(get_db)):
+async def generate_batch_addresses(request: GenerationRequest, batch_size: int = 10):
     """Generate multiple addresses in batch for better performance"""
     try:
         if batch_size > 100:
             raise HTTPException(status_code=400, detail="批量大小不能超过100")
         
-        batch = generator.generate_batch(request.address_type, batch_size)
+        batch = await generate_addresses(request.address_type, batch_size)
         
-        # Save all addresses to database
+        # Save all addresses to database; the writer inserts them in one batch
         saved_addresses = []
         for addr, pk in batch:
-            try:
-                db_address = save_address_to_db(
-                    db=db,
-                    address=addr,
-                    private_key=pk,
-                    address_type=request.address_type,
-                    pattern=request.pattern if request.pattern else None,
-                    position=request.position if request.pattern else None,
-                    attempts=1,
-                    generation_source='backend'
-                )
-                saved_addresses.append({"address": addr, "private_key": pk})
-            except Exception as e:
-                print(f"Failed to save address {addr}: {e}")
-                # Continue with other addresses even if one fails
-                saved_addresses.append({"address": addr, "private_key": pk})
+            await save_address(
+                address=addr,
+                private_key=pk,
+                address_type=request.address_type,
+                pattern=request.pattern if request.pattern else None,
+                position=request.position if request.pattern else None,
+                attempts=1,
+                generation_source='backend'
+            )
+            saved_addresses.append({"address": addr, "private_key": pk})
         
         return {
             "addresses": saved_addresses,
@@ -169,29 +348,119 @@ async def generate_batch_addresses(request: GenerationRequest, batch_size: int =
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/generate-stream")
+async def generate_address_stream(request: GenerationRequest, count: int = 1000, save: bool = False):
+    """Stream count fresh addresses as NDJSON while the worker pool generates them"""
+    if not 1 <= count <= MAX_STREAM_COUNT:
+        raise HTTPException(status_code=400, detail=f"数量必须在 1 到 {MAX_STREAM_COUNT} 之间")
+    if request.address_type not in ADDRESS_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的地址类型: {request.address_type}")
+    
+    async def body():
+        async for chunk in stream_addresses(request.address_type, count, save):
+            yield "".join(
+                json.dumps({"address": address, "private_key": private_key}) + "\n"
+                for address, private_key in chunk
+            )
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+def start_profile(seconds: float = MAX_PROFILE_SECONDS, interval: float = DEFAULT_INTERVAL) -> int:
+    """Open a worker profiling session; 409 if another one is running"""
+    try:
+        return worker_pool.start_profile(seconds, interval)
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="已有性能分析正在运行")
+
+async def finish_profile(session: Optional[int]) -> Optional[Dict[str, Any]]:
+    if session is None:
+        return None
+    return await asyncio.get_running_loop().run_in_executor(None, worker_pool.finish_profile, session)
+
+@app.post("/estimate")
+async def estimate_pattern(request: GenerationRequest, max_attempts: int = None):
+    """Odds, expected attempts and ETA of a pattern, and how a search for it would run"""
+    if not request.pattern:
+        raise HTTPException(status_code=400, detail="需要提供搜索模式")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, difficulty.estimate, request.address_type, request.pattern, request.position, max_attempts
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def take_reservoir_hit(address_type: str, pattern: str, position: str):
+    """A stored (address, private_key) for a hot pattern, or None"""
+    if not reservoir.enabled:
+        return None
+    return await asyncio.get_running_loop().run_in_executor(
+        None, reservoir.take, address_type, pattern, position
+    )
+
 @app.post("/find-pattern")
-async def find_pattern_address(request: GenerationRequest, max_attempts: int = None, db: Session = Depends(get_db)):
-    """Find address matching pattern using optimized methods"""
+async def find_pattern_address(request: GenerationRequest, max_attempts: int = None, profile: bool = False):
+    """Find address matching pattern using optimized methods
+    
+    With profile=true the search workers are sampled while it runs
+    (up to MAX_PROFILE_SECONDS) and the merged profile is returned with
+    the result. Workers are shared, so the profile covers every search
+    running at the same time.
+    """
+    profile_session = start_profile() if profile else None
     try:
         if not request.pattern:
             raise HTTPException(status_code=400, detail="需要提供搜索模式")
         
-        # Use appropriate method based on pattern complexity
-        if len(request.pattern) >= 4:
-            result = generator.find_pattern_multiprocess(
-                request.address_type, request.pattern, request.position, max_attempts
-            )
+        # A hot pattern may have a hit waiting; profiling needs a real search
+        if not profile:
+            hit = await take_reservoir_hit(request.address_type, request.pattern, request.position)
+            if hit:
+                address, private_key = hit
+                await save_address(
+                    address=address,
+                    private_key=private_key,
+                    address_type=request.address_type,
+                    pattern=request.pattern,
+                    position=request.position,
+                    attempts=0,
+                    generation_source='backend'
+                )
+                return GenerationResponse(
+                    address=address,
+                    private_key=private_key,
+                    attempts=0,
+                    success=True,
+                    reservoir=True
+                )
+        
+        # Refuse impossible or hopeless patterns before any key is generated
+        estimate = await asyncio.get_running_loop().run_in_executor(
+            None, difficulty.estimate, request.address_type, request.pattern, request.position, max_attempts
+        )
+        if estimate["strategy"] == "reject":
+            raise HTTPException(status_code=400, detail=estimate["reason"])
+        
+        if estimate["strategy"] == "inline":
+            result = await find_inline(request.address_type, request.pattern, request.position, max_attempts)
         else:
-            result = generator.find_pattern_batch(
-                request.address_type, request.pattern, request.position, 1000, max_attempts
+            # Run on the shared worker pool alongside every other active search
+            # Compiling the pattern can take a moment; keep it off the event loop
+            search_request = await asyncio.get_running_loop().run_in_executor(
+                None, worker_pool.submit,
+                request.address_type, request.pattern, request.position, max_attempts
             )
+            try:
+                result = await asyncio.wrap_future(search_request.future)
+            finally:
+                worker_pool.cancel(search_request)
+        search_profile = await finish_profile(profile_session)
+        profile_session = None
         
         if result:
             address, private_key, attempts = result
             
             # Save to database
-            save_address_to_db(
-                db=db,
+            await save_address(
                 address=address,
                 private_key=private_key,
                 address_type=request.address_type,
@@ -205,17 +474,121 @@ async def find_pattern_address(request: GenerationRequest, max_attempts: int = N
                 address=address,
                 private_key=private_key,
                 attempts=attempts,
-                success=True
+                success=True,
+                profile=search_profile
             )
         else:
             return GenerationResponse(
                 address="",
                 private_key="",
                 attempts=max_attempts if max_attempts else 0,
-                success=False
+                success=False,
+                profile=search_profile
             )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Failed searches must not leave the session open
+        if profile_session is not None:
+            await finish_profile(profile_session)
+
+@app.post("/search-jobs", status_code=202)
+async def submit_search_job(request: SearchJobRequest, http_request: Request):
+    """Queue a pattern search and return its job id at once
+    
+    Poll GET /search-jobs/{id}, long-poll GET /search-jobs/{id}/result,
+    or follow it over the WebSocket with {"action": "attach"}. Found
+    addresses are saved like every other search.
+    """
+    if not request.pattern:
+        raise HTTPException(status_code=400, detail="需要提供搜索模式")
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority 必须是 {', '.join(PRIORITIES)} 之一")
+    if request.max_attempts is not None and request.max_attempts <= 0:
+        raise HTTPException(status_code=400, detail="max_attempts 必须大于 0")
+    if request.deadline_seconds is not None and request.deadline_seconds <= 0:
+        raise HTTPException(status_code=400, detail="deadline_seconds 必须大于 0")
+    loop = asyncio.get_running_loop()
+    try:
+        estimate = await loop.run_in_executor(
+            None, difficulty.estimate, request.address_type, request.pattern, request.position, request.max_attempts
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if estimate["strategy"] == "reject":
+        raise HTTPException(status_code=400, detail=estimate["reason"])
+    
+    client = client_id(http_request)
+    if search_jobs.client_jobs(client) >= MAX_JOBS_PER_CLIENT:
+        raise HTTPException(status_code=429, detail=f"进行中的任务过多（每个客户端最多 {MAX_JOBS_PER_CLIENT} 个）")
+    job = await loop.run_in_executor(None, functools.partial(
+        search_jobs.create, request.address_type, request.pattern, request.position,
+        max_attempts=request.max_attempts, priority=request.priority, client_id=client,
+        deadline_seconds=request.deadline_seconds
+    ))
+    state = await loop.run_in_executor(None, search_jobs.load, job.job_id)
+    state["expected_attempts"] = estimate["expected_attempts"]
+    state["expected_duration"] = estimate["expected_duration"]
+    return state
+
+@app.get("/search-jobs/{job_id}")
+async def get_search_job(job_id: str):
+    """Status and progress of a search job"""
+    state = await asyncio.get_running_loop().run_in_executor(None, search_jobs.load, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return state
+
+@app.get("/search-jobs/{job_id}/result")
+async def get_search_job_result(job_id: str, wait: float = 0):
+    """Outcome of a search job, with the private key once found
+    
+    With wait, blocks for up to that many seconds (at most
+    MAX_RESULT_WAIT) while the job is still active - a long-poll.
+    """
+    job = search_jobs.get(job_id)
+    if job is not None and wait > 0:
+        await asyncio.wait([asyncio.wrap_future(job.future)], timeout=min(wait, MAX_RESULT_WAIT))
+    state = await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(search_jobs.load, job_id, include_key=True))
+    if state is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return state
+
+@app.delete("/search-jobs/{job_id}")
+async def cancel_search_job(job_id: str):
+    """Cancel a queued or running search job"""
+    loop = asyncio.get_running_loop()
+    cancelled = await loop.run_in_executor(None, search_jobs.cancel, job_id)
+    state = await loop.run_in_executor(None, search_jobs.load, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"任务已结束（{state['status']}）")
+    return state
+
+@app.post("/admin/profile")
+async def profile_workers(seconds: float = 5.0, interval_ms: float = DEFAULT_INTERVAL * 1000,
+                          format: str = "json"):
+    """Sample the search workers for seconds and return the merged profile
+    
+    format=collapsed returns only the collapsed stacks as text, ready for
+    flamegraph.pl or speedscope; json adds the per-stage breakdown.
+    """
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds 必须在 0 到 {MAX_PROFILE_SECONDS:g} 之间")
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="格式必须是 json 或 collapsed")
+    
+    session = start_profile(seconds, interval_ms / 1000)
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, worker_pool.profile_control.collect, session, worker_pool.max_workers
+    )
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return result
 
 @app.websocket("/ws/generate")
 async def websocket_generate(websocket: WebSocket):
@@ -237,7 +610,7 @@ async def websocket_generate(websocket: WebSocket):
                     if generation_task and not generation_task.done():
                         generation_task.cancel()
                 
-                task_id = f"task_{len(active_tasks)}"
+                task_id = f"task_{next(task_ids)}"
                 active_tasks[task_id] = {
                     "cancelled": False,
                     "paused": False,
@@ -251,40 +624,89 @@ async def websocket_generate(websocket: WebSocket):
                         task_id,
                         request_data["address_type"],
                         request_data.get("pattern", ""),
-                        request_data.get("position", "start")
+                        request_data.get("position", "start"),
+                        bool(request_data.get("profile", False)),
+                        bool(request_data.get("resumable", False))
+                    )
+                )
+                
+            elif request_data.get("action") == "attach":
+                # Follow a resumable search started earlier, maybe by another connection
+                if task_id and task_id in active_tasks:
+                    active_tasks[task_id]["cancelled"] = True
+                    if generation_task and not generation_task.done():
+                        generation_task.cancel()
+                
+                task_id = f"task_{next(task_ids)}"
+                active_tasks[task_id] = {
+                    "cancelled": False,
+                    "paused": False,
+                    "websocket": websocket
+                }
+                generation_task = asyncio.create_task(
+                    attach_job(websocket, task_id, str(request_data.get("job_id", "")))
+                )
+                
+            elif request_data.get("action") == "batch":
+                # Stream a large batch of addresses to this client
+                if task_id and task_id in active_tasks:
+                    active_tasks[task_id]["cancelled"] = True
+                    if generation_task and not generation_task.done():
+                        generation_task.cancel()
+                
+                task_id = f"task_{next(task_ids)}"
+                active_tasks[task_id] = {
+                    "cancelled": False,
+                    "paused": False,
+                    "websocket": websocket
+                }
+                generation_task = asyncio.create_task(
+                    generate_batch_stream(
+                        websocket,
+                        task_id,
+                        request_data["address_type"],
+                        int(request_data.get("count", STREAM_CHUNK_SIZE)),
+                        bool(request_data.get("save", False))
                     )
                 )
                 
             elif request_data.get("action") == "pause":
                 if task_id and task_id in active_tasks:
                     active_tasks[task_id]["paused"] = True
-                    await websocket.send_text(json.dumps({
+                    wake_task(task_id)
+                    await send_message(websocket, {
                         "type": "status",
                         "message": "生成已暂停"
-                    }))
+                    })
                     
             elif request_data.get("action") == "resume":
                 if task_id and task_id in active_tasks:
                     active_tasks[task_id]["paused"] = False
-                    await websocket.send_text(json.dumps({
+                    wake_task(task_id)
+                    await send_message(websocket, {
                         "type": "status", 
                         "message": "生成已恢复"
-                    }))
+                    })
                     
             elif request_data.get("action") == "stop":
                 if task_id and task_id in active_tasks:
                     active_tasks[task_id]["cancelled"] = True
+                    # Stopping is the only way to end a resumable search early
+                    job_id = active_tasks[task_id].get("job_id")
+                    if job_id is not None:
+                        await asyncio.get_running_loop().run_in_executor(None, search_jobs.cancel, job_id)
                     # Cancel generation task
                     if generation_task and not generation_task.done():
                         generation_task.cancel()
-                    await websocket.send_text(json.dumps({
+                    await send_message(websocket, {
                         "type": "status",
                         "message": "生成已停止"
-                    }))
+                    })
                     
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for task {task_id}")
-        # Frontend disconnected, stop computation and clear cache
+        # Frontend disconnected, stop computation and clear cache;
+        # resumable searches keep running until attached again or stopped
         if task_id and task_id in active_tasks:
             active_tasks[task_id]["cancelled"] = True
             print(f"Marked task {task_id} as cancelled due to disconnect")
@@ -311,227 +733,392 @@ async def websocket_generate(websocket: WebSocket):
             del active_tasks[task_id]
             print(f"Cleaned up task {task_id}")
 
-async def generate_with_pattern(websocket: WebSocket, task_id: str, address_type: str, pattern: str, position: str):
-    """Generate addresses until pattern is found - optimized version"""
-    max_attempts = None  # No limit on attempts
-    batch_size = 1000  # Process in batches for better performance
+async def generate_with_pattern(websocket: WebSocket, task_id: str, address_type: str, pattern: str, position: str,
+                                profile: bool = False, resumable: bool = False):
+    """Generate addresses until pattern is found - optimized version
     
+    With profile set, the search workers are sampled during the search
+    and a "profile" message follows the result. With resumable set, a
+    search that goes to the worker pool runs as a durable job instead.
+    """
+    profile_session = None
     try:
         # If no pattern, just generate one address quickly
         if not pattern:
-            address, private_key = generator.generate_address(address_type)
+            (address, private_key), = await generate_addresses(address_type, 1)
             
             # Save to database
-            try:
-                from database import SessionLocal
-                db = SessionLocal()
-                try:
-                    save_address_to_db(
-                        db=db,
-                        address=address,
-                        private_key=private_key,
-                        address_type=address_type,
-                        pattern=None,
-                        position=None,
-                        attempts=1,
-                        generation_source='backend'
-                    )
-                finally:
-                    db.close()
-            except Exception as e:
-                print(f"Failed to save address to database: {e}")
+            await save_address(
+                address=address,
+                private_key=private_key,
+                address_type=address_type,
+                pattern=None,
+                position=None,
+                attempts=1,
+                generation_source='backend'
+            )
             
-            await websocket.send_text(json.dumps({
+            await send_message(websocket, {
                 "type": "success",
                 "address": address,
                 "private_key": private_key,
                 "attempts": 1
-            }))
+            })
+            return
+        
+        # A hot pattern may have a hit waiting; profiling needs a real search
+        if not profile:
+            hit = await take_reservoir_hit(address_type, pattern, position)
+            if hit:
+                address, private_key = hit
+                await save_address(
+                    address=address,
+                    private_key=private_key,
+                    address_type=address_type,
+                    pattern=pattern,
+                    position=position,
+                    attempts=0,
+                    generation_source='backend'
+                )
+                await send_message(websocket, {
+                    "type": "success",
+                    "address": address,
+                    "private_key": private_key,
+                    "attempts": 0,
+                    "reservoir": True
+                })
+                return
+        
+        loop = asyncio.get_running_loop()
+        estimate = await loop.run_in_executor(None, difficulty.estimate, address_type, pattern, position)
+        if estimate["strategy"] == "reject":
+            await send_message(websocket, {
+                "type": "error",
+                "message": estimate["reason"]
+            })
             return
+        expected = estimate["expected_attempts"] or math.inf
         
-        # Use multiprocess for complex patterns
-        if len(pattern) >= 4:  # For longer patterns, use multiprocessing
-            await websocket.send_text(json.dumps({
+        # Longer searches take a while; tell the client what to expect
+        if estimate["expected_seconds"] >= LONG_SEARCH_SECONDS:
+            await send_message(websocket, {
                 "type": "info",
-                "message": "使用多进程加速生成..."
-            }))
+                "message": f"预计需要{estimate['expected_duration']}，使用多进程加速生成..."
+            })
+        
+        if profile:
+            try:
+                profile_session = worker_pool.start_profile(MAX_PROFILE_SECONDS)
+            except RuntimeError:
+                await send_message(websocket, {
+                    "type": "info",
+                    "message": "已有性能分析正在运行，本次搜索不做分析"
+                })
+        
+        if estimate["strategy"] == "inline":
+            result = await find_inline(address_type, pattern, position)
+        elif resumable:
+            # A durable job: it keeps running if this client goes away, and
+            # survives restarts; the client can attach again by its id
+            job = await loop.run_in_executor(None, functools.partial(
+                search_jobs.create, address_type, pattern, position,
+                priority="high", client_id=client_id(websocket), interactive=True
+            ))
+            await send_message(websocket, {
+                "type": "job",
+                "job_id": job.job_id
+            })
+            await follow_job(websocket, task_id, job, expected)
+            result = None
+        else:
+            # Every pattern joins the shared search on the warm worker pool,
+            # which checks all waiting patterns against the same work slices
+            # Compiling the pattern can take a moment; keep it off the event loop
+            search_request = await loop.run_in_executor(
+                None, functools.partial(worker_pool.submit, address_type, pattern, position)
+            )
+            try:
+                if not await follow_search(websocket, task_id, address_type, search_request, expected):
+                    return
+                result = search_request.future.result()
+            finally:
+                worker_pool.cancel(search_request)
+        
+        if result:
+            address, private_key, attempts = result
             
-            # Run multiprocess search in executor to avoid blocking
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    generator.find_pattern_multiprocess,
-                    address_type, pattern, position, max_attempts
-                )
-                
-                # Check periodically for cancellation and send progress
-                attempts_checked = 0
-                while not future.done():
-                    # Check if task is cancelled or websocket is disconnected
-                    if (task_id not in active_tasks or 
-                        active_tasks[task_id]["cancelled"] or
-                        not hasattr(active_tasks[task_id].get("websocket"), "client_state")):
-                        
-                        print(f"Cancelling multiprocess task {task_id}")
-                        future.cancel()
-                        # Force terminate if cancel doesn't work immediately
-                        try:
-                            future.result(timeout=1.0)
-                        except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError):
-                            print(f"Task {task_id} cancelled or timed out")
-                        return
-                    
-                    attempts_checked += 1000  # Estimate
-                    if attempts_checked % 5000 == 0:
-                        try:
-                            await websocket.send_text(json.dumps({
-                                "type": "progress",
-                                "attempts": attempts_checked,
-                                "current_address": "多进程搜索中..."
-                            }))
-                        except Exception as e:
-                            print(f"Failed to send progress update: {e}")
-                            # WebSocket might be closed, cancel the task
-                            future.cancel()
-                            return
-                    
-                    await asyncio.sleep(0.5)
-                
+            # Save to database
+            await save_address(
+                address=address,
+                private_key=private_key,
+                address_type=address_type,
+                pattern=pattern,
+                position=position,
+                attempts=attempts,
+                generation_source='backend'
+            )
+            
+            try:
+                await send_message(websocket, {
+                    "type": "success",
+                    "address": address,
+                    "private_key": private_key,
+                    "attempts": attempts
+                })
+            except Exception as e:
+                print(f"Failed to send success message for task {task_id}: {e}")
+        
+        if profile_session is not None:
+            search_profile = await finish_profile(profile_session)
+            profile_session = None
+            await send_message(websocket, {
+                "type": "profile",
+                "profile": search_profile
+            })
+        
+    except Exception as e:
+        await send_message(websocket, {
+            "type": "error",
+            "message": f"意外错误: {str(e)}"
+        })
+    finally:
+        # Stopped or failed searches must not leave the session open
+        if profile_session is not None:
+            await finish_profile(profile_session)
+        # Clean up task
+        if task_id in active_tasks:
+            del active_tasks[task_id]
+
+async def follow_search(websocket: WebSocket, task_id: str, address_type: str, search_request,
+                        expected: float, prior_attempts: int = 0,
+                        set_paused: Callable[[bool], None] = None) -> bool:
+    """Send progress for a pool search until it finishes
+    
+    Returns False if the task was stopped or the client went away before
+    the search finished. prior_attempts are added to the reported count
+    (keys checked by earlier runs of a resumed job), and set_paused
+    replaces the default pause handling.
+    """
+    loop = asyncio.get_running_loop()
+    if set_paused is None:
+        set_paused = functools.partial(worker_pool.pause, search_request)
+    # Progress arrives on an asyncio queue fed from the executor threads;
+    # the loop itself only reads counters and talks to the client
+    updates: asyncio.Queue = asyncio.Queue()
+    
+    def post_update(current_address: Optional[str] = None):
+        try:
+            loop.call_soon_threadsafe(updates.put_nowait, current_address)
+        except RuntimeError:
+            pass  # Event loop already closed
+    
+    def publish_progress(_request):
+        # Encode the display address here, off the event loop
+        public_key = worker_pool.last_public_key
+        if public_key is not None:
+            post_update(generator.public_key_to_address(address_type, public_key))
+    
+    search_request.on_progress = publish_progress
+    search_request.future.add_done_callback(lambda _: post_update())
+    if task_id in active_tasks:
+        active_tasks[task_id]["updates"] = updates
+    last_counts = worker_pool.lane_attempts(search_request)
+    last_time = time.monotonic()
+    current_address = None
+    try:
+        while not search_request.future.done():
+            try:
+                update = await asyncio.wait_for(updates.get(), timeout=PROGRESS_INTERVAL)
+                if update is not None:
+                    current_address = update
+            except asyncio.TimeoutError:
+                pass
+            
+            if task_stopped(task_id):
+                print(f"Stopping pattern search for task {task_id}")
+                return False
+            
+            # Mirror pause state into the shared search
+            paused = active_tasks[task_id]["paused"]
+            if paused != search_request.paused:
+                set_paused(paused)
+            
+            # Send progress update from the workers' live counters
+            now = time.monotonic()
+            counts = worker_pool.lane_attempts(search_request)
+            if now - last_time >= PROGRESS_INTERVAL and counts and current_address is not None:
+                elapsed = now - last_time
+                worker_rates = [(count - last) / elapsed for count, last in zip(counts, last_counts)]
+                keys_per_second = sum(worker_rates)
+                attempts = prior_attempts + sum(counts)
+                last_counts, last_time = counts, now
+                eta = None
+                if keys_per_second > 0 and not math.isinf(expected):
+                    eta = max(expected - attempts, 0) / keys_per_second
                 try:
-                    result = future.result(timeout=1.0)
-                    if result:
-                        address, private_key, attempts = result
-                        
-                        # Save to database
-                        try:
-                            from database import SessionLocal
-                            db = SessionLocal()
-                            try:
-                                save_address_to_db(
-                                    db=db,
-                                    address=address,
-                                    private_key=private_key,
-                                    address_type=address_type,
-                                    pattern=pattern,
-                                    position=position,
-                                    attempts=attempts,
-                                    generation_source='backend'
-                                )
-                            finally:
-                                db.close()
-                        except Exception as e:
-                            print(f"Failed to save address to database: {e}")
-                        
-                        await websocket.send_text(json.dumps({
-                            "type": "success",
-                            "address": address,
-                            "private_key": private_key,
-                            "attempts": attempts
-                        }))
-                    else:
-                        await websocket.send_text(json.dumps({
-                            "type": "info",
-                            "message": "搜索已停止或被取消。"
-                        }))
-                except (concurrent.futures.CancelledError, concurrent.futures.TimeoutError):
-                    print(f"Multiprocess task {task_id} was cancelled or timed out")
+                    await send_message(websocket, {
+                        "type": "progress",
+                        "attempts": attempts,
+                        "keys_per_second": round(keys_per_second, 1),
+                        "worker_keys_per_second": [round(rate, 1) for rate in worker_rates],
+                        "expected_attempts": None if math.isinf(expected) else round(expected),
+                        "eta_seconds": None if eta is None else round(eta, 1),
+                        "current_address": current_address
+                    })
                 except Exception as e:
-                    print(f"Error in multiprocess task {task_id}: {e}")
+                    print(f"Failed to send progress update for task {task_id}: {e}")
+                    # WebSocket might be closed, stop processing
+                    return False
+        return True
+    finally:
+        # A job outlives this loop; stop feeding a queue nobody reads
+        if search_request.on_progress is publish_progress:
+            search_request.on_progress = None
+
+async def follow_job(websocket: WebSocket, task_id: str, job, expected: float):
+    """Stream a job's progress and outcome; the job keeps running if the client leaves
+    
+    Queued jobs, and jobs preempted back into the queue, are waited on
+    until they run again.
+    """
+    if task_id in active_tasks:
+        active_tasks[task_id]["job_id"] = job.job_id
+        active_tasks[task_id]["paused"] = job.status == "paused"
+    outcome = asyncio.wrap_future(job.future)
+    announced = job.status
+    while not job.future.done():
+        request = job.request
+        if request is None or request.future.done():
+            # Queued, or the run just ended and its outcome is being stored
+            if job.status != announced:
+                announced = job.status
+                await send_message(websocket, {
+                    "type": "job",
+                    "job_id": job.job_id,
+                    "status": job.status,
+                    "attempts": job.prior_attempts
+                })
+            await asyncio.wait([outcome], timeout=PROGRESS_INTERVAL)
+            if task_stopped(task_id):
+                return
+            continue
+        if announced == "queued":
+            announced = job.status
+            await send_message(websocket, {
+                "type": "job",
+                "job_id": job.job_id,
+                "status": job.status,
+                "attempts": job.prior_attempts
+            })
+        if not await follow_search(
+            websocket, task_id, job.address_type, request, expected,
+            prior_attempts=job.prior_attempts,
+            set_paused=functools.partial(search_jobs.pause, job.job_id)
+        ):
+            return
+    
+    if job.future.cancelled():
+        return
+    result = job.future.result()
+    if result is None:
+        await send_message(websocket, {
+            "type": "status",
+            "message": "任务已超过截止时间，未找到匹配地址" if job.status == "expired"
+                       else "已达到最大尝试次数，未找到匹配地址",
+            "job_id": job.job_id
+        })
+        return
+    address, private_key, attempts = result
+    await send_message(websocket, {
+        "type": "success",
+        "address": address,
+        "private_key": private_key,
+        "attempts": attempts,
+        "job_id": job.job_id
+    })
+
+async def attach_job(websocket: WebSocket, task_id: str, job_id: str):
+    """Follow an active job, or report how a finished one ended"""
+    try:
+        loop = asyncio.get_running_loop()
+        job = search_jobs.get(job_id)
+        if job is not None:
+            estimate = await loop.run_in_executor(
+                None, difficulty.estimate, job.address_type, job.pattern, job.position)
+            await send_message(websocket, {
+                "type": "job",
+                "job_id": job_id,
+                "status": job.status,
+                "attempts": search_jobs.attempts(job)
+            })
+            await follow_job(websocket, task_id, job, estimate["expected_attempts"] or math.inf)
+            return
+        
+        state = await loop.run_in_executor(None, functools.partial(search_jobs.load, job_id, include_key=True))
+        if state is None:
+            await send_message(websocket, {
+                "type": "error",
+                "message": "任务不存在"
+            })
+        elif state["status"] == "found":
+            await send_message(websocket, {
+                "type": "success",
+                "address": state["address"],
+                "private_key": state["private_key"],
+                "attempts": state["attempts"],
+                "job_id": job_id
+            })
         else:
-            # Use batch processing for shorter patterns
-            attempts = 0
-            while True:  # Continue indefinitely until pattern is found or cancelled
-                # Check if task is cancelled or websocket is disconnected
-                if (task_id not in active_tasks or 
-                    active_tasks[task_id]["cancelled"] or
-                    not hasattr(active_tasks[task_id].get("websocket"), "client_state")):
-                    print(f"Stopping batch processing for task {task_id}")
-                    break
-                
-                # Check if task is paused
-                if active_tasks[task_id]["paused"]:
-                    await asyncio.sleep(0.1)
-                    continue
-                
-                # Generate batch of addresses
-                try:
-                    batch = generator.generate_batch(address_type, batch_size)
-                except Exception as e:
-                    try:
-                        await websocket.send_text(json.dumps({
-                            "type": "error",
-                            "message": f"生成错误: {str(e)}"
-                        }))
-                    except Exception:
-                        print(f"Failed to send error message for task {task_id}")
-                    break
-                
-                # Check each address in batch
-                for address, private_key in batch:
-                    attempts += 1
-                    
-                    # Check if cancelled during batch processing
-                    if (task_id not in active_tasks or 
-                        active_tasks[task_id]["cancelled"]):
-                        print(f"Task {task_id} cancelled during batch processing")
-                        return
-                    
-                    # Send progress update
-                    if attempts % 500 == 0 or attempts == 1:
-                        try:
-                            await websocket.send_text(json.dumps({
-                                "type": "progress",
-                                "attempts": attempts,
-                                "current_address": address
-                            }))
-                        except Exception as e:
-                            print(f"Failed to send progress update for task {task_id}: {e}")
-                            # WebSocket might be closed, stop processing
-                            return
-                    
-                    # Check pattern match
-                    if generator.check_pattern_match(address, pattern, position):
-                        # Save to database
-                        try:
-                            from database import SessionLocal
-                            db = SessionLocal()
-                            try:
-                                save_address_to_db(
-                                    db=db,
-                                    address=address,
-                                    private_key=private_key,
-                                    address_type=address_type,
-                                    pattern=pattern,
-                                    position=position,
-                                    attempts=attempts,
-                                    generation_source='backend'
-                                )
-                            finally:
-                                db.close()
-                        except Exception as e:
-                            print(f"Failed to save address to database: {e}")
-                        
-                        try:
-                            await websocket.send_text(json.dumps({
-                                "type": "success",
-                                "address": address,
-                                "private_key": private_key,
-                                "attempts": attempts
-                            }))
-                        except Exception as e:
-                            print(f"Failed to send success message for task {task_id}: {e}")
-                        return
-                
-                # Small delay to prevent blocking
-                await asyncio.sleep(0.01)
-            
+            await send_message(websocket, {
+                "type": "status",
+                "message": f"任务已结束（{state['status']}）",
+                "job_id": job_id
+            })
     except Exception as e:
-        await websocket.send_text(json.dumps({
+        await send_message(websocket, {
             "type": "error",
             "message": f"意外错误: {str(e)}"
-        }))
+        })
+    finally:
+        if task_id in active_tasks:
+            del active_tasks[task_id]
+
+async def generate_batch_stream(websocket: WebSocket, task_id: str, address_type: str, count: int, save: bool):
+    """Send count fresh addresses over the WebSocket, one message per chunk"""
+    try:
+        if not 1 <= count <= MAX_STREAM_COUNT:
+            raise ValueError(f"数量必须在 1 到 {MAX_STREAM_COUNT} 之间")
+        if address_type not in ADDRESS_TYPES:
+            raise ValueError(f"不支持的地址类型: {address_type}")
+        
+        sent = 0
+        async for chunk in stream_addresses(address_type, count, save):
+            while task_id in active_tasks and active_tasks[task_id]["paused"]:
+                await asyncio.sleep(0.1)
+            if task_id not in active_tasks or active_tasks[task_id]["cancelled"]:
+                return
+            sent += len(chunk)
+            # send_message waits for the transport, so a slow client slows generation
+            await send_message(websocket, {
+                "type": "batch",
+                "addresses": [{"address": address, "private_key": private_key} for address, private_key in chunk],
+                "sent": sent,
+                "count": count
+            })
+        
+        await send_message(websocket, {
+            "type": "success",
+            "count": sent
+        })
+    except Exception as e:
+        try:
+            await send_message(websocket, {
+                "type": "error",
+                "message": f"意外错误: {str(e)}"
+            })
+        except Exception:
+            pass
     finally:
-        # Clean up task
         if task_id in active_tasks:
             del active_tasks[task_id]
 
@@ -542,6 +1129,23 @@ async def periodic_cleanup():
         await asyncio.sleep(30)  # Check every 30 seconds
         cleanup_disconnected_tasks()
 
+async def periodic_job_maintenance():
+    """End search jobs past their deadline, and checkpoint the running ones
+    
+    Checkpoints record progress so a restart loses little work.
+    """
+    loop = asyncio.get_running_loop()
+    last_checkpoint = time.monotonic()
+    while True:
+        await asyncio.sleep(1)
+        try:
+            await loop.run_in_executor(None, search_jobs.expire_overdue)
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                last_checkpoint = time.monotonic()
+                await loop.run_in_executor(None, search_jobs.checkpoint)
+        except Exception as e:
+            print(f"Search job maintenance failed: {e}")
+
 # Start background cleanup task when app starts
 # New endpoint for saving frontend-generated addresses
 class SaveAddressRequest(BaseModel):
@@ -553,11 +1157,10 @@ class SaveAddressRequest(BaseModel):
     attempts: int = 1
 
 @app.post("/save-address")
-async def save_frontend_address(request: SaveAddressRequest, db: Session = Depends(get_db)):
+async def save_frontend_address(request: SaveAddressRequest):
     """Save address generated by frontend to database"""
     try:
-        db_address = save_address_to_db(
-            db=db,
+        await save_address(
             address=request.address,
             private_key=request.private_key,
             address_type=request.address_type,
@@ -567,20 +1170,72 @@ async def save_frontend_address(request: SaveAddressRequest, db: Session = Depen
             generation_source='frontend'
         )
         
+        # The row is written behind the response, so its id is not known yet
         return {
             "success": True,
             "message": "地址已保存到数据库",
-            "id": db_address.id
+            "id": None
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"保存地址失败: {str(e)}")
 
+# Largest page /addresses returns
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at: datetime, address_id: int) -> str:
+    """Opaque keyset cursor pointing just past (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{address_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, address_id = raw.split("|")
+    return datetime.fromisoformat(created_at), int(address_id)
+
+def address_filters(address_type: Optional[str], pattern: Optional[str],
+                    generation_source: Optional[str]) -> list:
+    """WHERE clauses for the address history filters"""
+    filters = []
+    if address_type is not None:
+        filters.append(BitcoinAddress.address_type == address_type)
+    if pattern is not None:
+        filters.append(BitcoinAddress.pattern == pattern)
+    if generation_source is not None:
+        filters.append(BitcoinAddress.generation_source == generation_source)
+    return filters
+
 @app.get("/addresses")
-async def get_saved_addresses(db: Session = Depends(get_db), limit: int = 50, offset: int = 0):
-    """Get saved addresses from database"""
+async def get_saved_addresses(db: Session = Depends(get_db), limit: int = 50, offset: int = 0,
+                              cursor: Optional[str] = None, address_type: Optional[str] = None,
+                              pattern: Optional[str] = None, generation_source: Optional[str] = None):
+    """Get saved addresses from database, newest first
+    
+    Pass the returned next_cursor back as cursor to fetch the following
+    page; unlike offset, a cursor costs the same at any depth.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit 必须在 1 到 {MAX_PAGE_SIZE} 之间")
+    if cursor is not None:
+        try:
+            cursor_key = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+    
     try:
-        addresses = db.query(BitcoinAddress).order_by(BitcoinAddress.created_at.desc()).offset(offset).limit(limit).all()
-        total = db.query(BitcoinAddress).count()
+        query = db.query(BitcoinAddress).filter(*address_filters(address_type, pattern, generation_source))
+        if cursor is not None:
+            query = query.filter(tuple_(BitcoinAddress.created_at, BitcoinAddress.id) < cursor_key)
+        query = query.order_by(BitcoinAddress.created_at.desc(), BitcoinAddress.id.desc())
+        if cursor is None and offset:
+            query = query.offset(offset)
+        
+        # Fetch one extra row to learn whether another page follows
+        addresses = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(addresses) > limit:
+            addresses = addresses[:limit]
+            next_cursor = encode_cursor(addresses[-1].created_at, addresses[-1].id)
+        total = count_addresses(db, address_type, generation_source, pattern)
         
         return {
             "addresses": [
@@ -597,11 +1252,85 @@ async def get_saved_addresses(db: Session = Depends(get_db), limit: int = 50, of
             ],
             "total": total,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Rows fetched per round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FIELDS = ["id", "address", "address_type", "pattern", "position", "attempts",
+                 "generation_source", "created_at"]
+
+def export_rows(fields, filters, export_format: str):
+    """Yield the export body chunk by chunk, newest rows first
+    
+    Runs in Starlette's threadpool with its own session; yield_per keeps
+    only one chunk of rows in memory however large the table is.
+    """
+    db = SessionLocal()
+    try:
+        columns = [getattr(BitcoinAddress, field) for field in fields]
+        statement = select(*columns).where(*filters).order_by(
+            BitcoinAddress.created_at.desc(), BitcoinAddress.id.desc()
+        ).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            yield buffer.getvalue()
+        for partition in db.execute(statement).partitions():
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in partition:
+                    writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({
+                        field: value.isoformat() if isinstance(value, datetime) else value
+                        for field, value in zip(fields, row)
+                    }, ensure_ascii=False) + "\n"
+                    for row in partition
+                )
+    finally:
+        db.close()
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into one gzip stream"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.get("/addresses/export")
+async def export_addresses(format: str = "ndjson", gzip: bool = False, include_private_keys: bool = False,
+                           address_type: Optional[str] = None, pattern: Optional[str] = None,
+                           generation_source: Optional[str] = None):
+    """Stream the whole address history as NDJSON or CSV"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="导出格式必须是 ndjson 或 csv")
+    
+    fields = EXPORT_FIELDS + ["private_key"] if include_private_keys else EXPORT_FIELDS
+    body = export_rows(fields, address_filters(address_type, pattern, generation_source), format)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"addresses.{format}"
+    if gzip:
+        body = gzip_chunks(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.on_event("startup")
 async def startup_event():
     # Initialize database
@@ -612,9 +1341,26 @@ async def startup_event():
     except Exception as e:
         print(f"Database initialization failed: {e}")
         print("Application will continue without database functionality")
+    address_writer.start()
+    
+    # Spawn and warm the search workers before the first request arrives
+    await asyncio.get_running_loop().run_in_executor(None, worker_pool.start)
+    # Measure what this machine's workers actually manage per address type
+    await asyncio.get_running_loop().run_in_executor(None, difficulty.calibrate)
+    # Pick up resumable searches where the last run left them
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, search_jobs.resume_all)
+    except Exception as e:
+        print(f"Resuming search jobs failed: {e}")
+    # Start stocking hot patterns once the real searches are back
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, reservoir.start)
+    except Exception as e:
+        print(f"Starting the hit reservoir failed: {e}")
     
     asyncio.create_task(periodic_cleanup())
-    print("Started periodic cleanup task")
+    asyncio.create_task(periodic_job_maintenance())
+    print("Started periodic cleanup and search job tasks")
     print("Bitcoin Address Generator API started successfully")
 
 @app.on_event("shutdown")
@@ -623,6 +1369,12 @@ async def shutdown_event():
     for task_id in list(active_tasks.keys()):
         active_tasks[task_id]["cancelled"] = True
     active_tasks.clear()
+    # Resumable searches keep their last position for the next start
+    search_jobs.shutdown()
+    worker_pool.shutdown()
+    reservoir.close()
+    # Everything queued before shutdown still reaches the database
+    address_writer.close()
     generator.clear_cache()
     print("Cleaned up all tasks on shutdown")
 
@@ -0,0 +1,266 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small, dependency-free take on counters, gauges and histograms; the
+API serves every registered metric at /metrics. Updates take one lock
+per call, so hot paths record once per batch or slice, never per key.
+Everything here lives in the API process: worker processes report
+their work back through the search scheduler, which records it.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds; request / message latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; whole pattern searches
+SEARCH_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+# Rows per database flush
+FLUSH_SIZE_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Callable[[], float] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Report function() on every scrape; unlabelled gauges only"""
+        if self.labelnames:
+            raise ValueError("Callback gauges cannot have labels")
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = math.nan
+            return [f"{self.name} {_format_value(value) if not math.isnan(value) else 'NaN'}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics, rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Generation
+addresses_generated = REGISTRY.counter(
+    "btc_addresses_generated_total", "Addresses generated without a pattern", ["address_type"])
+search_keys_checked = REGISTRY.counter(
+    "btc_search_keys_checked_total", "Keys generated and tested by pattern search slices")
+pattern_attempts = REGISTRY.counter(
+    "btc_pattern_attempts_total", "Keys tested on behalf of each pattern search", ["address_type"])
+
+# Searches
+searches_started = REGISTRY.counter(
+    "btc_searches_started_total", "Pattern searches submitted", ["address_type"])
+searches_coalesced = REGISTRY.counter(
+    "btc_searches_coalesced_total", "Pattern searches that joined an identical running search", ["address_type"])
+search_duration = REGISTRY.histogram(
+    "btc_search_duration_seconds", "Pattern search duration from submission to its outcome",
+    ["pattern_length", "outcome"], SEARCH_BUCKETS)
+search_time_to_hit = REGISTRY.histogram(
+    "btc_search_time_to_hit_seconds", "Time from submitting a pattern search to its hit",
+    ["address_type"], SEARCH_BUCKETS)
+active_searches = REGISTRY.gauge(
+    "btc_active_searches", "Pattern searches waiting on the worker pool")
+search_jobs_queued = REGISTRY.gauge(
+    "btc_search_jobs_queued", "Search jobs waiting for a place to run")
+search_jobs_running = REGISTRY.gauge(
+    "btc_search_jobs_running", "Search jobs running on the worker pool")
+
+# Hit reservoir
+reservoir_collected = REGISTRY.counter(
+    "btc_reservoir_collected_total", "Spare hits kept for hot patterns", ["address_type"])
+reservoir_served = REGISTRY.counter(
+    "btc_reservoir_served_total", "Pattern searches answered from the hit reservoir", ["address_type"])
+reservoir_stock = REGISTRY.gauge(
+    "btc_reservoir_stock", "Hits stored in the reservoir")
+
+# Workers
+worker_busy_seconds = REGISTRY.counter(
+    "btc_worker_busy_seconds_total", "Wall time workers spent on search slices")
+workers = REGISTRY.gauge(
+    "btc_search_workers", "Worker processes in the search pool")
+workers_busy = REGISTRY.gauge(
+    "btc_search_workers_busy", "Workers running a search slice right now")
+search_slice_keys = REGISTRY.gauge(
+    "btc_search_slice_keys", "Keys per search slice, sized to a target slice duration")
+search_slice_overhead = REGISTRY.gauge(
+    "btc_search_slice_overhead_ratio", "Share of search slice wall time spent outside the key search")
+
+# WebSocket
+websocket_send_seconds = REGISTRY.histogram(
+    "btc_websocket_send_seconds", "Time to hand one WebSocket message to the transport", ["message_type"])
+
+# Database writer
+db_flush_rows = REGISTRY.histogram(
+    "btc_db_flush_rows", "Rows inserted per database flush", buckets=FLUSH_SIZE_BUCKETS)
+db_flush_seconds = REGISTRY.histogram(
+    "btc_db_flush_seconds", "Duration of one batched database insert", ["outcome"])
+db_queue_depth = REGISTRY.gauge(
+    "btc_db_queue_depth", "Address records waiting for the database writer")
+
+# Tasks
+active_tasks = REGISTRY.gauge(
+    "btc_active_tasks", "WebSocket generation tasks currently registered")
+cleanup_runs = REGISTRY.counter(
+    "btc_task_cleanup_runs_total", "Runs of the disconnected task cleanup")
+cleanup_removed = REGISTRY.counter(
+    "btc_task_cleanup_removed_total", "Tasks removed by the disconnected task cleanup")
@@ -0,0 +1,922 @@
+"""
+Multi-pattern vanity search.
+
+Many clients search for different patterns at the same time. Instead of
+running one independent search per request, a PatternSet compiles every
+waiting (address_type, pattern, position) target into shared lookup
+structures, and MultiPatternSearch hands out work slices that test each
+key against all targets in one pass, routing hits to their requests:
+
+- "start": sorted hash160 ranges (Base58) or top-bit lookup tables (bech32)
+- "middle": an Aho-Corasick automaton over the address characters
+- "end": a trie of reversed patterns walked from the end of the address
+
+Per-key cost depends on the address types in play, not on the number of
+patterns.
+"""
+import base64
+import itertools
+import multiprocessing
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import metrics
+from batch_sizer import BatchSizer
+from pattern_matcher import (
+    BASE58_ALPHABET, BASE58_VERSIONS, BECH32_CHARSET, BECH32_VERSIONS,
+    base58_hash_ranges, base58_payload_hash, bech32_checksum_chars, bech32_data_chars,
+    case_variants, merge_ranges, witness_program
+)
+
+# (key, address_type, pattern, position)
+Target = Tuple[Hashable, str, str, str]
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton compiled to a DFA over the pattern characters"""
+
+    def __init__(self, patterns: Dict[str, List[Hashable]]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Hashable]] = [[]]
+        self.depth = [0]
+        for pattern, keys in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    self.depth.append(self.depth[state] + 1)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].extend(keys)
+
+        self.min_length = min((len(p) for p in patterns), default=0)
+        alphabet = set(''.join(patterns))
+        fail = [0] * len(goto)
+        self.delta: List[Dict[str, int]] = [dict() for _ in goto]
+        self.delta[0] = {char: goto[0].get(char, 0) for char in alphabet}
+
+        # Breadth-first so every fail target is complete before it is used
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char in alphabet:
+                if char in goto[state]:
+                    child = goto[state][char]
+                    fail[child] = self.delta[fail[state]][char]
+                    self.delta[state][char] = child
+                    queue.append(child)
+                else:
+                    self.delta[state][char] = self.delta[fail[state]][char]
+        self.outputs = outputs
+
+    def scan(self, text: str, state: int = 0, found: Optional[set] = None) -> Tuple[int, set]:
+        """Feed text from state; return the final state and every key seen"""
+        if found is None:
+            found = set()
+        delta = self.delta
+        outputs = self.outputs
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return state, found
+
+
+class SuffixTrie:
+    """Trie of reversed patterns for "end" matching"""
+
+    def __init__(self, patterns: Dict[str, List[Hashable]]):
+        self.root: Dict = {}
+        for pattern, keys in patterns.items():
+            node = self.root
+            for char in reversed(pattern):
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).extend(keys)
+
+    def scan(self, text: str) -> List[Hashable]:
+        found = []
+        node = self.root
+        for char in reversed(text):
+            node = node.get(char)
+            if node is None:
+                break
+            found.extend(node.get(None, ()))
+        return found
+
+
+class _TypeTargets:
+    """All targets for one address type"""
+
+    def __init__(self, address_type: str):
+        self.address_type = address_type
+        self.always: List[Hashable] = []
+        self.middle: Dict[str, List[Hashable]] = {}
+        self.end: Dict[str, List[Hashable]] = {}
+        # Targets with no compiled shortcut; tested on the built address
+        self.fallback: List[Hashable] = []
+        # Base58 "start" ranges: (start, end, key)
+        self.ranges: List[Tuple[int, int, Hashable]] = []
+        # Bech32 "start" tables: shift -> {top bits: keys}
+        self.prefixes: Dict[int, Dict[int, List[Hashable]]] = {}
+
+    def compile(self):
+        self.middle_automaton = AhoCorasick(self.middle) if self.middle else None
+        self.end_trie = SuffixTrie(self.end) if self.end else None
+
+        # Split the Base58 ranges into elementary segments, each knowing
+        # which targets cover it
+        bounds = set()
+        for start, end, _ in self.ranges:
+            bounds.update((start, end))
+        self.bounds = sorted(bounds)
+        self.segments: List[frozenset] = []
+        active = Counter()
+        starts = {}
+        ends = {}
+        for start, end, key in self.ranges:
+            starts.setdefault(start, []).append(key)
+            ends.setdefault(end, []).append(key)
+        for bound in self.bounds:
+            for key in ends.get(bound, ()):
+                active[key] -= 1
+                if not active[key]:
+                    del active[key]
+            for key in starts.get(bound, ()):
+                active[key] += 1
+            self.segments.append(frozenset(active))
+
+
+class PatternSet:
+    """Compiled set of pattern targets tested together"""
+
+    def __init__(self, generator, targets: Iterable[Target]):
+        self.generator = generator
+        self.targets: Dict[Hashable, Tuple[str, str, str]] = {}
+        self._types: Dict[str, _TypeTargets] = {}
+        for key, address_type, pattern, position in targets:
+            self.targets[key] = (address_type, pattern, position)
+            self._add(key, address_type, pattern.lower(), position)
+        for type_targets in self._types.values():
+            type_targets.compile()
+
+    @property
+    def encodes(self) -> bool:
+        """Whether matching builds the address string of every key
+
+        True for middle and end patterns and for patterns without a
+        compiled prefix shortcut; only those pay for the full encode.
+        """
+        return any(group.always or group.fallback or group.middle or group.end
+                   for group in self._types.values())
+
+    def _add(self, key: Hashable, address_type: str, pattern: str, position: str):
+        if address_type not in BASE58_VERSIONS and address_type not in BECH32_VERSIONS:
+            raise ValueError(f"Unsupported address type: {address_type}")
+        group = self._types.setdefault(address_type, _TypeTargets(address_type))
+        if not pattern:
+            group.always.append(key)
+            return
+        if position not in ("start", "middle", "end"):
+            return
+
+        if address_type in BASE58_VERSIONS:
+            if any(char not in BASE58_ALPHABET.lower() for char in pattern):
+                return
+            if position == "start":
+                if case_variants(pattern, BASE58_ALPHABET) is None:
+                    group.fallback.append(key)
+                    return
+                version, leading_char = BASE58_VERSIONS[address_type]
+                for start, end in merge_ranges(base58_hash_ranges(version, leading_char, pattern)):
+                    group.ranges.append((start, end, key))
+                return
+        else:
+            if any(char not in BECH32_CHARSET for char in pattern):
+                return
+            if position == "start":
+                version_char = BECH32_CHARSET[BECH32_VERSIONS[address_type]]
+                if pattern[0] != version_char:
+                    return
+                program_bits = 160 if address_type == "p2wpkh" else 256
+                if 5 * (len(pattern) - 1) > program_bits:
+                    group.fallback.append(key)
+                    return
+                value = 0
+                for char in pattern[1:]:
+                    value = (value << 5) | BECH32_CHARSET.index(char)
+                shift = program_bits - 5 * (len(pattern) - 1)
+                group.prefixes.setdefault(shift, {}).setdefault(value, []).append(key)
+                return
+
+        if position == "middle":
+            group.middle.setdefault(pattern, []).append(key)
+        else:
+            group.end.setdefault(pattern, []).append(key)
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def match(self, public_key: bytes) -> List[Tuple[Hashable, str]]:
+        """Return (key, address) for every target the public key satisfies"""
+        hits = []
+        for address_type, group in self._types.items():
+            if address_type in BASE58_VERSIONS:
+                candidates = self._base58_candidates(group, public_key)
+            else:
+                candidates = self._bech32_candidates(group, public_key)
+            if not candidates:
+                continue
+
+            # Confirm against the real address so results are exact
+            address = self.generator.public_key_to_address(address_type, public_key)
+            for key in candidates:
+                _, pattern, position = self.targets[key]
+                if self.generator.check_pattern_match(address, pattern, position):
+                    hits.append((key, address))
+        return hits
+
+    def _base58_candidates(self, group: _TypeTargets, public_key: bytes) -> List[Hashable]:
+        candidates = list(group.always) + list(group.fallback)
+        if not group.bounds and not group.middle_automaton and not group.end_trie:
+            return candidates
+
+        payload_hash = base58_payload_hash(self.generator, group.address_type, public_key)
+        if group.bounds:
+            i = bisect_right(group.bounds, int.from_bytes(payload_hash, 'big')) - 1
+            if i >= 0:
+                candidates.extend(group.segments[i])
+
+        if group.middle_automaton or group.end_trie:
+            version, _ = BASE58_VERSIONS[group.address_type]
+            text = self.generator.base58_address(version, payload_hash).lower()
+            if group.middle_automaton:
+                candidates.extend(group.middle_automaton.scan(text[1:])[1])
+            if group.end_trie:
+                candidates.extend(group.end_trie.scan(text))
+        return candidates
+
+    def _bech32_candidates(self, group: _TypeTargets, public_key: bytes) -> List[Hashable]:
+        candidates = list(group.always) + list(group.fallback)
+        program = witness_program(self.generator, group.address_type, public_key)
+
+        if group.prefixes:
+            value = int.from_bytes(program, 'big')
+            for shift, table in group.prefixes.items():
+                keys = table.get(value >> shift)
+                if keys:
+                    candidates.extend(keys)
+
+        automaton = group.middle_automaton
+        if automaton or group.end_trie:
+            version = BECH32_VERSIONS[group.address_type]
+            encoded = base64.b32encode(program)
+            data = BECH32_CHARSET[version] + bech32_data_chars(encoded).decode()
+            checksum = None
+            if automaton:
+                state, found = automaton.scan(data)
+                # Only continue into the checksum when a pattern can reach it
+                if automaton.depth[state] or automaton.min_length <= 6:
+                    checksum = bech32_checksum_chars(version, encoded).decode()
+                    automaton.scan(checksum, state, found)
+                candidates.extend(found)
+            if group.end_trie:
+                if checksum is None:
+                    checksum = bech32_checksum_chars(version, encoded).decode()
+                candidates.extend(group.end_trie.scan(data + checksum))
+        return candidates
+
+
+# Keys derived per batch inside a slice; cancellation is checked between
+# chunks, so this bounds how long a stopped search keeps a core busy
+SLICE_CHUNK = 256
+
+# Bounds of adaptive slice sizes, and the size a search starts from
+MAX_SLICE_SIZE = 1000000
+INITIAL_SLICE_SIZE = 4 * SLICE_CHUNK
+
+# Upper bound on requests a MultiPatternSearch tracks at once
+MAX_SEARCH_SLOTS = 1024
+
+
+class SearchSlots:
+    """Shared-memory state of the active requests, read without locking
+
+    Each request owns a slot: owners[slot] holds its request id, and
+    clearing it tells every worker to drop the request. Each running
+    slice holds a lane: counters[lane * MAX_SEARCH_SLOTS + slot] counts
+    the keys checked for the slot on that lane. Only the slice holding a
+    lane writes to it, so the counters need no lock.
+    """
+
+    def __init__(self, lanes: int):
+        self.lanes = lanes
+        self.owners = multiprocessing.RawArray('q', MAX_SEARCH_SLOTS)
+        self.counters = multiprocessing.RawArray('q', lanes * MAX_SEARCH_SLOTS)
+
+    def lane_attempts(self, slot: int) -> List[int]:
+        """Keys checked for slot, per lane"""
+        counters = self.counters
+        return [counters[lane * MAX_SEARCH_SLOTS + slot] for lane in range(self.lanes)]
+
+    def reset(self, slot: int):
+        for lane in range(self.lanes):
+            self.counters[lane * MAX_SEARCH_SLOTS + slot] = 0
+
+
+# Per-process state for search_slice, set up by init_slice_worker
+_slice_generator = None
+_slice_pattern_set: Optional[Tuple[tuple, PatternSet]] = None
+_slice_shared: Optional[SearchSlots] = None
+
+
+def init_slice_worker(backend: str = None, shared: SearchSlots = None, seed: str = None):
+    """Create the generator search slices use in this process"""
+    global _slice_generator, _slice_shared
+    from btc_generator import BitcoinAddressGenerator
+    _slice_generator = BitcoinAddressGenerator(backend, seed)
+    _slice_shared = shared
+
+
+def worker_generator():
+    """The generator of this worker process"""
+    if _slice_generator is None:
+        init_slice_worker()
+    return _slice_generator
+
+
+def search_slice(targets: List[Target], slots: List[int], count: int, lane: int = 0,
+                 shared: SearchSlots = None, base_key: bytes = None,
+                 spares: List[Target] = (),
+                 limits: List[Optional[int]] = None) -> Tuple[int, Optional[Tuple[Hashable, str, str]], bytes, float]:
+    """Walk count keys from base_key (default: a fresh random base) against targets
+
+    Runs inside a worker. slots[i] is the slot of targets[i]; a target is
+    dropped as soon as its slot no longer holds its key, and the slice
+    returns early once no target is left. Keys checked are added to the
+    live targets' counters on lane as each chunk completes. shared
+    defaults to the SearchSlots the worker was initialized with.
+
+    spares are by-product targets (the hit reservoir). The first spare
+    match is kept and returned if no target hits in the whole slice; a
+    slice without targets returns at its first spare match.
+
+    limits[i], when given and not None, is the number of keys targets[i]
+    may check: the target is neither counted nor matched past it, so a
+    request near the end of its attempt budget does not cut the slice
+    short for everyone else.
+
+    Returns the number of keys checked, the first hit as (key, address,
+    private_key_wif) or None, the last public key derived (for progress
+    display) and the seconds the slice took in the worker. Only one hit is returned, so a base never hands
+    out more than one private key: keys of one base are a small offset
+    apart, and whoever holds one could find the others.
+    """
+    global _slice_pattern_set
+    from btc_generator import IncrementalKeyStream
+
+    started = time.perf_counter()
+    generator = worker_generator()
+    if shared is None:
+        shared = _slice_shared
+    slot_of = dict(zip((target[0] for target in targets), slots))
+    limit_of = {target[0]: limit for target, limit in zip(targets, limits or ()) if limit is not None}
+
+    # Consecutive slices usually carry the same targets
+    cache_key = tuple(targets) + tuple(spares)
+    if _slice_pattern_set is None or _slice_pattern_set[0] != cache_key:
+        _slice_pattern_set = (cache_key, PatternSet(generator, cache_key))
+    pattern_set = _slice_pattern_set[1]
+    spare_keys = {target[0] for target in spares}
+
+    stream = IncrementalKeyStream(generator, base_key)
+    checked = 0
+    public_keys = b''
+    live = slot_of
+    # First spare match as (key, address, stream offset)
+    spare = None
+    while checked < count:
+        live = {key: slot for key, slot in slot_of.items()
+                if checked < limit_of.get(key, count) and (shared is None or shared.owners[slot] == key)}
+        if slot_of and not live:
+            break
+        chunk = min(SLICE_CHUNK, count - checked)
+        first_offset = stream.offset
+        public_keys = generator.generate_public_key_batch(stream, chunk)
+        for i in range(chunk):
+            for key, address in pattern_set.match(public_keys[33 * i:33 * i + 33]):
+                if key in spare_keys:
+                    if spare is None:
+                        spare = (key, address, first_offset + i)
+                    continue
+                if key not in live or checked + i >= limit_of.get(key, count):
+                    continue
+                _count_keys(shared, lane, live, limit_of, checked, checked + i + 1)
+                private_key = generator.private_key_to_wif(stream.private_key_at(first_offset + i))
+                return (checked + i + 1, (key, address, private_key), public_keys[33 * i:33 * i + 33],
+                        time.perf_counter() - started)
+        _count_keys(shared, lane, live, limit_of, checked, checked + chunk)
+        checked += chunk
+        if spare is not None and not slot_of:
+            break
+    if spare is not None:
+        key, address, offset = spare
+        private_key = generator.private_key_to_wif(stream.private_key_at(offset))
+        return checked, (key, address, private_key), public_keys[-33:], time.perf_counter() - started
+    return checked, None, public_keys[-33:], time.perf_counter() - started
+
+
+def _count_keys(shared: Optional[SearchSlots], lane: int, live: Dict[Hashable, int],
+                limits: Dict[Hashable, int], start: int, end: int):
+    """Add the keys from start to end to the live targets' counters, each up to its limit"""
+    if shared is None:
+        return
+    base = lane * MAX_SEARCH_SLOTS
+    for key, slot in live.items():
+        shared.counters[base + slot] += min(end, limits.get(key, end)) - start
+
+
+def pattern_key(address_type: str, pattern: str, position: str) -> Tuple[str, str, str]:
+    """Identity of a search: patterns match case-insensitively, like check_pattern_match"""
+    return address_type, pattern.lower(), position
+
+
+class SearchGroup:
+    """Requests for the same pattern, searched as a single target
+
+    The group owns the slot, so its counters are the shared progress of
+    every member. Each hit goes to one member only.
+    """
+
+    def __init__(self, target_id: int, key: tuple, slot: int):
+        self.target_id = target_id
+        # pattern_key(), prefixed with the request id for uncoalesced requests
+        self.key = key
+        self.address_type, self.pattern, self.position = key[-3:]
+        self.slot = slot
+        # Members in arrival order; the oldest waiting member gets the next hit
+        self.requests: List['PatternRequest'] = []
+        # Private keys handed to members, so no two ever get the same one
+        self.issued = set()
+
+
+class PatternRequest:
+    """One pattern request waiting on a MultiPatternSearch"""
+
+    def __init__(self, request_id: int, address_type: str, pattern: str, position: str,
+                 max_attempts: int = None):
+        self.request_id = request_id
+        self.address_type = address_type
+        self.pattern = pattern
+        self.position = position
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.started = time.monotonic()
+        # Attempts handed to slices that have not reported back yet
+        self.reserved = 0
+        self.paused = False
+        # The group searching for this request's pattern, and its slot
+        # counters when the request joined
+        self.group: Optional[SearchGroup] = None
+        self.lane_base: List[int] = []
+        # Seeded searches: first keystream block searched for this request,
+        # the next one to hand out, blocks still running, and the
+        # lowest-index hit so far as (block, (address, private_key_wif, attempts))
+        self.first_block = 0
+        self.next_block = 0
+        self.blocks = set()
+        # Scheduler turn of the last seeded slice that searched for this request
+        self.turn = 0
+        self.best: Optional[Tuple[int, Tuple[str, str, int]]] = None
+        # Called with the request from an executor thread after every
+        # slice that searched for it
+        self.on_progress: Optional[Callable[['PatternRequest'], None]] = None
+        # Resolves to (address, private_key_wif, attempts), or None when
+        # max_attempts runs out
+        self.future: Future = Future()
+
+    def remaining(self) -> Optional[int]:
+        if self.max_attempts is None:
+            return None
+        return self.max_attempts - self.attempts - self.reserved
+
+
+class MultiPatternSearch:
+    """Scheduler that serves every waiting pattern request from shared work slices
+
+    Work is handed to an executor in slices; each slice walks a fresh
+    random key stream and tests every key against the targets of all
+    requests active when it was dispatched. At most max_in_flight slices
+    run at once, however many requests are waiting. Without an executor
+    the slices run on one background thread. Unless slice_size is given,
+    each slice is sized to take about batch_sizer.TARGET_SECONDS, which
+    bounds how long a new request waits for a free lane while keeping
+    the per-slice overhead small.
+
+    Identical requests (same pattern_key) are coalesced: a later request
+    joins the group of the running one, the pattern is tested once per
+    key for all of them, and every hit goes to the oldest member still
+    waiting while the others keep searching. Members never share a hit.
+
+    If the generator is seeded, every request walks the keystream blocks
+    0, 1, 2, ... (or from its checkpoint) instead of random bases, and
+    resolves to its lowest-index hit once every earlier block has been
+    searched, so its result depends neither on the number of workers nor
+    on other searches. Requests due for the same block share its slice;
+    otherwise the request that waited longest goes next. Seeded requests
+    are never coalesced, and never feed the reservoir.
+
+    With a reservoir, a slice also tests the patterns the reservoir wants
+    more hits for where that adds no per-key encoding work (see
+    _spares_for), and a slice that hits no request hands its first such
+    match to the reservoir. While no request is waiting, short fill
+    slices test every wanted pattern and keep the reservoir topped up.
+    """
+
+    def __init__(self, generator, executor: Executor = None, max_in_flight: int = 1,
+                 slice_size: int = None, shared: SearchSlots = None, reservoir=None):
+        self.generator = generator
+        self.keystream = getattr(generator, "keystream", None)
+        if self.keystream is not None:
+            slice_size = self.keystream.block_size
+        self.slice_size = slice_size
+        # Without a fixed size, slices are sized to a target duration
+        self._sizer = None
+        if slice_size is None:
+            self._sizer = BatchSizer(INITIAL_SLICE_SIZE, minimum=SLICE_CHUNK, maximum=MAX_SLICE_SIZE)
+        self._turns = itertools.count(1)
+        self.max_in_flight = max_in_flight
+        self.last_public_key: Optional[bytes] = None
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="multi-pattern-search")
+        self._executor = executor
+        # Process workers inherit the shared state from their initializer;
+        # in-process slices are handed it directly
+        self._pass_shared = shared is None
+        self.shared = shared if shared is not None else SearchSlots(max_in_flight)
+        self._free_slots = list(range(MAX_SEARCH_SLOTS - 1, -1, -1))
+        self._free_lanes = list(range(max_in_flight - 1, -1, -1))
+        self._groups: Dict[Hashable, SearchGroup] = {}
+        # A released slot is reused only once no running slice refers to it,
+        # so late counter updates never land on the next request
+        self._slot_refs: Counter = Counter()
+        self._retired_slots = set()
+        self._requests: Dict[int, PatternRequest] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._in_flight = 0
+        self._closed = False
+        self.reservoir = reservoir
+        if reservoir is not None:
+            reservoir.on_wanted = self.wake
+        # Whether a (type, pattern, position) needs the full address encode
+        self._encodes: Dict[Tuple[str, str, str], bool] = {}
+
+    def submit(self, address_type: str, pattern: str, position: str, max_attempts: int = None,
+               on_progress: Callable[[PatternRequest], None] = None,
+               start_block: int = None) -> PatternRequest:
+        """Queue a pattern; its future resolves when a key matches
+
+        Seeded searches start at keystream block start_block when given
+        (a resumed search), otherwise at block 0.
+        """
+        request = PatternRequest(next(self._ids), address_type, pattern, position, max_attempts)
+        request.on_progress = on_progress
+        # Fail fast on bad input instead of inside a worker
+        PatternSet(self.generator, [(request.request_id, address_type, pattern, position)])
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pattern search is closed")
+            key = pattern_key(address_type, pattern, position)
+            if self.keystream is not None:
+                key = (request.request_id,) + key
+            group = self._groups.get(key)
+            if group is None:
+                if not self._free_slots:
+                    raise RuntimeError("Too many active searches")
+                slot = self._free_slots.pop()
+                self.shared.reset(slot)
+                group = self._groups[key] = SearchGroup(next(self._ids), key, slot)
+                self.shared.owners[slot] = group.target_id
+            else:
+                metrics.searches_coalesced.inc(address_type=address_type)
+            group.requests.append(request)
+            request.group = group
+            request.lane_base = self.shared.lane_attempts(group.slot)
+            if self.keystream is not None and start_block is not None:
+                request.first_block = request.next_block = start_block
+            self._requests[request.request_id] = request
+            self._dispatch()
+        metrics.searches_started.inc(address_type=address_type)
+        return request
+
+    def cancel(self, request: PatternRequest):
+        """Stop a request; workers drop it before their next chunk"""
+        with self._lock:
+            self._release(request)
+            if not request.future.done():
+                _record_outcome(request, "cancelled")
+            request.future.cancel()
+
+    def _release(self, request: PatternRequest):
+        self._requests.pop(request.request_id, None)
+        group = request.group
+        if group is None or request not in group.requests:
+            return
+        group.requests.remove(request)
+        if group.requests:
+            return  # The other members keep searching
+        del self._groups[group.key]
+        slot = group.slot
+        self.shared.owners[slot] = 0
+        if self._slot_refs[slot]:
+            self._retired_slots.add(slot)
+        else:
+            self._free_slots.append(slot)
+
+    def lane_attempts(self, request: PatternRequest) -> List[int]:
+        """Live count of keys checked for request, per lane
+
+        Read straight from shared memory, so it includes slices that are
+        still running. Counts the keys of the request's group since the
+        request joined it. Empty once the request has finished.
+        """
+        group = request.group
+        if group is None or request not in group.requests:
+            return []
+        counts = self.shared.lane_attempts(group.slot)
+        return [count - base for count, base in zip(counts, request.lane_base)]
+
+    def resume_block(self, request: PatternRequest) -> Optional[int]:
+        """Seeded searches: first keystream block not yet fully searched for request
+
+        Restarting at this block repeats at most the blocks still in
+        flight. None for random searches, which have no position.
+        """
+        if self.keystream is None:
+            return None
+        with self._lock:
+            return min(request.blocks) if request.blocks else request.next_block
+
+    def pause(self, request: PatternRequest, paused: bool = True):
+        with self._lock:
+            request.paused = paused
+            self._dispatch()
+
+    def wake(self):
+        """Dispatch again, e.g. once the reservoir wants more hits"""
+        with self._lock:
+            self._dispatch()
+
+    @property
+    def active_requests(self) -> int:
+        return len(self._requests)
+
+    @property
+    def slice_keys(self) -> int:
+        """Keys the next full slice will check"""
+        return self._sizer.size if self._sizer is not None else self.slice_size
+
+    @property
+    def slice_overhead(self) -> float:
+        """Share of slice wall time lost outside the workers' key search"""
+        return self._sizer.overhead if self._sizer is not None else 0.0
+
+    @property
+    def busy_lanes(self) -> int:
+        return self._in_flight
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for request in list(self._requests.values()):
+                self._release(request)
+                if not request.future.done():
+                    _record_outcome(request, "cancelled")
+                request.future.cancel()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        """Fill every free slot with a slice over the current targets"""
+        while not self._closed and self._in_flight < self.max_in_flight:
+            active = [r for r in self._requests.values()
+                      if not r.paused and r.best is None and (r.remaining() is None or r.remaining() > 0)]
+            spares = self.reservoir.wanted() if self.reservoir is not None and self.keystream is None else []
+            if not active and not spares:
+                return
+            block = base_key = None
+            if self.keystream is not None:
+                # The slice walks one block: the next one of the request that
+                # waited longest, shared by every request due for the same block
+                first = min(active, key=lambda r: (r.turn, r.request_id))
+                block = first.next_block
+                active = [r for r in active if r.next_block == block]
+                turn = next(self._turns)
+                for request in active:
+                    request.turn = turn
+                    request.next_block += 1
+                    request.blocks.add(block)
+                base_key = self.keystream.block_base(block)
+
+            count = self.slice_keys
+            if not active:
+                # Idle: a fill slice stops at its first match, and a short
+                # one keeps the next request from waiting long for a lane
+                count = min(count, self.reservoir.fill_slice_size)
+            # A request near the end of its budget searches only what is
+            # left of it; the slice keeps its size for the others
+            shares = {}
+            for request in active:
+                remaining = request.remaining()
+                shares[request] = count if remaining is None else min(count, remaining)
+                request.reserved += shares[request]
+
+            # One target per group, however many of its members are waiting
+            groups = list(dict.fromkeys(r.group for r in active))
+            targets = [(g.target_id, g.address_type, g.pattern, g.position) for g in groups]
+            limits = None
+            if any(share < count for share in shares.values()):
+                group_share = Counter()
+                for request, share in shares.items():
+                    group_share[request.group] = max(group_share[request.group], share)
+                limits = [group_share[g] if group_share[g] < count else None for g in groups]
+            if targets:
+                spares = self._spares_for(targets, spares)
+            slots = [g.slot for g in groups]
+            lane = self._free_lanes.pop()
+            self._in_flight += 1
+            self._slot_refs.update(slots)
+            dispatched = time.monotonic()
+            try:
+                future = self._executor.submit(
+                    search_slice, targets, slots, count, lane,
+                    self.shared if self._pass_shared else None, base_key, spares, limits
+                )
+            except Exception as e:
+                self._return_lane(lane, slots)
+                for request in active:
+                    request.reserved -= shares[request]
+                    self._finish(request, exception=e)
+                return
+            future.add_done_callback(
+                lambda f, a=shares, l=lane, s=slots, b=block, t=dispatched:
+                    self._slice_done(f, a, l, s, b, t)
+            )
+
+    def _spares_for(self, targets: List[Target], spares: List[Target]) -> List[Target]:
+        """Reservoir targets a request slice can test without slowing it down
+
+        A spare rides along only with a target of its own address type,
+        so the payload hash or witness program is computed anyway. One
+        that needs every key's full address (middle, end or uncompiled)
+        also needs a target that already pays for that encode; prefix
+        spares only add a range or table lookup.
+        """
+        if not spares:
+            return spares
+        types = {}
+        for target in targets:
+            address_type = target[1]
+            types[address_type] = types.get(address_type, False) or self._target_encodes(target)
+        return [spare for spare in spares
+                if spare[1] in types and (types[spare[1]] or not self._target_encodes(spare))]
+
+    def _target_encodes(self, target: Target) -> bool:
+        key = (target[1], target[2].lower(), target[3])
+        encodes = self._encodes.get(key)
+        if encodes is None:
+            if len(self._encodes) >= MAX_SEARCH_SLOTS:
+                self._encodes.clear()
+            try:
+                encodes = PatternSet(self.generator, [(None,) + key]).encodes
+            except ValueError:
+                encodes = True
+            self._encodes[key] = encodes
+        return encodes
+
+    def _return_lane(self, lane: int, slots: List[int]):
+        self._in_flight -= 1
+        self._free_lanes.append(lane)
+        self._slot_refs.subtract(slots)
+        for slot in slots:
+            if self._slot_refs[slot] <= 0:
+                del self._slot_refs[slot]
+                if slot in self._retired_slots:
+                    self._retired_slots.discard(slot)
+                    self._free_slots.append(slot)
+
+    def _slice_done(self, future: Future, shares: Dict[PatternRequest, int],
+                    lane: int, slots: List[int], block: Optional[int] = None,
+                    dispatched: Optional[float] = None):
+        """Account a finished slice; shares maps each request it searched for to its key budget"""
+        with self._lock:
+            self._return_lane(lane, slots)
+            if dispatched is not None and not future.cancelled():
+                metrics.worker_busy_seconds.inc(time.monotonic() - dispatched)
+            active = list(shares)
+            for request, share in shares.items():
+                request.reserved -= share
+                request.blocks.discard(block)
+
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                for request in active:
+                    self._finish(request, exception=error)
+                self._dispatch()
+                return
+
+            checked, hit, last_public_key, worker_seconds = future.result()
+            self.last_public_key = last_public_key
+            if self._sizer is not None and dispatched is not None:
+                # Overhead: submitting, pickling and waking the scheduler
+                overhead = max(0.0, time.monotonic() - dispatched - worker_seconds)
+                self._sizer.record(checked, worker_seconds, overhead)
+            metrics.search_keys_checked.inc(checked)
+            if hit is not None and self.reservoir is not None and self.reservoir.owns(hit[0]):
+                self.reservoir.offer(*hit)
+                hit = None
+            winner = self._hit_owner(shares, checked, hit)
+            for request in active:
+                if request.future.done():
+                    continue
+                # A request stopped at its share, so its count is exact
+                searched = min(checked, shares[request])
+                request.attempts += searched
+                metrics.pattern_attempts.inc(searched, address_type=request.address_type)
+                if block is not None:
+                    self._seeded_slice_done(request, block, checked, hit if request is winner else None)
+                elif request is winner:
+                    _, address, private_key = hit
+                    # Include what the other lanes checked up to now
+                    attempts = max(request.attempts, sum(self.lane_attempts(request)))
+                    if request.max_attempts is not None:
+                        attempts = min(attempts, request.max_attempts)
+                    self._finish(request, (address, private_key, attempts))
+                elif request.max_attempts is not None and request.attempts >= request.max_attempts \
+                        and request.reserved == 0:
+                    self._finish(request, None)
+                elif request.on_progress is not None:
+                    request.on_progress(request)
+            self._dispatch()
+
+    def _hit_owner(self, shares: Dict[PatternRequest, int], position: int, hit) -> Optional[PatternRequest]:
+        """The one request a slice's hit goes to: the oldest waiting member of its group
+
+        position is the number of keys the slice checked up to the hit;
+        members whose share ended before it cannot take the hit.
+        """
+        if hit is None:
+            return None
+        for request, share in shares.items():
+            group = request.group
+            if group.target_id != hit[0] or request.future.done() or request not in group.requests:
+                continue
+            if share < position:
+                continue
+            if hit[2] in group.issued:
+                return None  # Never hand a private key out twice
+            group.issued.add(hit[2])
+            return request
+        return None
+
+    def _seeded_slice_done(self, request: PatternRequest, block: int, checked: int, hit):
+        if hit is not None:
+            if request.best is None or block < request.best[0]:
+                # Attempts count keystream positions from the request's first block
+                attempts = (block - request.first_block) * self.slice_size + checked
+                request.best = (block, (hit[1], hit[2], attempts))
+        if request.best is not None:
+            if all(b > request.best[0] for b in request.blocks):
+                self._finish(request, request.best[1])
+        elif request.max_attempts is not None and request.attempts >= request.max_attempts \
+                and request.reserved == 0:
+            self._finish(request, None)
+        elif request.on_progress is not None:
+            request.on_progress(request)
+
+    def _finish(self, request: PatternRequest, result=None, exception: BaseException = None):
+        self._release(request)
+        if request.future.done():
+            return
+        if exception is not None:
+            _record_outcome(request, "error")
+            request.future.set_exception(exception)
+        else:
+            _record_outcome(request, "hit" if result is not None else "exhausted")
+            request.future.set_result(result)
+
+
+def _record_outcome(request: PatternRequest, outcome: str):
+    elapsed = time.monotonic() - request.started
+    metrics.search_duration.observe(elapsed, pattern_length=len(request.pattern), outcome=outcome)
+    if outcome == "hit":
+        metrics.search_time_to_hit.observe(elapsed, address_type=request.address_type)
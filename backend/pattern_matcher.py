@@ -0,0 +1,408 @@
+"""
+Compiled vanity pattern matchers.
+
+check_pattern_match works on finished address strings, which forces every
+candidate through the checksum and the encoder before we know it misses.
+A compiled matcher tests the raw public key instead and only builds the
+address string for candidates that can actually match.
+"""
+import base64
+import math
+from bisect import bisect_right
+from itertools import product
+from typing import List, Optional, Tuple
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# Version byte and leading address character of the Base58Check types
+BASE58_VERSIONS = {
+    "p2pkh": (0x00, '1'),
+    "p2sh-p2wpkh": (0x05, '3'),
+}
+
+# Case variants are enumerated explicitly; beyond this many the compiler
+# falls back to plain address matching
+MAX_CASE_VARIANTS = 4096
+
+HASH_BITS = 160
+PAYLOAD_BYTES = 25
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+
+# Witness version of the bech32 types
+BECH32_VERSIONS = {
+    "p2wpkh": 0,
+    "p2tr": 1,
+}
+
+# Characters after the "1" / "3" / "bc1" prefix of a typical address
+ADDRESS_BODY_LENGTHS = {
+    "p2pkh": 33,
+    "p2sh-p2wpkh": 33,
+    "p2wpkh": 39,
+    "p2tr": 59,
+}
+
+# base64.b32encode splits bytes into the same MSB-first 5-bit groups as
+# bech32, so translating its alphabet yields the address characters
+_RFC4648_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567'
+_B32_TO_BECH32 = bytes.maketrans(_RFC4648_ALPHABET, BECH32_CHARSET.encode())
+_B32_TO_VALUES = bytes.maketrans(_RFC4648_ALPHABET, bytes(range(32)))
+
+# XOR of the generator terms selected by each 5-bit top value
+_POLYMOD_TABLE = []
+for _top in range(32):
+    _term = 0
+    for _i in range(5):
+        if (_top >> _i) & 1:
+            _term ^= BECH32_GENERATOR[_i]
+    _POLYMOD_TABLE.append(_term)
+
+
+def _polymod_step(chk: int, values) -> int:
+    table = _POLYMOD_TABLE
+    for value in values:
+        chk = ((chk & 0x1ffffff) << 5) ^ value ^ table[chk >> 25]
+    return chk
+
+
+# Polymod state after the expanded "bc" human-readable part
+_HRP_STATE = _polymod_step(1, [ord(c) >> 5 for c in 'bc'] + [0] + [ord(c) & 31 for c in 'bc'])
+
+
+class PatternMatcher:
+    """Fallback matcher: build the address and run check_pattern_match"""
+
+    def __init__(self, generator, address_type: str, pattern: str, position: str):
+        self.generator = generator
+        self.address_type = address_type
+        self.pattern = pattern
+        self.position = position
+
+    def match(self, public_key: bytes) -> Optional[str]:
+        """Return the address for public_key if it matches, otherwise None"""
+        address = self.generator.public_key_to_address(self.address_type, public_key)
+        if self.generator.check_pattern_match(address, self.pattern, self.position):
+            return address
+        return None
+
+
+class Base58PrefixMatcher(PatternMatcher):
+    """Match a "start" pattern on P2PKH / P2SH-P2WPKH against hash160 ranges
+
+    Every address sharing a Base58 prefix lies in a small set of numeric
+    ranges of the 25-byte payload, which map to ranges of the 20-byte
+    hash. Only hashes inside a range are encoded and re-checked; the
+    re-check settles the few boundary hashes whose checksum decides.
+    """
+
+    def __init__(self, generator, address_type: str, pattern: str, position: str):
+        super().__init__(generator, address_type, pattern, position)
+        self.version, self.leading_char = BASE58_VERSIONS[address_type]
+        ranges = merge_ranges(base58_hash_ranges(self.version, self.leading_char, pattern.lower()))
+        self._starts = [start for start, _ in ranges]
+        self._ends = [end for _, end in ranges]
+
+    def match(self, public_key: bytes) -> Optional[str]:
+        payload_hash = base58_payload_hash(self.generator, self.address_type, public_key)
+        value = int.from_bytes(payload_hash, 'big')
+        i = bisect_right(self._starts, value) - 1
+        if i < 0 or value >= self._ends[i]:
+            return None
+
+        address = self.generator.base58_address(self.version, payload_hash)
+        if self.generator.check_pattern_match(address, self.pattern, self.position):
+            return address
+        return None
+
+
+class Bech32Matcher(PatternMatcher):
+    """Match P2WPKH / P2TR patterns on the 5-bit groups of the witness program
+
+    Bech32 characters map one-to-one onto 5-bit groups, so "start"
+    patterns compare the top bits of the program and "middle" patterns
+    search the data characters directly. The checksum is only computed
+    when the pattern can reach into it; the address itself is encoded for
+    hits only.
+    """
+
+    def __init__(self, generator, address_type: str, pattern: str, position: str):
+        super().__init__(generator, address_type, pattern, position)
+        self.version = BECH32_VERSIONS[address_type]
+        self._needle = pattern.lower().encode()
+        self._version_char = BECH32_CHARSET[self.version].encode()
+        self._program_bits = 160 if address_type == "p2wpkh" else 256
+        data_chars = 1 + (self._program_bits + 4) // 5
+        self._possible = all(c in BECH32_CHARSET for c in pattern.lower())
+
+        # "start" patterns that stay within the data characters become a
+        # comparison of the program's top bits
+        self._prefix_bits = None
+        if position == "start" and self._possible and 1 <= len(self._needle) <= data_chars:
+            needle = self._needle.decode()
+            if needle[0] == BECH32_CHARSET[self.version]:
+                group_count = len(needle) - 1
+                if 5 * group_count <= self._program_bits:
+                    value = 0
+                    for char in needle[1:]:
+                        value = (value << 5) | BECH32_CHARSET.index(char)
+                    self._prefix_bits = (self._program_bits - 5 * group_count, value)
+            else:
+                self._possible = False
+
+    def _candidate(self, program: bytes) -> bool:
+        needle = self._needle
+        if self._prefix_bits is not None:
+            shift, value = self._prefix_bits
+            return int.from_bytes(program, 'big') >> shift == value
+
+        encoded = base64.b32encode(program)
+        data = self._version_char + bech32_data_chars(encoded)
+        if self.position == "middle":
+            if needle in data:
+                return True
+            # Without a data hit the pattern must overlap the checksum
+            overlap = len(needle) <= 6 or any(
+                data.endswith(needle[:j]) for j in range(len(needle) - 6, len(needle))
+            )
+            if not overlap:
+                return False
+            return needle in data[-len(needle):] + bech32_checksum_chars(self.version, encoded)
+        if self.position == "start":
+            return (data + bech32_checksum_chars(self.version, encoded)).startswith(needle)
+        if self.position == "end":
+            return (data + bech32_checksum_chars(self.version, encoded)).endswith(needle)
+        return False
+
+    def match(self, public_key: bytes) -> Optional[str]:
+        if not self._possible:
+            return None
+        program = witness_program(self.generator, self.address_type, public_key)
+        if not self._candidate(program):
+            return None
+
+        address = self.generator.public_key_to_address(self.address_type, public_key)
+        if self.generator.check_pattern_match(address, self.pattern, self.position):
+            return address
+        return None
+
+
+def base58_payload_hash(generator, address_type: str, public_key: bytes) -> bytes:
+    """The 20-byte hash a P2PKH / P2SH-P2WPKH address encodes"""
+    pubkey_hash = generator.hash160(generator.compress_public_key(public_key))
+    if address_type == "p2sh-p2wpkh":
+        return generator.hash160(b'\x00\x14' + pubkey_hash)
+    return pubkey_hash
+
+
+def witness_program(generator, address_type: str, public_key: bytes) -> bytes:
+    """The witness program a P2WPKH / P2TR address encodes"""
+    compressed_pubkey = generator.compress_public_key(public_key)
+    if address_type == "p2wpkh":
+        return generator.hash160(compressed_pubkey)
+    return compressed_pubkey[1:33]
+
+
+def bech32_data_chars(encoded: bytes) -> bytes:
+    """Address characters for a base64.b32encode'd witness program"""
+    return encoded.rstrip(b'=').translate(_B32_TO_BECH32)
+
+
+def bech32_checksum_chars(version: int, encoded: bytes) -> bytes:
+    """Bech32 checksum characters for a base64.b32encode'd witness program"""
+    chk = _polymod_step(_HRP_STATE, [version])
+    chk = _polymod_step(chk, encoded.rstrip(b'=').translate(_B32_TO_VALUES))
+    # bech32 1.2.0 uses the original bech32 constant for every version
+    polymod = _polymod_step(chk, [0, 0, 0, 0, 0, 0]) ^ 1
+    return bytes(ord(BECH32_CHARSET[(polymod >> 5 * (5 - i)) & 31]) for i in range(6))
+
+
+def case_variants(pattern: str, alphabet: str) -> Optional[List[str]]:
+    """All strings in alphabet that lowercase to pattern
+
+    Returns None when there are too many to enumerate; an empty list means
+    no address can ever match.
+    """
+    choices = []
+    count = 1
+    for char in pattern:
+        options = [c for c in alphabet if c.lower() == char]
+        if not options:
+            return []
+        choices.append(options)
+        count *= len(options)
+        if count > MAX_CASE_VARIANTS:
+            return None
+    return [''.join(chars) for chars in product(*choices)]
+
+
+def base58_hash_ranges(version: int, leading_char: str, pattern: str) -> List[Tuple[int, int]]:
+    """Half-open hash160 ranges whose address can start with leading_char + pattern"""
+    variants = case_variants(pattern, BASE58_ALPHABET)
+    version_lo = version << (HASH_BITS + 32)
+    version_hi = (version + 1) << (HASH_BITS + 32)
+
+    ranges = []
+    for variant in variants:
+        prefix = leading_char + variant
+        ones = len(prefix) - len(prefix.lstrip('1'))
+        rest = prefix[ones:]
+        rest_value = 0
+        for char in rest:
+            rest_value = rest_value * 58 + BASE58_ALPHABET.index(char)
+
+        # The address is '1' * (leading zero bytes) + digits of the payload
+        # value, and the digits never start with '1'
+        if rest:
+            zero_counts = [ones]
+        else:
+            zero_counts = range(ones, PAYLOAD_BYTES)
+        for zeros in zero_counts:
+            lo = 1 << (8 * (PAYLOAD_BYTES - zeros - 1))
+            hi = 1 << (8 * (PAYLOAD_BYTES - zeros))
+            lo, hi = max(lo, version_lo), min(hi, version_hi)
+            if lo >= hi:
+                continue
+            if not rest:
+                ranges.append((lo, hi))
+                continue
+            for digits in range(len(rest), 36):
+                scale = 58 ** (digits - len(rest))
+                range_lo = max(lo, rest_value * scale, 58 ** (digits - 1))
+                range_hi = min(hi, (rest_value + 1) * scale, 58 ** digits)
+                if range_lo < range_hi:
+                    ranges.append((range_lo, range_hi))
+
+    # Drop the version byte and checksum: any hash whose payload range
+    # overlaps [lo, hi) for some checksum is a candidate
+    hash_ranges = []
+    for lo, hi in ranges:
+        hash_lo = (lo >> 32) - (version << HASH_BITS)
+        hash_hi = ((hi + (1 << 32) - 1) >> 32) - (version << HASH_BITS)
+        hash_ranges.append((max(hash_lo, 0), min(hash_hi, 1 << HASH_BITS)))
+    return hash_ranges
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compile_pattern(generator, address_type: str, pattern: str, position: str) -> PatternMatcher:
+    """Build the fastest exact matcher for a pattern"""
+    if address_type in BASE58_VERSIONS and pattern and position == "start":
+        if case_variants(pattern.lower(), BASE58_ALPHABET) is not None:
+            return Base58PrefixMatcher(generator, address_type, pattern, position)
+    if address_type in BECH32_VERSIONS and pattern:
+        return Bech32Matcher(generator, address_type, pattern, position)
+    return PatternMatcher(generator, address_type, pattern, position)
+
+
+def bech32_body_chars(address_type: str) -> List[Optional[str]]:
+    """Characters each position after "bc1" can hold; None where all 32 are equally likely
+
+    The body is the witness version, the data characters and a 6
+    character checksum. A P2TR program is 256 bits, so its last data
+    character carries one bit and four zero padding bits: 'q' or 's'.
+    """
+    version = BECH32_VERSIONS[address_type]
+    program_bits = 160 if version == 0 else 256
+    data_chars, spare_bits = divmod(program_bits, 5)
+    chars: List[Optional[str]] = [BECH32_CHARSET[version]] + [None] * data_chars
+    if spare_bits:
+        step = 1 << (5 - spare_bits)
+        chars.append(BECH32_CHARSET[::step])
+    return chars + [None] * 6
+
+
+def _char_probability(char: str, allowed: Optional[str], alphabet: str) -> float:
+    """Chance that a position holding one of allowed (None: all of alphabet) shows char, ignoring case"""
+    choices = alphabet if allowed is None else allowed
+    return sum(1 for c in choices if c.lower() == char) / len(choices)
+
+
+def match_probability(address_type: str, pattern: str, position: str) -> float:
+    """Chance that the address of one random key matches a pattern
+
+    Base58 "start" patterns are measured exactly from their hash160
+    ranges, which captures the skewed first characters. Bech32 patterns
+    use the exact character set of every position (fixed witness version,
+    uniform data and checksum, P2TR padding). Base58 "end" characters are
+    the payload modulo a power of 58, uniform thanks to the checksum in
+    its low bytes. "middle" treats the positions as independent and, for
+    Base58, uniform and at a fixed address length, so it is only an
+    approximation; see probability_is_exact.
+    """
+    if address_type not in ADDRESS_BODY_LENGTHS:
+        raise ValueError(f"Unsupported address type: {address_type}")
+    pattern = pattern.lower()
+    if not pattern:
+        return 1.0
+    if position not in ("start", "middle", "end"):
+        return 0.0
+
+    if address_type in BASE58_VERSIONS:
+        if position == "start" and case_variants(pattern, BASE58_ALPHABET):
+            version, leading_char = BASE58_VERSIONS[address_type]
+            covered = sum(end - start for start, end in
+                          merge_ranges(base58_hash_ranges(version, leading_char, pattern)))
+            return covered / (1 << HASH_BITS)
+        body: List[Optional[str]] = [None] * ADDRESS_BODY_LENGTHS[address_type]
+        alphabet = BASE58_ALPHABET
+    else:
+        body = bech32_body_chars(address_type)
+        alphabet = BECH32_CHARSET
+    if len(pattern) > len(body):
+        return 0.0
+
+    def at(offset: int) -> float:
+        probability = 1.0
+        for char, allowed in zip(pattern, body[offset:]):
+            probability *= _char_probability(char, allowed, alphabet)
+        return probability
+
+    if position == "start":
+        return at(0)
+    if position == "end":
+        return at(len(body) - len(pattern))
+    # At least one offset matches
+    miss = 0.0
+    for offset in range(len(body) - len(pattern) + 1):
+        probability = at(offset)
+        if probability >= 1.0:
+            return 1.0
+        miss += math.log1p(-probability)
+    return -math.expm1(miss)
+
+
+def probability_is_exact(address_type: str, pattern: str, position: str) -> bool:
+    """Whether match_probability is exact for a pattern rather than an approximation
+
+    "middle" patterns are approximate, as are Base58 "start" patterns with
+    too many case variants to turn into hash160 ranges.
+    """
+    pattern = pattern.lower()
+    if not pattern or position not in ("start", "middle", "end"):
+        return True
+    if position == "middle":
+        return False
+    if address_type in BASE58_VERSIONS and position == "start":
+        if any(char not in BASE58_ALPHABET.lower() for char in pattern):
+            return True  # Cannot match at all
+        return case_variants(pattern, BASE58_ALPHABET) is not None
+    return True
+
+
+def expected_attempts(address_type: str, pattern: str, position: str) -> float:
+    """Mean number of random keys needed to match a pattern
+
+    Returns math.inf for patterns no address can match.
+    """
+    probability = match_probability(address_type, pattern, position)
+    return 1 / probability if probability > 0 else math.inf
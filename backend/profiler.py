@@ -0,0 +1,324 @@
+"""
+Sampling profiler for the search workers.
+
+Every worker process runs one idle control thread. It polls a few
+shared-memory values five times a second and does nothing else until a
+profiling session is opened; then, until the session's deadline, the
+worker's main thread is sampled every interval of CPU time (SIGPROF)
+and its stacks are counted. At the end the counts go back to the API
+process, which merges the reports of all workers into:
+
+- collapsed stacks ("frame;frame;frame count" lines), ready for
+  flamegraph.pl, speedscope or inferno
+- a per-stage breakdown using the generator's stages (keygen, pubkey,
+  hash160, ...), plus "other" for Python overhead inside search work
+  and "idle" for time outside any worker task
+
+With CPU-time sampling a waiting worker gets no signals, so its idle
+time is added afterwards: one "idle" sample per interval of the session
+not covered by a CPU sample.
+
+The sampler never touches the search code, sessions are capped in
+length and only one runs at a time, so it can be opened on a loaded
+production pool.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Longest session, shortest sampling interval and deepest stack recorded
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+DEFAULT_INTERVAL = 0.005
+MAX_STACK_DEPTH = 64
+# Distinct stacks one worker keeps; the rest are counted as "[truncated]"
+MAX_STACKS = 10000
+# Seconds between idle checks for a new session
+IDLE_POLL = 0.2
+# Collapsed stack of the idle samples CPU-time sampling adds afterwards
+IDLE_STACK = "[idle]"
+
+STAGES = ["keygen", "pubkey", "compress", "hash160", "hash256", "base58", "bech32",
+          "pattern_match", "wif", "other", "idle"]
+
+# Generator and matcher functions, by name, and the stage they belong to
+STAGE_FUNCTIONS = {
+    "generate_private_key": "keygen",
+    "generate_base_key": "keygen",
+    "private_key_to_public_key": "pubkey",
+    "generate_public_key_batch": "pubkey",
+    "compress_public_key": "compress",
+    "hash160": "hash160",
+    "hash256": "hash256",
+    "base58_address": "base58",
+    "bech32_data_chars": "bech32",
+    "bech32_checksum_chars": "bech32",
+    "check_pattern_match": "pattern_match",
+    "match": "pattern_match",
+    "scan": "pattern_match",
+    "_candidate": "pattern_match",
+    "_base58_candidates": "pattern_match",
+    "_bech32_candidates": "pattern_match",
+    "private_key_to_wif": "wif",
+}
+
+# Whole modules (file or package name) that belong to one stage
+STAGE_MODULES = {
+    "seeded_keys": "keygen",
+    "ec_math": "pubkey",
+    "ec_backend": "pubkey",
+    "ecdsa": "pubkey",
+    "coincurve": "pubkey",
+    "base58": "base58",
+    "bech32": "bech32",
+}
+
+# Entry points of worker tasks; samples outside them are idle time
+WORK_FUNCTIONS = {"search_slice", "_generate_batch", "_find_pattern_worker", "_find_pattern_seeded_worker"}
+
+
+class ProfileControl:
+    """Shared-memory switch for the samplers, plus the queue their reports come back on
+
+    Created in the API process and handed to every worker through the
+    pool initializer. Only the shared values and the queue travel; the
+    lock guarding start() is per process and made fresh on arrival, so
+    the control also reaches spawned (not forked) workers.
+    """
+
+    def __init__(self, context=None):
+        # The multiprocessing context the workers are started with
+        context = context or multiprocessing
+        self.session = context.RawValue('q', 0)
+        self.deadline = context.RawValue('d', 0.0)
+        self.interval = context.RawValue('d', DEFAULT_INTERVAL)
+        self.reports = context.Queue()
+        self._lock = threading.Lock()
+        self._active = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"], state["_active"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._active = False
+
+    def start(self, seconds: float, interval: float = DEFAULT_INTERVAL) -> int:
+        """Open a session on every sampler; raises RuntimeError if one is running"""
+        with self._lock:
+            if self._active:
+                raise RuntimeError("A profiling session is already running")
+            self._active = True
+            # Deadline before the session id: a sampler that sees the new id
+            # must also see its deadline
+            self.interval.value = max(interval, MIN_INTERVAL)
+            self.deadline.value = time.time() + min(seconds, MAX_PROFILE_SECONDS)
+            self.session.value += 1
+            return self.session.value
+
+    def stop(self, session: int):
+        """End a session before its deadline"""
+        if self.session.value == session:
+            self.deadline.value = min(self.deadline.value, time.time())
+
+    def collect(self, session: int, workers: int) -> dict:
+        """Wait for the session to end and merge the worker reports
+
+        Workers report within one sampling interval of the deadline; a
+        worker that never noticed a very short session simply has no
+        report.
+        """
+        try:
+            reports = []
+            while len(reports) < workers:
+                timeout = self.deadline.value + IDLE_POLL + 1.0 - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    report = self.reports.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if report["session"] == session:
+                    reports.append(report)
+            return merge_reports(session, self.interval.value, reports)
+        finally:
+            with self._lock:
+                self._active = False
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+
+def merge_reports(session: int, interval: float, reports: List[dict]) -> dict:
+    """Combine worker reports into one profile"""
+    stacks: Counter = Counter()
+    stages: Counter = Counter()
+    for report in reports:
+        stacks.update(report["stacks"])
+        stages.update(report["stages"])
+    total = sum(stages.values())
+    return {
+        "session": session,
+        "interval": interval,
+        "samples": total,
+        "processes": [
+            {"pid": report["pid"], "samples": report["samples"], "seconds": round(report["seconds"], 3)}
+            for report in reports
+        ],
+        "stages": {
+            stage: {
+                "samples": stages[stage],
+                "fraction": round(stages[stage] / total, 4) if total else 0.0,
+            }
+            for stage in STAGES
+        },
+        "collapsed": collapsed(stacks),
+    }
+
+
+def collapsed(stacks: Dict[str, int]) -> str:
+    """Stacks in the collapsed format, heaviest first"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+
+# Where SIGPROF and setitimer exist, the kernel interrupts the main
+# thread every interval of CPU time and the handler records its stack.
+# A sampler thread would only get the GIL when the search releases it,
+# which skews every profile towards GIL-releasing C calls, so it is
+# only the fallback for platforms without interval timers.
+CPU_SAMPLING = hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+_main_thread: Optional[int] = None
+_recording = False
+_stacks: Counter = Counter()
+_stages: Counter = Counter()
+
+
+def start_sampler(control: Optional[ProfileControl]):
+    """Install the sampler in this process; call from the main thread"""
+    if control is None:
+        return
+    global _main_thread
+    _main_thread = threading.get_ident()
+    if CPU_SAMPLING:
+        signal.signal(signal.SIGPROF, _on_profile_signal)
+    thread = threading.Thread(target=_sampler_loop, args=(control,), name="profile-sampler", daemon=True)
+    thread.start()
+
+
+def _sampler_loop(control: ProfileControl):
+    seen = control.session.value
+    while True:
+        session = control.session.value
+        if session != seen and time.time() < control.deadline.value:
+            seen = session
+            try:
+                control.reports.put(_run_session(control, session))
+            except Exception as e:
+                print(f"Profiler sampling failed in worker {os.getpid()}: {e}")
+        else:
+            time.sleep(IDLE_POLL)
+
+
+def _session_open(control: ProfileControl, session: int) -> bool:
+    return time.time() < control.deadline.value and control.session.value == session
+
+
+def _run_session(control: ProfileControl, session: int) -> dict:
+    """Record the main thread's stacks until the session ends"""
+    global _recording, _stacks, _stages
+    interval = control.interval.value
+    _stacks, _stages = Counter(), Counter()
+    started = time.time()
+    if CPU_SAMPLING:
+        _recording = True
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        try:
+            while _session_open(control, session):
+                time.sleep(min(IDLE_POLL, max(control.deadline.value - time.time(), 0)))
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            _recording = False
+    else:
+        while _session_open(control, session):
+            frame = sys._current_frames().get(_main_thread)
+            if frame is not None:
+                _record(frame)
+            time.sleep(interval)
+    seconds = time.time() - started
+    # Swap rather than copy: a late signal writes into the fresh counters
+    stacks, stages = _stacks, _stages
+    _stacks, _stages = Counter(), Counter()
+    if CPU_SAMPLING:
+        idle = int(seconds / interval) - sum(stages.values())
+        if idle > 0:
+            stacks[IDLE_STACK] += idle
+            stages["idle"] += idle
+    return {
+        "session": session,
+        "pid": os.getpid(),
+        "samples": sum(stages.values()),
+        "seconds": seconds,
+        "stacks": dict(stacks),
+        "stages": dict(stages),
+    }
+
+
+def _on_profile_signal(signum, frame):
+    if _recording and frame is not None:
+        _record(frame)
+
+
+# Code object -> (frame label, stage or None, is a work entry point)
+_frame_info: Dict[object, Tuple[str, Optional[str], bool]] = {}
+
+
+def _describe(code) -> Tuple[str, Optional[str], bool]:
+    info = _frame_info.get(code)
+    if info is None:
+        filename = code.co_filename
+        module = os.path.splitext(os.path.basename(filename))[0]
+        if module == "__init__":
+            module = os.path.basename(os.path.dirname(filename))
+        package = next((part for part in filename.replace("\\", "/").split("/") if part in STAGE_MODULES), None)
+        stage = STAGE_FUNCTIONS.get(code.co_name) or STAGE_MODULES.get(module) or STAGE_MODULES.get(package)
+        label = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        info = _frame_info[code] = (label, stage, code.co_name in WORK_FUNCTIONS)
+    return info
+
+
+def _record(frame):
+    """Count one sample of the stack ending in frame"""
+    labels = []
+    stage = None
+    working = False
+    depth = 0
+    # Leaf to root; the innermost frame with a stage decides it
+    while frame is not None and depth < MAX_STACK_DEPTH:
+        label, frame_stage, work = _describe(frame.f_code)
+        labels.append(label)
+        if stage is None:
+            stage = frame_stage
+        working = working or work
+        frame = frame.f_back
+        depth += 1
+    if not working:
+        stage = "idle"
+    elif stage is None:
+        stage = "other"
+    stack = ";".join(reversed(labels))
+    stacks = _stacks
+    if stack not in stacks and len(stacks) >= MAX_STACKS:
+        stack = "[truncated]"
+    stacks[stack] += 1
+    _stages[stage] += 1
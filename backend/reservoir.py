@@ -0,0 +1,290 @@
+"""
+Reservoir of ready-made matches for hot short patterns.
+
+Search slices also test the hot patterns whose stock is below the
+target depth wherever that adds no encoding work to the slice's own
+patterns, and a slice that hits no request hands its first such match
+to the reservoir; while the pool is idle, short fill slices top the
+stock up. /find-pattern and the WebSocket search answer a hot
+pattern with a stored hit instead of searching.
+
+Hot patterns are the ones configured in BTC_RESERVOIR_PATTERNS
+("address_type:position:pattern", comma separated) plus short patterns
+that are requested often, up to MAX_HOT_PATTERNS in all.
+
+Private keys are encrypted at rest with Fernet from the optional
+cryptography package; without it the reservoir stays off. The key comes
+from BTC_RESERVOIR_KEY (a Fernet key); without one a fresh key is made
+for this process, and hits stored under any other key are dropped at
+startup since they can no longer be read. Each hit is deleted as it is
+handed out, so it reaches one client only.
+"""
+import hashlib
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+import metrics
+from database import ReservoirHit
+from multi_pattern import pattern_key
+from pattern_matcher import match_probability
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+KEY_ENV_VAR = "BTC_RESERVOIR_KEY"
+PATTERNS_ENV_VAR = "BTC_RESERVOIR_PATTERNS"
+
+# Hits kept ready per hot pattern
+TARGET_DEPTH = int(os.environ.get("BTC_RESERVOIR_DEPTH", "20"))
+MAX_HOT_PATTERNS = int(os.environ.get("BTC_RESERVOIR_MAX_PATTERNS", "32"))
+
+# Patterns up to this long become hot after HOT_MIN_REQUESTS requests
+MAX_HOT_LENGTH = 3
+HOT_MIN_REQUESTS = 3
+# Distinct short patterns whose requests are counted
+MAX_TRACKED_PATTERNS = 10000
+
+# A slice yields at most one hit, so rarer patterns are not worth stocking
+MAX_EXPECTED_ATTEMPTS = 1000000
+
+# Keys per idle fill slice
+FILL_SLICE_SIZE = 5000
+
+# (address_type, lowercased pattern, position), as from pattern_key()
+Spec = Tuple[str, str, str]
+
+
+def parse_patterns(text: str) -> List[Spec]:
+    """Read comma separated "address_type:position:pattern" entries, skipping bad ones"""
+    specs = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(":", 2)
+        if len(parts) != 3 or not parts[2]:
+            print(f"Ignoring reservoir pattern {entry!r}: expected address_type:position:pattern")
+            continue
+        address_type, position, pattern = parts
+        specs.append(pattern_key(address_type, pattern, position))
+    return specs
+
+
+class HitReservoir:
+    """Encrypted stock of spare hits per hot pattern"""
+
+    def __init__(self, session_factory, patterns: List[Spec] = (), depth: int = TARGET_DEPTH,
+                 key: bytes = None, enabled: bool = True):
+        self.session_factory = session_factory
+        self.depth = depth
+        self.fill_slice_size = FILL_SLICE_SIZE
+        self.enabled = enabled and Fernet is not None and depth > 0
+        if enabled and Fernet is None:
+            print("Hit reservoir disabled: install the cryptography package to enable it")
+        self.key_id = None
+        self._fernet = None
+        if self.enabled:
+            if key is None and os.environ.get(KEY_ENV_VAR):
+                key = os.environ[KEY_ENV_VAR].encode()
+            if key is None:
+                key = Fernet.generate_key()
+                print(f"{KEY_ENV_VAR} is not set - reservoir hits only last as long as this process")
+            self._fernet = Fernet(key)
+            self.key_id = hashlib.sha256(key).hexdigest()[:16]
+        # Target key in search slices for each hot pattern, and back
+        self._hot: Dict[Spec, str] = {}
+        self._specs: Dict[str, Spec] = {}
+        # Hits stored or on their way to the database, per pattern
+        self._stock: Counter = Counter()
+        self._requests: Counter = Counter()
+        self._wanted: List[tuple] = []
+        self._started = False
+        self._lock = threading.Lock()
+        self._take_lock = threading.Lock()
+        # Set by the search scheduler; called when more hits are wanted
+        self.on_wanted: Optional[Callable[[], None]] = None
+        # Hits are encrypted and stored off the scheduler thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hit-reservoir")
+        for spec in patterns:
+            self._add_hot(spec)
+
+    def start(self):
+        """Count the stored hits and start collecting"""
+        if not self.enabled:
+            return
+        with self.session_factory() as db:
+            dropped = db.query(ReservoirHit).filter(ReservoirHit.key_id != self.key_id).delete()
+            db.commit()
+            counts = db.query(ReservoirHit.address_type, ReservoirHit.pattern, ReservoirHit.position,
+                              func.count(ReservoirHit.id)).group_by(
+                ReservoirHit.address_type, ReservoirHit.pattern, ReservoirHit.position).all()
+        if dropped:
+            print(f"Dropped {dropped} reservoir hits stored under another key")
+        with self._lock:
+            for address_type, pattern, position, count in counts:
+                spec = (address_type, pattern, position)
+                self._stock[spec] = count
+                # Stock left by earlier runs marks a pattern that was hot
+                if spec not in self._hot and len(self._hot) < MAX_HOT_PATTERNS:
+                    self._add_hot(spec)
+            self._started = True
+            self._refresh()
+        print(f"Hit reservoir started: {len(self._hot)} hot patterns, {sum(self._stock.values())} hits stored")
+        self._notify()
+
+    def close(self):
+        """Wait for hits still being stored"""
+        self._executor.shutdown(wait=True)
+
+    def wanted(self) -> List[tuple]:
+        """Search targets of the hot patterns below the target depth"""
+        return self._wanted
+
+    def owns(self, key) -> bool:
+        """Whether a search slice target key belongs to the reservoir"""
+        return isinstance(key, str) and key in self._specs
+
+    def offer(self, key: str, address: str, private_key: str):
+        """Accept a spare hit from a search slice"""
+        spec = self._specs[key]
+        with self._lock:
+            if self._stock[spec] >= self.depth:
+                return  # Filled meanwhile by another slice; the key is dropped unseen
+            self._stock[spec] += 1
+            if self._stock[spec] >= self.depth:
+                self._refresh()
+        metrics.reservoir_collected.inc(address_type=spec[0])
+        self._executor.submit(self._store, spec, address, private_key)
+
+    def take(self, address_type: str, pattern: str, position: str) -> Optional[Tuple[str, str]]:
+        """Hand out a stored hit for a pattern as (address, private_key_wif), or None
+
+        Also counts the request, which makes a short pattern hot once it
+        is asked for often enough.
+        """
+        if not self.enabled or not pattern:
+            return None
+        spec = pattern_key(address_type, pattern, position)
+        with self._lock:
+            if spec not in self._hot:
+                self._count_request(spec)
+                return None
+            if self._stock[spec] <= 0:
+                return None
+            self._stock[spec] -= 1
+            self._refresh()
+        hit = self._pop(spec)
+        if hit is None:
+            # Still on its way to the database; count it again
+            with self._lock:
+                self._stock[spec] += 1
+                self._refresh()
+        else:
+            metrics.reservoir_served.inc(address_type=address_type)
+        self._notify()
+        return hit
+
+    def status(self) -> dict:
+        """Hot patterns and their stock, without any keys"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "target_depth": self.depth,
+                "patterns": [
+                    {"address_type": spec[0], "pattern": spec[1], "position": spec[2], "stock": self._stock[spec]}
+                    for spec in self._hot
+                ],
+            }
+
+    @property
+    def stock(self) -> int:
+        return sum(self._stock.values())
+
+    def _count_request(self, spec: Spec):
+        if len(spec[1]) > MAX_HOT_LENGTH:
+            return
+        if spec not in self._requests and len(self._requests) >= MAX_TRACKED_PATTERNS:
+            self._requests = Counter(dict(self._requests.most_common(MAX_TRACKED_PATTERNS // 10)))
+        self._requests[spec] += 1
+        if self._requests[spec] >= HOT_MIN_REQUESTS and len(self._hot) < MAX_HOT_PATTERNS:
+            if self._add_hot(spec):
+                self._refresh()
+                # Outside the lock: the scheduler asks for wanted() while dispatching
+                threading.Thread(target=self._notify, daemon=True).start()
+
+    def _add_hot(self, spec: Spec) -> bool:
+        try:
+            probability = match_probability(*spec)
+        except ValueError as e:
+            print(f"Ignoring reservoir pattern {spec}: {e}")
+            return False
+        if probability <= 0 or 1 / probability > MAX_EXPECTED_ATTEMPTS:
+            print(f"Ignoring reservoir pattern {spec}: impossible or too rare to stock")
+            return False
+        key = f"reservoir:{spec[0]}:{spec[2]}:{spec[1]}"
+        self._hot[spec] = key
+        self._specs[key] = spec
+        if self._started:
+            print(f"Reservoir pattern added: {spec[0]} {spec[2]} {spec[1]!r}")
+        return True
+
+    def _refresh(self):
+        # A new list each time: the scheduler may still hold the old one
+        if not self._started:
+            self._wanted = []
+            return
+        self._wanted = [(key,) + spec for spec, key in self._hot.items() if self._stock[spec] < self.depth]
+
+    def _notify(self):
+        if self._wanted and self.on_wanted is not None:
+            self.on_wanted()
+
+    def _store(self, spec: Spec, address: str, private_key: str):
+        try:
+            with self.session_factory() as db:
+                db.add(ReservoirHit(
+                    address_type=spec[0],
+                    pattern=spec[1],
+                    position=spec[2],
+                    address=address,
+                    encrypted_private_key=self._fernet.encrypt(private_key.encode()).decode(),
+                    key_id=self.key_id,
+                ))
+                db.commit()
+        except Exception as e:
+            print(f"Error storing reservoir hit: {e}")
+            with self._lock:
+                self._stock[spec] -= 1
+                self._refresh()
+
+    def _pop(self, spec: Spec) -> Optional[Tuple[str, str]]:
+        """Delete and return the oldest stored hit of a pattern"""
+        with self._take_lock:
+            with self.session_factory() as db:
+                for _ in range(3):
+                    row = db.query(ReservoirHit).filter(
+                        ReservoirHit.address_type == spec[0],
+                        ReservoirHit.pattern == spec[1],
+                        ReservoirHit.position == spec[2],
+                    ).order_by(ReservoirHit.id).first()
+                    if row is None:
+                        return None
+                    row_id, address, token = row.id, row.address, row.encrypted_private_key
+                    # Only the deleting transaction may hand the hit out, even
+                    # with several API processes on one database
+                    deleted = db.query(ReservoirHit).filter(ReservoirHit.id == row_id).delete()
+                    db.commit()
+                    if deleted != 1:
+                        continue
+                    try:
+                        return address, self._fernet.decrypt(token.encode()).decode()
+                    except InvalidToken:
+                        print(f"Dropped unreadable reservoir hit {row_id}")
+        return None
@@ -0,0 +1,509 @@
+"""
+Durable, resumable pattern search jobs and the queue that runs them.
+
+A job is a pattern search on the shared worker pool with a stable id and
+a row in the search_jobs table. The row is checkpointed periodically
+with the keys checked so far, the search time, the per-worker progress
+and, for seeded keystreams, the next keystream block. A job keeps
+running when its client disconnects; any client can reattach by id, and
+jobs that were queued or running when the server stopped are picked up
+again at startup from their last checkpoint.
+
+Random searches have no position to restore (every key is as good as
+any other), so a resumed random job simply carries its attempts and
+time forward. A resumed seeded job restarts at the first block it had
+not finished, repeating at most the blocks that were in flight.
+
+Submitted jobs wait in a queue until one of max_running places is free.
+Every running job is tested against the same shared work slices, so the
+limit bounds matching overhead and pool slots rather than dividing key
+throughput. The next job to run is picked by priority class, then by
+fair share (the client with the fewest running jobs goes first), then
+by age. A queued job of a higher class preempts the newest running job
+of the lowest class, which goes back to the queue with its progress.
+Interactive jobs, started by a watching WebSocket client, never wait.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import SearchJob
+
+# Seconds between checkpoints of the running jobs
+CHECKPOINT_INTERVAL = float(os.environ.get("BTC_CHECKPOINT_INTERVAL", "10"))
+
+# Jobs searching on the pool at once, and active jobs one client may hold
+MAX_RUNNING_JOBS = int(os.environ.get("BTC_MAX_RUNNING_JOBS", "8"))
+MAX_JOBS_PER_CLIENT = int(os.environ.get("BTC_MAX_JOBS_PER_CLIENT", "100"))
+
+# Priority classes, most urgent first
+PRIORITIES = ("high", "normal", "low")
+_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+# Jobs in these states are picked up again after a restart
+ACTIVE_STATUSES = ("queued", "running", "paused")
+
+
+class SearchJobHandle:
+    """In-memory side of an active job"""
+
+    def __init__(self, row: SearchJob):
+        self.job_id = row.id
+        self.address_type = row.address_type
+        self.pattern = row.pattern
+        self.position = row.position
+        self.max_attempts = row.max_attempts
+        self.status = row.status
+        self.priority = row.priority or "normal"
+        self.client_id = row.client_id
+        self.deadline = row.deadline
+        self.created_at = row.created_at or datetime.utcnow()
+        # Interactive jobs start at once and are never preempted
+        self.interactive = False
+        # Carried over from earlier runs
+        self.prior_attempts = row.attempts or 0
+        self.prior_elapsed = row.elapsed_seconds or 0.0
+        self.start_block = row.keystream_block
+        # The pool search of the current run; None while queued
+        self.request = None
+        self.started: Optional[float] = None
+        self._paused_since: Optional[float] = None
+        self._paused_total = 0.0
+        # Resolves to (address, private_key_wif, total_attempts), or None
+        # when the attempt budget or the deadline runs out, once the
+        # outcome is stored
+        self.future: Future = Future()
+
+    def begin(self, request):
+        """Start a run on request"""
+        self.request = request
+        self.started = time.monotonic()
+        self._paused_total = 0.0
+        self._paused_since = self.started if self.status == "paused" else None
+        if self.status == "queued":
+            self.status = "running"
+
+    def requeue(self, attempts: int, block: Optional[int]):
+        """End the current run and wait for a place again"""
+        self.prior_elapsed = self.elapsed
+        self.prior_attempts = attempts
+        self.start_block = block
+        self.request = None
+        self.started = None
+        self.status = "queued"
+
+    def set_paused(self, paused: bool):
+        now = time.monotonic()
+        if paused and self._paused_since is None:
+            self._paused_since = now
+        elif not paused and self._paused_since is not None:
+            self._paused_total += now - self._paused_since
+            self._paused_since = None
+        self.status = "paused" if paused else "running"
+
+    @property
+    def elapsed(self) -> float:
+        """Search time over all runs, excluding queued and paused time"""
+        if self.started is None:
+            return self.prior_elapsed
+        now = time.monotonic()
+        paused = self._paused_total + (now - self._paused_since if self._paused_since is not None else 0.0)
+        return self.prior_elapsed + now - self.started - paused
+
+    @property
+    def running(self) -> bool:
+        return self.request is not None and not self.request.future.done()
+
+
+class SearchJobManager:
+    """Queues, starts, checkpoints, resumes and finishes search jobs"""
+
+    def __init__(self, session_factory, worker_pool, address_writer, max_running: int = MAX_RUNNING_JOBS):
+        self.session_factory = session_factory
+        self.pool = worker_pool
+        self.address_writer = address_writer
+        self.max_running = max(1, max_running)
+        keystream = getattr(worker_pool.generator, "keystream", None)
+        self.seed_hash = hashlib.sha256(keystream.seed.encode()).hexdigest() if keystream is not None else None
+        # Every active job by id; the queued ones are also in _queue
+        self._jobs: Dict[str, SearchJobHandle] = {}
+        self._queue: List[SearchJobHandle] = []
+        self._lock = threading.RLock()
+        # Outcomes are stored off the scheduler thread that resolves the search
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-jobs")
+
+    def create(self, address_type: str, pattern: str, position: str, max_attempts: int = None,
+               priority: str = "normal", client_id: str = None, deadline_seconds: float = None,
+               interactive: bool = False) -> SearchJobHandle:
+        """Store a new job and queue it, or start it at once if interactive
+
+        Raises ValueError for an unknown priority class.
+        """
+        if priority not in _RANK:
+            raise ValueError(f"Unknown priority: {priority}")
+        now = datetime.utcnow()
+        row = SearchJob(
+            id=uuid.uuid4().hex,
+            address_type=address_type,
+            pattern=pattern,
+            position=position,
+            status="running" if interactive else "queued",
+            priority=priority,
+            client_id=client_id,
+            deadline=now + timedelta(seconds=deadline_seconds) if deadline_seconds is not None else None,
+            max_attempts=max_attempts,
+            attempts=0,
+            elapsed_seconds=0.0,
+            keystream_seed=self.seed_hash,
+            created_at=now,
+            updated_at=now,
+        )
+        with self.session_factory() as db:
+            db.add(row)
+            db.commit()
+            handle = SearchJobHandle(row)
+        handle.interactive = interactive
+        if interactive:
+            self._start(handle)
+        else:
+            with self._lock:
+                self._jobs[handle.job_id] = handle
+                self._queue.append(handle)
+            self.schedule()
+        return handle
+
+    def get(self, job_id: str) -> Optional[SearchJobHandle]:
+        """The active job with this id, if any"""
+        return self._jobs.get(job_id)
+
+    def load(self, job_id: str, include_key: bool = False) -> Optional[dict]:
+        """The stored state of a job, with live numbers if it is active"""
+        with self.session_factory() as db:
+            row = db.get(SearchJob, job_id)
+            if row is None:
+                return None
+            state = job_state(row, include_key)
+        handle = self._jobs.get(job_id)
+        if handle is not None:
+            state.update(status=handle.status, attempts=self.attempts(handle),
+                         elapsed_seconds=round(handle.elapsed, 3))
+        return state
+
+    def attempts(self, handle: SearchJobHandle) -> int:
+        """Keys checked for the job over all runs, live"""
+        request = handle.request
+        if request is None:
+            return handle.prior_attempts
+        live = max(request.attempts, sum(self.pool.lane_attempts(request)))
+        return handle.prior_attempts + live
+
+    def client_jobs(self, client_id: str) -> int:
+        """Active jobs submitted by client_id"""
+        with self._lock:
+            return sum(1 for handle in self._jobs.values() if handle.client_id == client_id)
+
+    @property
+    def queued_jobs(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running_jobs(self) -> int:
+        with self._lock:
+            return sum(1 for handle in self._jobs.values() if handle.request is not None)
+
+    def pause(self, job_id: str, paused: bool = True):
+        """Pause or resume a running job; the new state is checkpointed in the background"""
+        handle = self._jobs.get(job_id)
+        if handle is None or handle.request is None:
+            return
+        handle.set_paused(paused)
+        self.pool.pause(handle.request, paused)
+        self._executor.submit(self._checkpoint, handle)
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a job for good; False if it was not active"""
+        return self._end(job_id, "cancelled")
+
+    def expire_overdue(self) -> int:
+        """End every job whose deadline has passed; returns how many"""
+        now = datetime.utcnow()
+        with self._lock:
+            overdue = [h.job_id for h in self._jobs.values() if h.deadline is not None and h.deadline <= now]
+        return sum(1 for job_id in overdue if self._end(job_id, "expired"))
+
+    def schedule(self):
+        """Start queued jobs while there is room, preempting lower classes for higher ones"""
+        with self._lock:
+            while self._queue:
+                running = [h for h in self._jobs.values() if h.request is not None]
+                candidate = min(self._queue, key=lambda h: self._queue_key(h, running))
+                if len(running) >= self.max_running:
+                    victim = self._preemptible(candidate, running)
+                    if victim is None:
+                        return
+                    self._preempt(victim)
+                self._queue.remove(candidate)
+                try:
+                    self._start(candidate)
+                except Exception as e:
+                    print(f"Failed to start search job {candidate.job_id}: {e}")
+                    self._jobs.pop(candidate.job_id, None)
+                    self._store_outcome(candidate, "failed", error=str(e))
+                    candidate.future.set_exception(e)
+
+    def checkpoint(self) -> int:
+        """Record the progress of every running job; returns how many were written"""
+        with self._lock:
+            handles = [h for h in self._jobs.values() if h.request is not None]
+        for handle in handles:
+            self._checkpoint(handle)
+        return len(handles)
+
+    def resume_all(self) -> int:
+        """Pick up every job that was active when the server stopped"""
+        with self.session_factory() as db:
+            rows = db.query(SearchJob).filter(SearchJob.status.in_(ACTIVE_STATUSES)) \
+                .order_by(SearchJob.created_at).all()
+            handles = []
+            for row in rows:
+                if row.keystream_seed != self.seed_hash:
+                    # Its checkpointed position belongs to another keystream
+                    row.status = "failed"
+                    row.error = "Keystream seed changed since the job was checkpointed"
+                    row.updated_at = row.finished_at = datetime.utcnow()
+                    continue
+                if row.status != "queued":
+                    row.runs = (row.runs or 1) + 1
+                handles.append(SearchJobHandle(row))
+            db.commit()
+        for handle in handles:
+            if handle.status == "queued":
+                with self._lock:
+                    self._jobs[handle.job_id] = handle
+                    self._queue.append(handle)
+                continue
+            # Jobs that were running keep their place
+            try:
+                self._start(handle)
+            except Exception as e:
+                print(f"Failed to resume search job {handle.job_id}: {e}")
+                self._jobs.pop(handle.job_id, None)
+                self._store_outcome(handle, "failed", error=str(e))
+        self.schedule()
+        if handles:
+            print(f"Resumed {len(handles)} search jobs")
+        return len(handles)
+
+    def shutdown(self):
+        """Checkpoint and stop every job; they stay active and resume on the next start"""
+        self.checkpoint()
+        with self._lock:
+            handles = list(self._jobs.values())
+            self._jobs.clear()
+            self._queue.clear()
+        for handle in handles:
+            if handle.request is not None:
+                self.pool.cancel(handle.request)
+        self._executor.shutdown(wait=True)
+
+    def _queue_key(self, handle: SearchJobHandle, running: List[SearchJobHandle]):
+        share = sum(1 for h in running if h.client_id == handle.client_id)
+        return _RANK[handle.priority], share, handle.created_at
+
+    def _preemptible(self, candidate: SearchJobHandle,
+                     running: List[SearchJobHandle]) -> Optional[SearchJobHandle]:
+        """Newest running job of the lowest class below candidate's, if any"""
+        victims = [h for h in running if not h.interactive and h.running
+                   and _RANK[h.priority] > _RANK[candidate.priority]]
+        if not victims:
+            return None
+        return max(victims, key=lambda h: (_RANK[h.priority], h.started))
+
+    def _preempt(self, handle: SearchJobHandle):
+        """Send a running job back to the queue, keeping its progress"""
+        attempts, block = self._progress(handle)
+        request = handle.request
+        handle.requeue(attempts, block)
+        self.pool.cancel(request)
+        self._queue.append(handle)
+        self._executor.submit(self._store_state, handle)
+        print(f"Preempted search job {handle.job_id} ({handle.priority}) after {attempts} attempts")
+
+    def _start(self, handle: SearchJobHandle):
+        remaining = None
+        if handle.max_attempts is not None:
+            remaining = handle.max_attempts - handle.prior_attempts
+            if remaining <= 0:
+                self._jobs.pop(handle.job_id, None)
+                handle.status = "exhausted"
+                self._store_outcome(handle, "exhausted")
+                handle.future.set_result(None)
+                return
+        with self._lock:
+            self._jobs[handle.job_id] = handle
+            request = self.pool.submit(handle.address_type, handle.pattern, handle.position, remaining,
+                                       start_block=handle.start_block)
+            handle.begin(request)
+        if handle.status == "paused":
+            self.pool.pause(request, True)
+        else:
+            self._executor.submit(self._store_state, handle)
+        request.future.add_done_callback(
+            lambda f: self._executor.submit(self._search_done, handle, f)
+        )
+
+    def _end(self, job_id: str, status: str) -> bool:
+        with self._lock:
+            handle = self._jobs.pop(job_id, None)
+            if handle is None:
+                return False
+            if handle in self._queue:
+                self._queue.remove(handle)
+        handle.status = status
+        # Read the live counters before cancelling releases them
+        attempts = self.attempts(handle)
+        if handle.request is not None:
+            self.pool.cancel(handle.request)
+        self._store_outcome(handle, status, attempts=attempts)
+        if status == "cancelled":
+            handle.future.cancel()
+        elif not handle.future.done():
+            handle.future.set_result(None)
+        self.schedule()
+        return True
+
+    def _search_done(self, handle: SearchJobHandle, future: Future):
+        if future.cancelled():
+            # Cancelled, expired and preempted jobs are stored where that
+            # happened; at shutdown the job stays active for the next start
+            return
+        with self._lock:
+            if handle.request is None or handle.request.future is not future:
+                return  # An earlier run that was preempted
+            if self._jobs.pop(handle.job_id, None) is None:
+                return  # Ended while the outcome was on its way
+        try:
+            self._finish(handle, future)
+        finally:
+            self.schedule()
+
+    def _finish(self, handle: SearchJobHandle, future: Future):
+        error = future.exception()
+        if error is not None:
+            handle.status = "failed"
+            self._store_outcome(handle, "failed", error=str(error))
+            handle.future.set_exception(error)
+            return
+
+        result = future.result()
+        if result is None:
+            handle.status = "exhausted"
+            self._store_outcome(handle, "exhausted")
+            handle.future.set_result(None)
+            return
+
+        address, private_key, attempts = result
+        total = handle.prior_attempts + attempts
+        handle.status = "found"
+        self._store_outcome(handle, "found", attempts=total, address=address, private_key=private_key)
+        try:
+            self.address_writer.put({
+                "address": address,
+                "private_key": private_key,
+                "address_type": handle.address_type,
+                "pattern": handle.pattern,
+                "position": handle.position,
+                "attempts": total,
+                "generation_source": "backend",
+            })
+        except Exception as e:
+            print(f"Error saving address of search job {handle.job_id}: {e}")
+        handle.future.set_result((address, private_key, total))
+
+    def _progress(self, handle: SearchJobHandle):
+        """Attempts so far and the keystream block to resume at"""
+        attempts = self.attempts(handle)
+        block = self.pool.resume_block(handle.request)
+        if block is not None:
+            # A seeded job resumes at block, so only count keys before it
+            block_size = self.pool.generator.keystream.block_size
+            attempts = handle.prior_attempts + max(block - handle.request.first_block, 0) * block_size
+        return attempts, block
+
+    def _checkpoint(self, handle: SearchJobHandle):
+        request = handle.request
+        if request is None or request.future.done():
+            return
+        attempts, block = self._progress(handle)
+        self._store_state(handle, attempts, block, self.pool.lane_attempts(request))
+
+    def _store_state(self, handle: SearchJobHandle, attempts: int = None, block: int = None,
+                     workers: List[int] = None):
+        """Write the progress of an active job"""
+        try:
+            with self.session_factory() as db:
+                row = db.get(SearchJob, handle.job_id)
+                if row is None or row.status not in ACTIVE_STATUSES:
+                    return
+                row.status = handle.status
+                row.attempts = attempts if attempts is not None else handle.prior_attempts
+                row.elapsed_seconds = handle.elapsed
+                row.keystream_block = block if block is not None else handle.start_block
+                if workers is not None:
+                    row.workers = json.dumps(workers)
+                row.updated_at = datetime.utcnow()
+                db.commit()
+        except Exception as e:
+            print(f"Error checkpointing search job {handle.job_id}: {e}")
+
+    def _store_outcome(self, handle: SearchJobHandle, status: str, attempts: int = None,
+                       address: str = None, private_key: str = None, error: str = None):
+        try:
+            with self.session_factory() as db:
+                row = db.get(SearchJob, handle.job_id)
+                if row is None:
+                    return
+                row.status = status
+                row.attempts = attempts if attempts is not None else self.attempts(handle)
+                row.elapsed_seconds = handle.elapsed
+                row.result_address = address
+                row.result_private_key = private_key
+                row.error = error
+                row.updated_at = row.finished_at = datetime.utcnow()
+                db.commit()
+        except Exception as e:
+            print(f"Error storing outcome of search job {handle.job_id}: {e}")
+
+
+def job_state(row: SearchJob, include_key: bool = False) -> dict:
+    """Public view of a job row; the private key only with include_key"""
+    state = {
+        "job_id": row.id,
+        "address_type": row.address_type,
+        "pattern": row.pattern,
+        "position": row.position,
+        "status": row.status,
+        "priority": row.priority,
+        "client_id": row.client_id,
+        "deadline": row.deadline.isoformat() if row.deadline else None,
+        "max_attempts": row.max_attempts,
+        "attempts": row.attempts,
+        "elapsed_seconds": round(row.elapsed_seconds or 0.0, 3),
+        "keystream_block": row.keystream_block,
+        "workers": json.loads(row.workers) if row.workers else None,
+        "runs": row.runs,
+        "address": row.result_address,
+        "error": row.error,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+    }
+    if include_key:
+        state["private_key"] = row.result_private_key
+    return state
@@ -0,0 +1,52 @@
+"""
+Seeded, reproducible keystreams for benchmarks and regression tests.
+
+NOT FOR PRODUCTION: every private key is derived from the seed, so
+anyone who knows the seed knows every key. Only enable seeding to make
+two runs comparable - the same seed and pattern then hit the same key
+after the same number of attempts, on any number of workers.
+
+Keys are addressed by a global index. Per-key searches use key_at(i);
+incremental searches split the index space into blocks of block_size
+consecutive keys walked from block_base(i // block_size). Workers take
+disjoint blocks, and a search reports the lowest-index hit.
+"""
+import hashlib
+
+import ec_math
+
+# Opting in: the API and benchmarks read the seed from here
+SEED_ENV_VAR = "BTC_KEYSTREAM_SEED"
+
+# Keys per block; matches the worker pool's default slice size
+SEED_BLOCK_SIZE = 20000
+
+
+class SeededKeystream:
+    """Deterministic private keys derived from a seed string"""
+
+    def __init__(self, seed: str, block_size: int = SEED_BLOCK_SIZE):
+        self.seed = seed
+        self.block_size = block_size
+        self._prefix = b"bitcoin-address-generator/keystream/" + seed.encode() + b"/"
+
+    def _derive(self, kind: bytes, index: int, limit: int) -> bytes:
+        # Rehash with a counter in the (astronomically unlikely) case the
+        # digest falls outside [1, limit)
+        counter = 0
+        while True:
+            digest = hashlib.sha256(
+                self._prefix + kind + index.to_bytes(8, 'big') + counter.to_bytes(4, 'big')
+            ).digest()
+            if 0 < int.from_bytes(digest, 'big') < limit:
+                return digest
+            counter += 1
+
+    def key_at(self, index: int) -> bytes:
+        """Private key number index of the per-key stream"""
+        return self._derive(b"key", index, ec_math.N)
+
+    def block_base(self, block: int) -> bytes:
+        """Base private key of incremental block number block"""
+        # Leave room to walk the whole block without wrapping the curve order
+        return self._derive(b"block", block, ec_math.N - self.block_size)
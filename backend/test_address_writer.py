@@ -0,0 +1,38 @@
+"""A bad row must not take the rest of its batch down with it"""
+from sqlalchemy import func, select
+
+from address_writer import AddressWriter
+from database import Base, BitcoinAddress, create_storage_engine
+
+
+def make_record(i: int, private_key="L1aW4aubDFB7yfras2S1mN3bqg9nwySY8nkoLmJebSLD5BWv3ENZ"):
+    return {
+        "address": f"1Test{i}",
+        "private_key": private_key,
+        "address_type": "p2pkh",
+        "pattern": None,
+        "position": None,
+        "attempts": 1,
+        "generation_source": "backend",
+    }
+
+
+def test_bad_row_only_loses_itself(tmp_path):
+    engine = create_storage_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    Base.metadata.create_all(bind=engine)
+    # Long flush interval, so all rows land in one batch
+    writer = AddressWriter(engine, BitcoinAddress.__table__, batch_size=100, flush_interval=5.0)
+    writer.start()
+    for i in range(10):
+        # private_key is NOT NULL, so row 5 fails the batch insert
+        writer.put(make_record(i, private_key=None) if i == 5 else make_record(i))
+    writer.close()
+
+    with engine.connect() as conn:
+        addresses = set(conn.execute(select(BitcoinAddress.address)).scalars())
+        total = conn.execute(select(func.count()).select_from(BitcoinAddress.__table__)).scalar()
+    engine.dispose()
+    assert total == 9
+    assert addresses == {f"1Test{i}" for i in range(10) if i != 5}
+    assert writer.written == 9
+    assert writer.failed == 1
@@ -0,0 +1,29 @@
+"""The quick benchmarks must not regress against the committed baseline"""
+import json
+import os
+
+from bench_pipeline import (
+    BASELINE_PATH, BASELINE_TOLERANCE, GATE_RATES_ENV_VAR, build_parser, compare, run, same_machine
+)
+
+
+def regressions(baseline: dict, gate_rates: bool) -> dict:
+    options = ["--quick", "--seed", baseline["meta"]["seed"]]
+    if not gate_rates:
+        options += ["--skip-stages", "--skip-cancel"]
+    results = run(build_parser().parse_args(options))
+    failures = compare(results, baseline, BASELINE_TOLERANCE, gate_rates and same_machine(results, baseline))
+    # Keyed by what regressed, e.g. "stages.p2pkh.encode"
+    return {failure.split(":")[0]: failure for failure in failures}
+
+
+def test_quick_benchmarks_match_baseline():
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    gate_rates = bool(os.environ.get(GATE_RATES_ENV_VAR))
+    failures = regressions(baseline, gate_rates)
+    if failures and gate_rates:
+        # A timing can dip on a busy machine; only a regression seen twice counts
+        again = regressions(baseline, gate_rates)
+        failures = {key: again[key] for key in failures if key in again}
+    assert not failures, "\n".join(failures.values())
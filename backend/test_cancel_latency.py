@@ -0,0 +1,29 @@
+"""Workers must go idle within milliseconds of a search being stopped"""
+import pytest
+
+from bench_pipeline import CANCEL_PATTERN, multiprocess_cancel_latency, pool_cancel_latency
+from btc_generator import BitcoinAddressGenerator
+from worker_pool import SearchWorkerPool
+
+# Slices re-check their slot between 256-key chunks, a few milliseconds
+POOL_CANCEL_BOUND = 0.1
+# Workers stop after their current batch (about 50 ms) and then exit
+MULTIPROCESS_CANCEL_BOUND = 0.5
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return BitcoinAddressGenerator()
+
+
+def test_pool_cancel_stops_lane_counters(generator):
+    address_type, pattern = CANCEL_PATTERN
+    with SearchWorkerPool(generator, max_workers=2) as pool:
+        latency = pool_cancel_latency(pool, address_type, pattern)
+    assert latency < POOL_CANCEL_BOUND
+
+
+def test_multiprocess_stop_event_stops_workers(generator):
+    address_type, pattern = CANCEL_PATTERN
+    latency = multiprocess_cancel_latency(generator, address_type, pattern, workers=2)
+    assert latency < MULTIPROCESS_CANCEL_BOUND
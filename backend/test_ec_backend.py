@@ -0,0 +1,51 @@
+"""The incremental key walk must agree across backends, and coincurve must be the fast one"""
+import os
+import time
+
+import pytest
+
+import ec_math
+from ec_backend import CoincurveBackend, PurePythonBackend
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+needs_coincurve = pytest.mark.skipif(coincurve is None, reason="coincurve is not installed")
+
+WALK_KEYS = 5000
+# coincurve must derive the walk at least this many times faster
+MIN_SPEEDUP = 1.5
+
+
+def random_point() -> ec_math.Point:
+    private_key = int.from_bytes(os.urandom(32), 'big') % ec_math.N
+    return ec_math.point_from_public_key(PurePythonBackend().public_key(private_key.to_bytes(32, 'big')))
+
+
+def best_time(backend, point: ec_math.Point, count: int, runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.consecutive_public_keys(point, count)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@needs_coincurve
+def test_coincurve_walk_matches_pure_python():
+    point = random_point()
+    python_keys, python_next = PurePythonBackend().consecutive_public_keys(point, 300)
+    coincurve_keys, coincurve_next = CoincurveBackend().consecutive_public_keys(point, 300)
+    assert coincurve_keys == python_keys
+    assert coincurve_next == python_next
+
+
+@needs_coincurve
+def test_coincurve_walk_beats_pure_python():
+    point = random_point()
+    python_seconds = best_time(PurePythonBackend(), point, WALK_KEYS)
+    coincurve_seconds = best_time(CoincurveBackend(), point, WALK_KEYS)
+    assert coincurve_seconds * MIN_SPEEDUP < python_seconds, \
+        f"coincurve {coincurve_seconds:.3f}s vs pure Python {python_seconds:.3f}s for {WALK_KEYS} keys"
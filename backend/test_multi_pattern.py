@@ -0,0 +1,110 @@
+"""Scheduling of the shared search slices"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from btc_generator import BitcoinAddressGenerator, IncrementalKeyStream
+from multi_pattern import MultiPatternSearch, PatternSet
+
+# Never matches in a test's lifetime
+RARE = ("p2pkh", "zzzzzzzzzz", "middle")
+SLICE_SIZE = 2048
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Runs slices on one thread and keeps each slice's (count, limits)"""
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.slices = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.slices.append((args[2], args[7]))
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return BitcoinAddressGenerator()
+
+
+def test_small_budget_does_not_shrink_slices(generator):
+    executor = RecordingExecutor()
+    search = MultiPatternSearch(generator, executor, slice_size=SLICE_SIZE)
+    try:
+        unlimited = search.submit(*RARE)
+        small = search.submit("p2pkh", "zzzzzzzzzy", "middle", max_attempts=300)
+        assert small.future.result(timeout=30) is None
+        assert small.attempts == 300
+        search.cancel(unlimited)
+    finally:
+        search.close()
+        executor.shutdown()
+    assert all(count == SLICE_SIZE for count, _ in executor.slices)
+    assert any(limits and 300 in limits for _, limits in executor.slices)
+
+
+def test_budget_across_slices_is_exact(generator):
+    search = MultiPatternSearch(generator, slice_size=SLICE_SIZE)
+    try:
+        request = search.submit(*RARE, max_attempts=SLICE_SIZE + 452)
+        assert request.future.result(timeout=30) is None
+        assert request.attempts == SLICE_SIZE + 452
+    finally:
+        search.close()
+
+
+def test_seeded_result_ignores_earlier_searches():
+    search = MultiPatternSearch(BitcoinAddressGenerator(seed="test-multi-pattern"))
+    try:
+        first = search.submit("p2pkh", "ab", "start").future.result(timeout=60)
+        search.submit("p2pkh", "xy", "end").future.result(timeout=60)
+        again = search.submit("p2pkh", "ab", "start").future.result(timeout=60)
+    finally:
+        search.close()
+    assert again[0] == first[0]
+    assert again[2] == first[2]
+
+
+def test_pattern_set_routes_like_string_matching(generator):
+    batch = generator.generate_public_key_batch(IncrementalKeyStream(generator), 300)
+    keys = [batch[i:i + 33] for i in range(0, len(batch), 33)]
+    targets = []
+    for address_type in ("p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr"):
+        for key in keys[:4]:
+            address = generator.public_key_to_address(address_type, key)
+            body = address[3:] if address.startswith("bc1") else address[1:]
+            for position, pattern in (("start", body[:2]), ("middle", body[10:12]), ("end", body[-2:])):
+                targets.append((len(targets), address_type, pattern.upper(), position))
+    pattern_set = PatternSet(generator, targets)
+    for key in keys:
+        addresses = {t: generator.public_key_to_address(t, key) for t in ("p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr")}
+        expected = {target_id for target_id, address_type, pattern, position in targets
+                    if generator.check_pattern_match(addresses[address_type], pattern, position)}
+        found = pattern_set.match(key)
+        assert {target_id for target_id, _ in found} == expected
+        assert all(address == addresses[targets[target_id][1]] for target_id, address in found)
+
+
+def test_coalesced_requests_get_distinct_keys(generator):
+    search = MultiPatternSearch(generator, slice_size=SLICE_SIZE)
+    try:
+        requests = [search.submit("p2pkh", "ab", "start") for _ in range(6)]
+        results = [request.future.result(timeout=60) for request in requests]
+    finally:
+        search.close()
+    assert len({private_key for _, private_key, _ in results}) == len(results)
+    assert all(generator.check_pattern_match(address, "ab", "start") for address, _, _ in results)
+
+
+def test_coalesced_requests_keep_their_own_budgets(generator):
+    search = MultiPatternSearch(generator, slice_size=SLICE_SIZE)
+    try:
+        budgets = [300, SLICE_SIZE + 100, 3 * SLICE_SIZE]
+        requests = [search.submit(*RARE, max_attempts=budget) for budget in budgets]
+        assert len({request.group for request in requests}) == 1
+        for request, budget in zip(requests, budgets):
+            assert request.future.result(timeout=60) is None
+            assert request.attempts == budget
+    finally:
+        search.close()
@@ -0,0 +1,87 @@
+"""Pattern odds and compiled matchers"""
+import math
+
+import pytest
+
+from btc_generator import BitcoinAddressGenerator, IncrementalKeyStream
+from difficulty import DifficultyEstimator
+from pattern_matcher import Base58PrefixMatcher, Bech32Matcher, match_probability, probability_is_exact
+from worker_pool import SearchWorkerPool
+
+SAMPLE_ADDRESSES = 20000
+# Allowed distance of a sampled count from its expectation, in standard deviations
+SIGMAS = 5
+
+MATCH_KEYS = 400
+# Keys whose own addresses supply the patterns, so every pattern has hits
+PATTERN_SOURCES = 8
+ADDRESS_TYPES = ["p2pkh", "p2sh-p2wpkh", "p2wpkh", "p2tr"]
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return BitcoinAddressGenerator()
+
+
+@pytest.fixture(scope="module")
+def public_keys(generator):
+    keys = []
+    for _ in range(4):
+        batch = generator.generate_public_key_batch(IncrementalKeyStream(generator), MATCH_KEYS // 4)
+        keys.extend(batch[i:i + 33] for i in range(0, len(batch), 33))
+    return keys
+
+
+def patterns_from(addresses, position):
+    """Short patterns cut from real addresses, in mixed case"""
+    patterns = set()
+    for address in addresses:
+        body = address[3:] if address.startswith("bc1") else address[1:]
+        for length in (1, 2, 3):
+            if position == "start":
+                piece = body[:length]
+            elif position == "end":
+                piece = body[-length:]
+            else:
+                piece = body[len(body) // 2:len(body) // 2 + length]
+            patterns.update((piece, piece.swapcase()))
+    return sorted(patterns)
+
+
+@pytest.mark.parametrize("position", ["start", "middle", "end"])
+@pytest.mark.parametrize("address_type", ADDRESS_TYPES)
+def test_compiled_matchers_agree_with_string_matching(generator, public_keys, address_type, position):
+    addresses = [generator.public_key_to_address(address_type, key) for key in public_keys]
+    matched = 0
+    for pattern in patterns_from(addresses[:PATTERN_SOURCES], position):
+        matcher = generator.compile_pattern(address_type, pattern, position)
+        if address_type in ("p2pkh", "p2sh-p2wpkh"):
+            if position == "start":
+                assert isinstance(matcher, Base58PrefixMatcher)
+        else:
+            assert isinstance(matcher, Bech32Matcher)
+        for key, address in zip(public_keys, addresses):
+            expected = generator.check_pattern_match(address, pattern, position)
+            assert matcher.match(key) == (address if expected else None), (pattern, address)
+            matched += expected
+    assert matched >= PATTERN_SOURCES
+
+
+def test_base58_end_probability_matches_sampled_addresses(generator):
+    addresses = [address for address, _ in generator.generate_batch("p2pkh", SAMPLE_ADDRESSES)]
+    probability = match_probability("p2pkh", "z", "end")
+    expected = probability * SAMPLE_ADDRESSES
+    found = sum(address.lower().endswith("z") for address in addresses)
+    assert abs(found - expected) < SIGMAS * math.sqrt(expected * (1 - probability))
+
+
+def test_estimate_flags_approximate_probabilities(generator):
+    assert probability_is_exact("p2pkh", "abc", "start")
+    assert probability_is_exact("p2pkh", "abc", "end")
+    assert probability_is_exact("p2wpkh", "qxyz", "start")
+    assert not probability_is_exact("p2pkh", "abc", "middle")
+    assert not probability_is_exact("p2tr", "xyz", "middle")
+
+    estimator = DifficultyEstimator(SearchWorkerPool(generator, max_workers=1))
+    assert estimator.estimate("p2pkh", "abc", "end")["exact"] is True
+    assert estimator.estimate("p2pkh", "abc", "middle")["exact"] is False
@@ -0,0 +1,49 @@
+"""Worker profiling sessions must see the search, and reach any kind of worker process"""
+import multiprocessing
+
+import pytest
+
+from btc_generator import BitcoinAddressGenerator
+from profiler import ProfileControl
+from worker_pool import SearchWorkerPool
+
+RARE = ("p2pkh", "zzzzzzzzzz", "middle")
+WORK_STAGES = {"keygen", "pubkey", "compress", "hash160", "hash256", "base58", "bech32", "pattern_match", "other"}
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SearchWorkerPool(BitcoinAddressGenerator(), max_workers=1) as pool:
+        yield pool
+
+
+def test_profile_during_search_has_samples(pool):
+    request = pool.search.submit(*RARE)
+    try:
+        profile = pool.profile(1.0)
+    finally:
+        pool.search.cancel(request)
+    assert profile["samples"] > 0
+    assert sum(profile["stages"][stage]["samples"] for stage in WORK_STAGES) > 0
+
+
+def test_idle_workers_report_idle_time(pool):
+    profile = pool.profile(0.5)
+    assert profile["samples"] > 0
+    assert profile["stages"]["idle"]["samples"] == profile["samples"]
+
+
+def _report_session(control: ProfileControl):
+    control.reports.put(control.session.value)
+
+
+def test_control_reaches_spawned_processes():
+    context = multiprocessing.get_context("spawn")
+    control = ProfileControl(context)
+    control.start(0.1)
+    process = context.Process(target=_report_session, args=(control,))
+    process.start()
+    try:
+        assert control.reports.get(timeout=30) == 1
+    finally:
+        process.join()
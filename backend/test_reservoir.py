@@ -0,0 +1,60 @@
+"""Every stored reservoir hit must reach exactly one client"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import reservoir as reservoir_module
+from database import Base, create_storage_engine
+from reservoir import HitReservoir
+
+needs_cryptography = pytest.mark.skipif(reservoir_module.Fernet is None,
+                                        reason="cryptography is not installed")
+
+SPEC = ("p2pkh", "ab", "start")
+HITS = 40
+TAKERS = 4
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_storage_engine(f"sqlite:///{tmp_path / 'reservoir.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def drain(reservoir: HitReservoir) -> list:
+    hits = []
+    while True:
+        hit = reservoir.take(*SPEC)
+        if hit is None:
+            return hits
+        hits.append(hit)
+
+
+@needs_cryptography
+def test_each_hit_is_handed_out_once(session_factory):
+    key = reservoir_module.Fernet.generate_key()
+    collector = HitReservoir(session_factory, [SPEC], depth=HITS, key=key)
+    collector.start()
+    hot_key = collector.wanted()[0][0]
+    offered = {f"1ab{i}": f"private-key-{i}" for i in range(HITS)}
+    for address, private_key in offered.items():
+        collector.offer(hot_key, address, private_key)
+    collector.close()
+    assert collector.stock == HITS
+
+    # A second API process on the same database takes from the same stock
+    other = HitReservoir(session_factory, [SPEC], depth=HITS, key=key)
+    other.start()
+    assert other.stock == HITS
+
+    with ThreadPoolExecutor(max_workers=2 * TAKERS) as executor:
+        drained = executor.map(drain, [collector, other] * TAKERS)
+        taken = [hit for hits in drained for hit in hits]
+    other.close()
+
+    assert len(taken) == HITS
+    assert dict(taken) == offered
+    assert drain(collector) == [] and drain(other) == []
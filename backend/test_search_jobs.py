@@ -0,0 +1,102 @@
+"""Search job queue order, preemption and checkpoint/resume"""
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from address_writer import AddressWriter
+from btc_generator import BitcoinAddressGenerator
+from database import Base, BitcoinAddress, SearchJob, create_storage_engine
+from search_jobs import SearchJobManager
+from worker_pool import SearchWorkerPool
+
+RARE = ("p2pkh", "zzzzzzzzzz", "middle")
+# With this seed the first "999" start hit is in keystream block 3
+SEED = "search-jobs-4"
+SEEDED_PATTERN = ("p2pkh", "999", "start")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    engine = create_storage_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    writer = AddressWriter(engine, BitcoinAddress.__table__)
+    writer.start()
+    yield sessionmaker(bind=engine), writer
+    writer.close()
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SearchWorkerPool(BitcoinAddressGenerator(), max_workers=1) as pool:
+        yield pool
+
+
+@pytest.fixture(scope="module")
+def seeded_pool():
+    with SearchWorkerPool(BitcoinAddressGenerator(seed=SEED), max_workers=1) as pool:
+        yield pool
+
+
+def running(*handles):
+    return [handle.request is not None for handle in handles]
+
+
+def test_priority_and_fair_share_order(storage, pool):
+    session_factory, writer = storage
+    manager = SearchJobManager(session_factory, pool, writer, max_running=2)
+    try:
+        first = manager.create(*RARE, priority="high", client_id="a")
+        second = manager.create(*RARE, priority="high", client_id="a")
+        normal_a = manager.create(*RARE, priority="normal", client_id="a")
+        normal_b = manager.create(*RARE, priority="normal", client_id="b")
+        low_b = manager.create(*RARE, priority="low", client_id="b")
+        assert running(first, second, normal_a, normal_b, low_b) == [True, True, False, False, False]
+
+        # Client b has nothing running yet, so its later job goes first
+        manager.cancel(first.job_id)
+        assert running(normal_a, normal_b, low_b) == [False, True, False]
+        # Then the older normal job; the low one keeps waiting
+        manager.cancel(second.job_id)
+        assert running(normal_a, normal_b, low_b) == [True, True, False]
+
+        # A high job preempts the newest running job of the lowest class
+        urgent = manager.create(*RARE, priority="high", client_id="c")
+        assert running(urgent, normal_a, normal_b, low_b) == [True, False, True, False]
+        assert normal_a.status == "queued"
+    finally:
+        manager.shutdown()
+
+
+def test_seeded_job_resumes_from_its_checkpoint(storage, seeded_pool):
+    session_factory, writer = storage
+    block_size = seeded_pool.generator.keystream.block_size
+
+    manager = SearchJobManager(session_factory, seeded_pool, writer)
+    expected = manager.create(*SEEDED_PATTERN).future.result(timeout=60)
+    manager.shutdown()
+    assert expected[2] > 2 * block_size
+
+    # Stop the same search once its first block is done and start it over
+    manager = SearchJobManager(session_factory, seeded_pool, writer)
+    handle = manager.create(*SEEDED_PATTERN)
+    while handle.request.attempts < block_size:
+        time.sleep(0.01)
+    manager.shutdown()
+    with session_factory() as db:
+        row = db.get(SearchJob, handle.job_id)
+        assert row.status == "running"
+        assert row.keystream_block >= 1
+        assert row.attempts == row.keystream_block * block_size
+
+    manager = SearchJobManager(session_factory, seeded_pool, writer)
+    assert manager.resume_all() == 1
+    resumed = manager.get(handle.job_id)
+    assert resumed.request.first_block == row.keystream_block
+    result = resumed.future.result(timeout=60)
+    manager.shutdown()
+    assert result == expected
+    with session_factory() as db:
+        row = db.get(SearchJob, handle.job_id)
+        assert (row.status, row.attempts, row.runs) == ("found", expected[2], 2)
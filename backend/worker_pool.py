@@ -0,0 +1,179 @@
+"""
+Persistent search worker pool.
+
+One pre-warmed ProcessPoolExecutor lives for the whole lifetime of the
+API. Its workers import the crypto modules and build their generator once
+at startup, and a single MultiPatternSearch scheduler hands them work
+slices from every active search, so the number of busy processes never
+exceeds the pool size however many clients are searching.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+import metrics
+import multi_pattern
+import profiler
+from multi_pattern import MultiPatternSearch, PatternRequest, SearchSlots
+from profiler import ProfileControl
+
+
+def _init_worker(backend: str = None, shared: SearchSlots = None, seed: str = None,
+                 profile: ProfileControl = None):
+    """Build the per-process generator once, before any slice arrives"""
+    multi_pattern.init_slice_worker(backend, shared, seed)
+    profiler.start_sampler(profile)
+
+
+def _generate_batch(address_type: str, count: int, start_index: int = None) -> List[Tuple[str, str]]:
+    """Fresh random (address, private_key_wif) pairs, built in a worker"""
+    return multi_pattern.worker_generator().generate_batch(address_type, count, start_index)
+
+
+def _warmup() -> int:
+    """Touch the curve tables so the first real slice is not the slow one"""
+    multi_pattern.search_slice([], [], 1)
+    return os.getpid()
+
+
+class SearchWorkerPool:
+    """Long-lived process pool shared by every pattern search"""
+
+    def __init__(self, generator, max_workers: int = None, slice_size: int = None, reservoir=None):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.generator = generator
+        self.max_workers = max_workers
+        self.slice_size = slice_size
+        # Optional HitReservoir fed by-product hits from every slice
+        self.reservoir = reservoir
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.search: Optional[MultiPatternSearch] = None
+        self.profile_control: Optional[ProfileControl] = None
+        # Seeded generators hand each batch its own keystream range
+        self._keystream = getattr(generator, "keystream", None)
+        self._next_key_index = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Spawn and warm every worker process"""
+        backend = getattr(self.generator, "backend", None)
+        # Shared-memory cancel flags and attempt counters, inherited by
+        # every worker; one lane per worker
+        shared = SearchSlots(self.max_workers)
+        self.profile_control = ProfileControl()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(backend.name if backend else None, shared,
+                      self._keystream.seed if self._keystream is not None else None,
+                      self.profile_control)
+        )
+        # Submitting one task per worker at once makes the executor spawn
+        # all of them now rather than on the first searches
+        wait([self.executor.submit(_warmup) for _ in range(self.max_workers)])
+        self.search = MultiPatternSearch(
+            self.generator, executor=self.executor,
+            max_in_flight=self.max_workers, slice_size=self.slice_size,
+            shared=shared, reservoir=self.reservoir
+        )
+        metrics.workers.set(self.max_workers)
+        metrics.workers_busy.set_function(lambda: self.search.busy_lanes if self.search is not None else 0)
+        metrics.search_slice_keys.set_function(lambda: self.search.slice_keys if self.search is not None else 0)
+        metrics.search_slice_overhead.set_function(
+            lambda: self.search.slice_overhead if self.search is not None else 0)
+        metrics.active_searches.set_function(
+            lambda: self.search.active_requests if self.search is not None else 0)
+        print(f"Search worker pool started with {self.max_workers} processes")
+
+    def submit(self, address_type: str, pattern: str, position: str, max_attempts: int = None,
+               on_progress: Callable[[PatternRequest], None] = None,
+               start_block: int = None) -> PatternRequest:
+        if self.search is None:
+            raise RuntimeError("Search worker pool is not running")
+        return self.search.submit(address_type, pattern, position, max_attempts, on_progress, start_block)
+
+    def generate_batch(self, address_type: str, count: int) -> Future:
+        """Generate count random addresses on a worker, off the caller's thread"""
+        if self.executor is None:
+            raise RuntimeError("Search worker pool is not running")
+        start_index = None
+        if self._keystream is not None:
+            with self._lock:
+                start_index = self._next_key_index
+                self._next_key_index += count
+        return self.executor.submit(_generate_batch, address_type, count, start_index)
+
+    def measure_rate(self, address_type: str, pattern: str, position: str = "start",
+                     keys: int = 5000) -> float:
+        """Keys per second one worker checks against a single pattern
+
+        Runs one slice with no live request behind the pattern, so a hit
+        is never reported and no private key leaves the worker.
+        """
+        if self.executor is None:
+            raise RuntimeError("Search worker pool is not running")
+        start = time.perf_counter()
+        checked, _, _, _ = self.executor.submit(
+            multi_pattern.search_slice, [(0, address_type, pattern, position)], [], keys
+        ).result()
+        return checked / (time.perf_counter() - start)
+
+    def cancel(self, request: PatternRequest):
+        if self.search is not None:
+            self.search.cancel(request)
+
+    def pause(self, request: PatternRequest, paused: bool = True):
+        if self.search is not None:
+            self.search.pause(request, paused)
+
+    def resume_block(self, request: PatternRequest) -> Optional[int]:
+        """Keystream block a seeded search would restart from"""
+        if self.search is None:
+            return None
+        return self.search.resume_block(request)
+
+    def lane_attempts(self, request: PatternRequest) -> List[int]:
+        """Live keys checked for request on each worker lane"""
+        if self.search is None:
+            return []
+        return self.search.lane_attempts(request)
+
+    def start_profile(self, seconds: float, interval: float = profiler.DEFAULT_INTERVAL) -> int:
+        """Start sampling every worker for up to seconds; returns the session id"""
+        if self.profile_control is None:
+            raise RuntimeError("Search worker pool is not running")
+        return self.profile_control.start(seconds, interval)
+
+    def finish_profile(self, session: int) -> dict:
+        """End a session now and return the merged profile (blocks briefly)"""
+        self.profile_control.stop(session)
+        return self.profile_control.collect(session, self.max_workers)
+
+    def profile(self, seconds: float, interval: float = profiler.DEFAULT_INTERVAL) -> dict:
+        """Sample every worker for seconds and return the merged profile"""
+        session = self.start_profile(seconds, interval)
+        return self.profile_control.collect(session, self.max_workers)
+
+    @property
+    def last_public_key(self) -> Optional[bytes]:
+        """Most recent key a worker reported, for progress display"""
+        return self.search.last_public_key if self.search is not None else None
+
+    def shutdown(self):
+        if self.search is not None:
+            self.search.close()
+            self.search = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        metrics.workers.set(0)
+        print("Search worker pool stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()